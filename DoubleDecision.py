@@ -1,39 +1,454 @@
+import time
+# Referencia para medir el tiempo hasta la primera pantalla
+PROCESS_START_MS = time.perf_counter_ns() / 1_000_000
+
 import tkinter as tk
-from tkinter import messagebox
-from PIL import Image, ImageTk, ImageDraw, ImageEnhance
-import random
+from tkinter import messagebox, ttk
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from asset_loader import AssetLoader, asset_job, decode_asset, scan_assets
+from engine import TrialEngine, SectorClassifier, RESPONSE_TIME_MS
+from manifest import (ManifestError, default_manifest_data, index_assets, load_manifest,
+                      parse_manifest)
+from staircase import AdaptiveEngine
+from telemetry import EventClock, TrialLog, make_tracer, perf_ms
+from store import ScoreStore, apply_game
+from replay import SessionRecorder
 import math
 import os
+import queue
+import uuid
+
+# Parámetros de dibujo de cada estado de un sector (mismos valores que antes se
+# pasaban a create_transparent_sector en cada llamada)
+SECTOR_STATES = {
+    "normal": {"color_rgb": (42, 42, 42), "alpha": 100, "is_highlighted": False},
+    "hover": {"color_rgb": (255, 204, 136), "alpha": 150, "is_highlighted": True},
+    "correct": {"color_rgb": (68, 255, 68), "alpha": 200, "is_highlighted": True},
+    "incorrect": {"color_rgb": (255, 68, 68), "alpha": 200, "is_highlighted": True},
+}
+
+
+def clip_polygon_to_rect(points, width, height):
+    """Recorta un polígono convexo al rectángulo [0, width] x [0, height]"""
+    edges = (
+        lambda p: p[0] >= 0, lambda p: p[0] <= width,
+        lambda p: p[1] >= 0, lambda p: p[1] <= height,
+    )
+    bounds = (
+        lambda a, b: _intersect_x(a, b, 0), lambda a, b: _intersect_x(a, b, width),
+        lambda a, b: _intersect_y(a, b, 0), lambda a, b: _intersect_y(a, b, height),
+    )
+    for inside, intersect in zip(edges, bounds):
+        if not points:
+            break
+        clipped = []
+        prev = points[-1]
+        for point in points:
+            if inside(point):
+                if not inside(prev):
+                    clipped.append(intersect(prev, point))
+                clipped.append(point)
+            elif inside(prev):
+                clipped.append(intersect(prev, point))
+            prev = point
+        points = clipped
+    return points
+
+
+def _intersect_x(a, b, x):
+    t = (x - a[0]) / (b[0] - a[0])
+    return (x, a[1] + t * (b[1] - a[1]))
+
+
+def _intersect_y(a, b, y):
+    t = (y - a[1]) / (b[1] - a[1])
+    return (a[0] + t * (b[0] - a[0]), y)
+
+
+def render_sector_image(canvas_width, canvas_height, center_x, center_y,
+                        angle_start, angle_end, color_rgb, alpha, is_highlighted=False):
+    """Dibuja un sector recortado a su caja envolvente dentro del canvas.
+
+    Devuelve (imagen RGBA, x, y) con la esquina superior izquierda de la caja;
+    el resultado es idéntico píxel a píxel a dibujar el triángulo en una capa
+    del tamaño de todo el canvas.
+    """
+    max_distance = max(canvas_width, canvas_height)
+    
+    rad_start = math.radians(angle_start)
+    rad_end = math.radians(angle_end)
+    
+    triangle = [
+        (center_x, center_y),
+        (center_x + max_distance * math.cos(rad_start), center_y + max_distance * math.sin(rad_start)),
+        (center_x + max_distance * math.cos(rad_end), center_y + max_distance * math.sin(rad_end)),
+    ]
+    
+    # PIL se importa al primer uso para no retrasar el arranque
+    from PIL import Image, ImageDraw
+    
+    visible = clip_polygon_to_rect(triangle, canvas_width, canvas_height)
+    if not visible:
+        return Image.new('RGBA', (1, 1), (0, 0, 0, 0)), 0, 0
+    
+    # Margen para el contorno de 2 px, sin salir del canvas
+    pad = 2
+    left = max(0, int(math.floor(min(x for x, _ in visible))) - pad)
+    top = max(0, int(math.floor(min(y for _, y in visible))) - pad)
+    right = min(canvas_width, int(math.ceil(max(x for x, _ in visible))) + pad + 1)
+    bottom = min(canvas_height, int(math.ceil(max(y for _, y in visible))) + pad + 1)
+    
+    img = Image.new('RGBA', (right - left, bottom - top), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(img)
+    
+    if is_highlighted:
+        color_rgba = (255, 204, 136, alpha)
+        outline_color = (255, 204, 0, 255)
+    else:
+        color_rgba = (*color_rgb, alpha)
+        outline_color = (68, 68, 68, 180)
+    
+    # Se dibuja el triángulo completo desplazado; PIL recorta lo que queda fuera.
+    # PIL trunca los vértices a enteros, así que se truncan antes de desplazar
+    # para que el resultado coincida con el de la capa de tamaño completo.
+    draw.polygon([(int(x) - left, int(y) - top) for x, y in triangle], 
+                fill=color_rgba, outline=outline_color, width=2)
+    
+    return img, left, top
+
+
+class SectorOverlayCache:
+    """Guarda los sectores ya renderizados para los últimos tamaños de canvas.
+
+    Cada entrada es (imagen, x, y), tal como la devuelve create_transparent_sector.
+
+    Cada imagen (sector, estado) se dibuja una sola vez por tamaño. Se
+    conservan los max_sizes últimos tamaños y nunca el que está en pantalla
+    (show): mientras se preparan los sectores del tamaño nuevo, los items del
+    canvas siguen mostrando los del anterior y Tk no debe perder esas imágenes.
+    """
+
+    def __init__(self, render, max_sizes=2):
+        self.render = render
+        self.max_sizes = max_sizes
+        self.sizes = OrderedDict()
+        self.shown = None
+
+    def show(self, canvas_width, canvas_height):
+        """Marca el tamaño cuyas imágenes tiene ahora el canvas"""
+        self.shown = (canvas_width, canvas_height)
+
+    def warm(self, canvas_width, canvas_height, states=SECTOR_STATES):
+        """Pre-renderiza los 8 sectores en los estados indicados"""
+        for state in states:
+            for sector in range(8):
+                self.get(canvas_width, canvas_height, sector, state)
+
+    def get(self, canvas_width, canvas_height, sector, state):
+        """Devuelve (imagen, x, y) de un sector, renderizándolo sólo si falta"""
+        size = (canvas_width, canvas_height)
+        images = self.sizes.get(size)
+        if images is None:
+            images = self.sizes[size] = {}
+            while len(self.sizes) > self.max_sizes:
+                del self.sizes[next(old for old in self.sizes if old != self.shown)]
+        else:
+            self.sizes.move_to_end(size)
+        key = (sector, state)
+        image = images.get(key)
+        if image is None:
+            angle_start = sector * 45 - 22.5
+            image = self.render(canvas_width, canvas_height,
+                                canvas_width // 2, canvas_height // 2,
+                                angle_start, angle_start + 45,
+                                **SECTOR_STATES[state])
+            images[key] = image
+        return image
+
+
+class ScaledBackgroundCache:
+    """Guarda el fondo ya escalado por (ancho, alto).
+
+    Se calienta desde el manejador de <Configure>, de modo que las pantallas
+    sólo leen una imagen existente. Conserva los últimos tamaños usados.
+    """
+
+    def __init__(self, max_entries=4):
+        self.source = None
+        self.max_entries = max_entries
+        self.images = OrderedDict()
+        self.scaled_sources = OrderedDict()
+
+    def warm(self, width, height):
+        """Escala y guarda el fondo para un tamaño si aún no existe"""
+        self.get(width, height)
+
+    def _cached(self, cache, key, make):
+        value = cache.get(key)
+        if value is None:
+            value = cache[key] = make()
+            while len(cache) > self.max_entries:
+                cache.popitem(last=False)
+        else:
+            cache.move_to_end(key)
+        return value
+
+    def resize(self, width, height):
+        """Escala el fondo sin tocar la caché; se puede llamar desde otro hilo"""
+        from PIL import Image
+        return self.source.resize((width, height), Image.Resampling.LANCZOS)
+
+    def has_scaled(self, width, height):
+        return (width, height) in self.scaled_sources
+
+    def add_scaled(self, width, height, img):
+        """Guarda un fondo escalado fuera (con resize) para no repetir el trabajo"""
+        self._cached(self.scaled_sources, (width, height), lambda: img)
+
+    def scaled(self, width, height):
+        """Devuelve el fondo escalado como imagen PIL (para componer el estímulo)"""
+        if self.source is None or width <= 0 or height <= 0:
+            return None
+        return self._cached(self.scaled_sources, (width, height),
+                            lambda: self.resize(width, height))
+
+    def get(self, width, height):
+        """Devuelve el fondo para un tamaño, escalándolo sólo si falta"""
+        if self.source is None or width <= 0 or height <= 0:
+            return None
+
+        def photo():
+            from PIL import ImageTk
+            return ImageTk.PhotoImage(self.scaled(width, height))
+
+        return self._cached(self.images, (width, height), photo)
+
+
+def stimulus_layers(trial, size, vehicle_sources, sign_sources, route66_source):
+    """Capas (imagen, x, y) del estímulo de un ensayo para compose_stimulus.
+
+    Con muchas señales los sprites se reducen hasta la separación del ensayo;
+    cada sprite distinto se escala una sola vez.
+    """
+    canvas_width, canvas_height = size
+    center_x, center_y = canvas_width // 2, canvas_height // 2
+    layers = []
+    vehicle = vehicle_sources.get(trial.target_vehicle)
+    if vehicle is not None:
+        layers.append((vehicle, center_x, center_y))
+    scaled = {}
+
+    def fit(img):
+        key = id(img)
+        if key not in scaled:
+            from PIL import Image
+            scale = trial.sprite_scale(canvas_width, canvas_height, max(img.size))
+            if scale < 1.0:
+                size = (max(1, int(img.width * scale)), max(1, int(img.height * scale)))
+                scaled[key] = img.resize(size, Image.LANCZOS)
+            else:
+                scaled[key] = img
+        return scaled[key]
+
+    # Todas las señales; una de ellas es RUTA 66
+    for sign in trial.signs:
+        img = route66_source if sign.is_route66 else sign_sources.get(sign.sign_id)
+        if img is not None:
+            x, y = sign.position(center_x, center_y, canvas_width, canvas_height)
+            layers.append((fit(img), x, y))
+    return layers
+
+
+def compose_stimulus(size, background, layers):
+    """Compone el estímulo completo (fondo, vehículo y señales) en una sola imagen.
+
+    layers son tuplas (imagen RGBA, x, y) con (x, y) en el centro de la
+    imagen, como los items del canvas. El resultado va con anchor="nw" en (0, 0).
+    """
+    from PIL import Image
+    frame = Image.new("RGB", size, STAGE_BG_RGB)
+    if background is not None:
+        if background.mode == "RGBA":
+            frame.paste(background, (0, 0), background)
+        else:
+            frame.paste(background.convert("RGB"), (0, 0))
+    for img, x, y in layers:
+        frame.paste(img, (int(x) - img.width // 2, int(y) - img.height // 2), img)
+    return frame
+
+
+class TrialPrefetcher:
+    """Prepara en un hilo el ensayo siguiente mientras se responde al actual.
+
+    Sólo hay una preparación pendiente a la vez. Cada una lleva la generación
+    vigente al pedirla; invalidate() la incrementa y así lo preparado para
+    una partida o unas imágenes anteriores se descarta sin esperar al hilo.
+    """
+
+    def __init__(self):
+        self.executor = ThreadPoolExecutor(1, thread_name_prefix="Prefetch")
+        self.generation = 0
+        self.pending = None
+
+    def invalidate(self):
+        self.generation += 1
+        if self.pending is not None:
+            self.pending[1].cancel()
+            self.pending = None
+
+    def submit(self, fn, *args):
+        if self.pending is not None:
+            self.pending[1].cancel()
+        self.pending = (self.generation, self.executor.submit(fn, *args))
+
+    def busy(self):
+        """True si hay una preparación vigente que aún no ha terminado"""
+        return (self.pending is not None and self.pending[0] == self.generation
+                and not self.pending[1].done())
+
+    def peek(self):
+        """El resultado ya terminado y vigente, o None (no lo consume)"""
+        if self.pending is None or self.pending[0] != self.generation:
+            return None
+        future = self.pending[1]
+        if not future.done() or future.cancelled():
+            return None
+        try:
+            return future.result()
+        except Exception as e:
+            print(f"Error preparando el ensayo siguiente: {e}")
+            self.pending = None
+            return None
+
+    def take(self):
+        """Consume el resultado terminado y vigente; lo que no esté listo se descarta"""
+        result = self.peek()
+        self.invalidate()
+        return result
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+class StimulusScheduler:
+    """Controla la duración del estímulo con un reloj monotónico.
+
+    El plazo se fija en time.perf_counter_ns al mostrar el estímulo y cada
+    callback de after() recalcula lo que falta, de modo que un callback tardío
+    no se acumula. Se guardan el inicio y el final reales de cada exposición.
+    """
+
+    # Se despierta un poco antes del plazo para corregir el retraso de after()
+    SLACK_MS = 2
 
-class DoubleDecisionGame:
     def __init__(self, root):
         self.root = root
+        self.records = []
+        self.active = False
+        self.deadline_ns = 0
+        self.on_offset = None
+        self.current = None
+
+    def start(self, duration_ms, on_offset, level):
+        """Marca el inicio del estímulo y programa su final"""
+        # Fuerza el dibujo del estímulo antes de tomar la marca de inicio
+        self.root.update_idletasks()
+        onset_ns = time.perf_counter_ns()
+        self.deadline_ns = onset_ns + duration_ms * 1_000_000
+        self.on_offset = on_offset
+        self.current = {
+            "level": level,
+            "requested_ms": duration_ms,
+            "onset_ns": onset_ns,
+            "late_callbacks": 0,
+        }
+        self.active = True
+        self._schedule()
+
+    def remaining_ms(self):
+        """Milisegundos que faltan para el final del estímulo"""
+        return max(0.0, (self.deadline_ns - time.perf_counter_ns()) / 1_000_000)
+
+    def _schedule(self):
+        remaining = self.remaining_ms()
+        if remaining <= 0.5:
+            self._finish()
+            return
+        delay = int(remaining) - self.SLACK_MS
+        self.root.after(max(delay, 1), self._tick)
+
+    def _tick(self):
+        if not self.active:
+            return
+        if time.perf_counter_ns() > self.deadline_ns + 1_000_000:
+            self.current["late_callbacks"] += 1
+        self._schedule()
+
+    def _finish(self):
+        self.active = False
+        self.on_offset()
+        # Fuerza el dibujo de la pantalla siguiente antes de medir el final
+        self.root.update_idletasks()
+        offset_ns = time.perf_counter_ns()
+        record = self.current
+        record["offset_ns"] = offset_ns
+        record["exposure_ms"] = (offset_ns - record["onset_ns"]) / 1_000_000
+        record["error_ms"] = record["exposure_ms"] - record["requested_ms"]
+        self.records.append(record)
+        self.current = None
+
+    def summary(self):
+        """Resumen por nivel: exposiciones, error medio y máximo en ms"""
+        levels = {}
+        for record in self.records:
+            stats = levels.setdefault(record["level"], {
+                "requested_ms": record["requested_ms"], "count": 0,
+                "mean_error_ms": 0.0, "max_error_ms": 0.0,
+            })
+            stats["count"] += 1
+            stats["mean_error_ms"] += (record["error_ms"] - stats["mean_error_ms"]) / stats["count"]
+            stats["max_error_ms"] = max(stats["max_error_ms"], abs(record["error_ms"]))
+        return levels
+
+
+# Alto reservado para el título de la pantalla de selección de sector
+POSITION_HEADER_HEIGHT = 60
+
+DEFAULT_PARTICIPANT = "Invitado"
+DEFAULT_WINDOW_SIZE = (1000, 800)
+# Espera tras el último <Configure> antes de recolocar, y trabajo máximo por
+# pasada al regenerar imágenes para que el bucle de Tk nunca se detenga
+RESIZE_DEBOUNCE_MS = 150
+RELAYOUT_BUDGET_MS = 8
+RELAYOUT_POLL_MS = 15
+# Separación horizontal entre los dos vehículos a elegir
+VEHICLE_SPACING = 200
+# Color de fondo del canvas del estímulo (#1a1a1a)
+STAGE_BG_RGB = (26, 26, 26)
+
+# Cada cuánto se recogen las imágenes decodificadas y cuánto trabajo se hace
+# como mucho en cada pasada, para que el menú siga respondiendo
+ASSET_POLL_MS = 15
+ASSET_POLL_BUDGET_MS = 8
+
+# Como mucho se procesa un movimiento del ratón por fotograma (~60 Hz)
+MOTION_FRAME_MS = 16
+
+
+class DoubleDecisionGame:
+    def __init__(self, root, tracer=None, store=None, trial_log=None, recorder_folder="logs",
+                 seeds=(None, None)):
+        self.root = root
         self.root.title("Ruta 66 - Entrenamiento de Enfoque")
-        self.root.geometry("1000x800")
+        self.root.geometry("{}x{}".format(*DEFAULT_WINDOW_SIZE))
         self.root.configure(bg="#1a1a1a")
         
-        # Sistema de niveles según la narrativa
-        self.level_times = {
-            0: {"vehicle": 1000, "signal": 500, "total": 1500},  # Práctica
-            1: {"vehicle": 800, "signal": 400, "total": 1200},   # Nivel 1
-            2: {"vehicle": 650, "signal": 350, "total": 1000},   # Nivel 2
-            3: {"vehicle": 500, "signal": 300, "total": 800},    # Nivel 3
-            4: {"vehicle": 400, "signal": 250, "total": 650},    # Nivel 4
-            5: {"vehicle": 300, "signal": 200, "total": 500},    # Modo PRO
-            6: {"vehicle": 200, "signal": 150, "total": 350},    # Modo Extremo
-            7: {"vehicle": 150, "signal": 120, "total": 270},    # Nivel Extra 1
-            8: {"vehicle": 120, "signal": 100, "total": 220},    # Nivel Extra 2
-            9: {"vehicle": 100, "signal": 80, "total": 180}      # Nivel Máximo
-        }
-        self.response_time = 2000
-        
-        # Variables del juego
-        self.score = 0
-        self.level = 0
-        self.current_vehicle = None
-        self.route66_position = None
-        self.route66_sector = None  # NUEVO: Para identificar el sector de RUTA 66
-        self.vehicle_options = []
+        self.response_time = RESPONSE_TIME_MS
+        
+        # Variables del juego; la partida en sí la lleva self.engine
+        self.engine = None
+        self.trial = None
         self.game_state = "menu"
         
         # Paths de imágenes
@@ -44,117 +459,477 @@ class DoubleDecisionGame:
         
         # Almacenar imágenes cargadas
         self.vehicle_images = {}
+        self.vehicle_sprites = {}
         self.route66_image = None
-        self.background_image = None
-        self.sector_images = {}
+        self.background_cache = ScaledBackgroundCache()
         self.sector_image_ids = {}
-        self.sign_images = {}
+        self.sector_cache = SectorOverlayCache(self.create_transparent_sector)
+        # Copias PIL de los sprites para componer el estímulo fuera de pantalla
+        self.vehicle_sources = {}
+        self.sign_sources = {}
+        self.route66_source = None
+        self.stimulus_image = None
+        self.stimulus_key = None
+        self.prefetched_frame = None
+        self.prefetcher = TrialPrefetcher()
         
         # Variables para la selección de posición
         self.canvas = None
         self.sector_highlight = None
         self.current_highlighted_sector = -1
+        self.sector_classifier = None
+        self.pending_motion = None
+        self.motion_job = None
         self.response_timer_id = None
-        
-        self.load_images()
-        self.create_menu()
+        self.resize_job = None
+        self.window_size = None
+        self.relayout_steps = None
+        self.relayout_job = None
+        self.layout_executor = ThreadPoolExecutor(1, thread_name_prefix="Layout")
+        self.stimulus_scheduler = StimulusScheduler(self.root)
+        
+        # Traza opcional de fases (DD_TRACE=1 o --trace); sin ella no se envuelve nada
+        self.session_id = uuid.uuid4().hex[:12]
+        self.tracer = tracer if tracer is not None else make_tracer(self.session_id)
+        self.tracer.wrap(self, ("show_preview", "show_stimulus", "show_response_screen",
+                                "show_position_selection", "check_position", "game_over"))
+        self.tracer.wrap(self, ("load_images", "install_asset", "prepare_stimulus",
+                                "ensure_trial_assets"), kind="image")
+        self.tracer.wrap(self.sector_cache, ("render",), kind="image", prefix="sector.")
+        self.tracer.wrap(self.background_cache, ("get",), kind="image", prefix="background.")
+        
+        # Manifiesto de assets y niveles, validado una sola vez; si está roto
+        # se avisa y se juega con los valores de siempre
+        try:
+            self.manifest = load_manifest(self.images_folder)
+        except ManifestError as e:
+            print(f"Manifiesto no válido, se usan los valores por defecto: {e}")
+            self.manifest = parse_manifest(default_manifest_data())
+        # Un único recorrido de las carpetas; los motores parten de lo encontrado
+        self.asset_index = index_assets(self.images_folder, self.manifest)
+        # Con una biblioteca grande sólo se mantienen los sprites del ensayo actual
+        self.lazy_assets = self.asset_index.sprite_count > self.manifest.lazy_threshold
+        self.sprite_cache = None
+        self.failed_assets = set()
+        self.asset_loader = None
+        self.processed_assets = set()
+        self.startup_marks = set()
+        vehicle_ids = self.asset_index.keys("vehicle")
+        sign_ids = self.asset_index.keys("sign")
+        
+        # Escalera de niveles clásica y evaluación adaptativa del umbral
+        # seeds fija las semillas (escalera, adaptativa) al reproducir una sesión
+        level_times = self.manifest.level_times
+        placer = self.manifest.placement
+        self.ladder_engine = TrialEngine(vehicle_ids, sign_ids, seed=seeds[0],
+                                         level_times=level_times, placer=placer)
+        self.adaptive_engine = AdaptiveEngine(vehicle_ids, sign_ids, seed=seeds[1],
+                                              level_times=level_times, placer=placer)
+        self.engine = self.ladder_engine
+        # Las imágenes se decodifican en segundo plano tras mostrar el menú
+        self.asset_jobs = self.startup_asset_jobs()
+        # Grabación binaria de la sesión para poder reproducirla (replay.py)
+        self.recorder = SessionRecorder(self.session_id, self.ladder_engine.seed,
+                                        self.adaptive_engine.seed, folder=recorder_folder)
+        self.recorder.levels(level_times)
+        self.recorder.placement(placer)
+        self.recorder.assets(vehicle_ids, sign_ids)
+        
+        # Registro por ensayo: respuestas, tiempos de reacción y distribución
+        self.trial_log = trial_log if trial_log is not None else TrialLog()
+        # Sesiones, ensayos y mejores marcas en SQLite (escritura en segundo plano)
+        self.store = store if store is not None else ScoreStore()
+        self.store.start_session(self.session_id, self.engine.seed)
+        self.participant = DEFAULT_PARTICIPANT
+        self.history = None
+        # Se activa cuando la última partida está en la base; hasta entonces
+        # el historial en memoria (apply_game) es más reciente que la base
+        self.history_written = None
+        self.game_trials = 0
+        self.event_clock = EventClock()
+        self.trial_record = None
+        self.countdown = None
+        self.countdown_job = None
+        self.build_scenes()
+        self.show_menu()
+        
+        self.root.bind("<Configure>", self.on_window_configure)
+        self.scenes["menu"].bind("<Expose>", self.on_first_expose)
+        self.start_asset_loading()
+        self.tracer.start_heartbeat(self.root)
+
+    @property
+    def score(self):
+        return self.engine.score
+
+    @property
+    def level(self):
+        return self.engine.level
 
     def get_canvas_dimensions(self):
-        """Obtiene las dimensiones actuales de la ventana"""
-        self.root.update_idletasks()
+        """Obtiene las dimensiones actuales de la ventana.
+
+        Usa el tamaño del último <Configure>, sin forzar update_idletasks.
+        """
+        if self.window_size is not None:
+            return self.window_size
         width = self.root.winfo_width()
         height = self.root.winfo_height()
+        if width <= 1 or height <= 1:
+            # La ventana aún no se ha mostrado
+            return DEFAULT_WINDOW_SIZE
         return width, height
 
     def get_scaled_background(self, width, height):
-        """Redimensiona el fondo al tamaño actual de la ventana"""
-        if hasattr(self, 'background_pil') and self.background_pil:
-            img = self.background_pil.resize((width, height), Image.Resampling.LANCZOS)
-            return ImageTk.PhotoImage(img)
-        return None
+        """Devuelve el fondo al tamaño actual de la ventana (cacheado)"""
+        return self.background_cache.get(width, height)
+
+    def on_window_configure(self, event):
+        """Agrupa los eventos de redimensionado y recoloca todo al final"""
+        if event.widget is not self.root:
+            return
+        if (event.width, event.height) == self.window_size:
+            return
+        self.window_size = (event.width, event.height)
+        if self.resize_job is not None:
+            self.root.after_cancel(self.resize_job)
+        self.resize_job = self.root.after(RESIZE_DEBOUNCE_MS, self.relayout)
+
+    def relayout(self):
+        """Recoloca los items para el tamaño actual y regenera después las imágenes.
+
+        Centro, radios y clasificador de sectores cambian en el acto, así que
+        el ratón vuelve a coincidir con lo dibujado enseguida; fondos y sectores
+        se renderizan por partes en pasadas sucesivas del bucle de Tk.
+        """
+        self.resize_job = None
+        width, height = self.get_canvas_dimensions()
+        if width <= 1 or height <= POSITION_HEADER_HEIGHT:
+            return
+        self.layout_stage(update_images=False)
+        self.layout_position(update_images=False)
+        self.relayout_steps = self.iter_relayout_images()
+        if self.relayout_job is None:
+            self.relayout_job = self.root.after_idle(self.run_relayout_steps)
+
+    def iter_relayout_images(self):
+        """Pasos de regeneración de imágenes; primero los de la pantalla visible.
+
+        Cada paso cede None, o un Future si hay que esperar a un hilo.
+        """
+        stage_width, stage_height = self.stage_size
+        position_width, position_height = self.position_size
+        
+        def background_steps(width, height):
+            cache = self.background_cache
+            if cache.source is None:
+                return
+            if not cache.has_scaled(width, height):
+                # El escalado LANCZOS es lo más caro y PIL suelta el GIL: va a otro hilo
+                future = self.layout_executor.submit(cache.resize, width, height)
+                while not future.done():
+                    yield future
+                cache.add_scaled(width, height, future.result())
+            cache.warm(width, height)
+            yield
+        
+        def stage_steps():
+            yield from background_steps(stage_width, stage_height)
+            self.update_stage_images()
+            if self.game_state == "preview":
+                # El estímulo ya compuesto era para el tamaño anterior
+                self.prepare_stimulus()
+                yield
+        
+        def position_steps():
+            yield from background_steps(position_width, position_height)
+            for state in ("normal", "hover"):
+                for sector in range(8):
+                    self.sector_cache.get(position_width, position_height, sector, state)
+                    yield
+            self.update_position_images()
+        
+        if self.game_state == "position":
+            yield from position_steps()
+            yield from stage_steps()
+        else:
+            yield from stage_steps()
+            yield from position_steps()
+
+    def run_relayout_steps(self):
+        """Ejecuta pasos de regeneración hasta agotar el presupuesto de esta pasada"""
+        self.relayout_job = None
+        steps = self.relayout_steps
+        if steps is None:
+            return
+        deadline = perf_ms() + RELAYOUT_BUDGET_MS
+        for waiting in steps:
+            if waiting is not None:
+                self.relayout_job = self.root.after(RELAYOUT_POLL_MS, self.run_relayout_steps)
+                return
+            if perf_ms() >= deadline:
+                self.relayout_job = self.root.after(1, self.run_relayout_steps)
+                return
+        if steps is self.relayout_steps:
+            self.relayout_steps = None
+
+    def warm_caches(self):
+        """Prepara fondo y sectores para el tamaño actual, sin bloquear el bucle de Tk"""
+        self.relayout()
 
     def create_transparent_sector(self, canvas_width, canvas_height, center_x, center_y, 
                                 angle_start, angle_end, color_rgb, alpha, is_highlighted=False):
-        """Crea un sector triangular con transparencia real usando PIL"""
-        img = Image.new('RGBA', (canvas_width, canvas_height), (0, 0, 0, 0))
-        draw = ImageDraw.Draw(img)
-        
-        max_distance = max(canvas_width, canvas_height)
-        
-        rad_start = math.radians(angle_start)
-        rad_end = math.radians(angle_end)
-        
-        x1 = center_x + max_distance * math.cos(rad_start)
-        y1 = center_y + max_distance * math.sin(rad_start)
-        x2 = center_x + max_distance * math.cos(rad_end)
-        y2 = center_y + max_distance * math.sin(rad_end)
-        
-        if is_highlighted:
-            color_rgba = (255, 204, 136, alpha)
-            outline_color = (255, 204, 0, 255)
-        else:
-            color_rgba = (*color_rgb, alpha)
-            outline_color = (68, 68, 68, 180)
-        
-        draw.polygon([(center_x, center_y), (x1, y1), (x2, y2)], 
-                    fill=color_rgba, outline=outline_color, width=2)
-        
-        return ImageTk.PhotoImage(img)
+        """Crea un sector triangular con transparencia real usando PIL.
+
+        Devuelve (imagen, x, y): la imagen sólo cubre la caja del sector y
+        debe colocarse con anchor="nw" en (x, y).
+        """
+        from PIL import ImageTk
+        img, left, top = render_sector_image(canvas_width, canvas_height, center_x, center_y,
+                                             angle_start, angle_end, color_rgb, alpha,
+                                             is_highlighted)
+        return ImageTk.PhotoImage(img), left, top
+    
+    def startup_asset_jobs(self):
+        """Imágenes a cargar al arrancar: todas, o con una biblioteca grande sólo
+        el fondo, RUTA 66 y los sprites del primer ensayo"""
+        if not self.lazy_assets:
+            return scan_assets(self.images_folder, self.asset_index)
+        jobs = (asset_job(self.asset_index, kind, key)
+                for kind, key in self.trial_assets(self.next_ladder_trial()))
+        return [job for job in jobs if job is not None]
     
     def load_images(self):
-        """Carga todas las imágenes necesarias"""
-        try:
-            for i in range(1, 9):
-                try:
-                    img_path = os.path.join(self.vehicles_folder, f"vehicle{i}.png")
-                    if os.path.exists(img_path):
-                        img = Image.open(img_path)
-                        img = img.resize((150, 150), Image.Resampling.LANCZOS)
-                        self.vehicle_images[i-1] = ImageTk.PhotoImage(img)
-                except Exception as e:
-                    print(f"Error cargando vehicle{i}.png: {e}")
-            
+        """Carga todas las imágenes esperando a que terminen de decodificarse"""
+        loader = AssetLoader(self.images_folder, self.asset_jobs)
+        loader.start()
+        for job, result, error in iter(loader.results.get, None):
+            if error is not None:
+                self.failed_assets.add((job.kind, job.key))
+                print(f"Error cargando {job.name}: {error}")
+            else:
+                self.install_asset(job, result)
+    
+    def start_asset_loading(self):
+        """Decodifica las imágenes en segundo plano, primero las del primer ensayo"""
+        needed = self.trial_assets(self.next_ladder_trial())
+        jobs = sorted(self.asset_jobs, key=lambda job: (job.kind, job.key) not in needed)
+        self.asset_loader = AssetLoader(self.images_folder, jobs)
+        self.asset_loader.start()
+        self.update_loading_progress()
+        self.root.after(ASSET_POLL_MS, self.poll_assets)
+    
+    def poll_assets(self):
+        """Crea en el hilo de Tk los PhotoImage de lo que ya está decodificado"""
+        loader = self.asset_loader
+        deadline = perf_ms() + ASSET_POLL_BUDGET_MS
+        finished = False
+        while perf_ms() < deadline:
             try:
-                route66_path = os.path.join(self.signs_folder, "route66.png")
-                if os.path.exists(route66_path):
-                    img = Image.open(route66_path)
-                    img = img.resize((80, 80), Image.Resampling.LANCZOS)
-                    self.route66_image = ImageTk.PhotoImage(img)
-            except Exception as e:
-                print(f"Error cargando route66.png: {e}")
-            
-            for i in range(1, 8):
-                try:
-                    sign_path = os.path.join(self.signs_folder, f"sign{i}.png")
-                    if os.path.exists(sign_path):
-                        img = Image.open(sign_path)
-                        img = img.resize((70, 70), Image.Resampling.LANCZOS)
-                        self.sign_images[i-1] = ImageTk.PhotoImage(img)
-                except Exception as e:
-                    print(f"Error cargando sign{i}.png: {e}")
-            
+                item = loader.results.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                finished = True
+                break
+            job, result, error = item
+            self.processed_assets.add((job.kind, job.key))
+            if error is not None:
+                # Un asset roto no detiene la carga del resto
+                self.failed_assets.add((job.kind, job.key))
+                print(f"Error cargando {job.name}: {error}")
+            else:
+                self.install_asset(job, result)
+        if finished:
+            self.finish_asset_loading()
+        else:
+            self.update_loading_progress()
+            self.root.after(ASSET_POLL_MS, self.poll_assets)
+    
+    def install_asset(self, job, result):
+        """Crea los PhotoImage de una imagen ya decodificada (sólo en el hilo de Tk)"""
+        from PIL import ImageTk
+        if job.kind == "vehicle":
+            normal_img, glow_img = result
+            normal = ImageTk.PhotoImage(normal_img)
+            glow = ImageTk.PhotoImage(glow_img)
+            self.vehicle_images[job.key] = normal
+            self.vehicle_sources[job.key] = normal_img
+            # La selección usa el mismo halo que el resaltado
+            self.vehicle_sprites[job.key] = {
+                "normal": normal,
+                "hover": glow,
+                "selected": glow,
+            }
+        elif job.kind == "route66":
+            self.route66_image = ImageTk.PhotoImage(result)
+            self.route66_source = result
+        elif job.kind == "sign":
+            # Las señales sólo se dibujan dentro del estímulo compuesto
+            self.sign_sources[job.key] = result
+        elif job.kind == "background":
+            self.background_cache.source = result
+    
+    def is_resident(self, kind, key):
+        sources = self.vehicle_sources if kind == "vehicle" else self.sign_sources
+        return key in sources
+    
+    def missing_asset_jobs(self, trial):
+        """Sprites de un ensayo que no están cargados (sólo con carga perezosa)"""
+        if not self.lazy_assets:
+            return []
+        jobs = []
+        for kind, key in self.trial_assets(trial):
+            if (kind in ("vehicle", "sign") and (kind, key) not in self.failed_assets
+                    and not self.is_resident(kind, key)):
+                job = asset_job(self.asset_index, kind, key)
+                if job is not None:
+                    jobs.append(job)
+        return jobs
+    
+    def get_sprite_cache(self):
+        """Caché de sprites para las cargas bajo demanda; se crea en el hilo de Tk"""
+        if self.sprite_cache is None:
+            from sprite_cache import SpriteCache
+            self.sprite_cache = SpriteCache(self.images_folder)
+        return self.sprite_cache
+    
+    def decode_missing(self, trial, sprite_cache):
+        """Decodifica los sprites que le faltan a un ensayo; vale para cualquier hilo"""
+        decoded = []
+        for job in self.missing_asset_jobs(trial):
             try:
-                bg_path = os.path.join(self.backgrounds_folder, "road_background.png")
-                if os.path.exists(bg_path):
-                    self.background_pil = Image.open(bg_path)
+                decoded.append((job, decode_asset(job, sprite_cache)))
+            except Exception:
+                # ensure_trial_assets lo reintenta en el hilo de Tk y anota el fallo
+                continue
+        return decoded
+    
+    def ensure_trial_assets(self, trial, decoded=()):
+        """Deja cargados sólo los sprites del ensayo actual.
+
+        decoded trae lo que ya decodificó el hilo de preparación; lo que aún
+        falte se carga aquí mismo. Sin carga perezosa no hace nada.
+        """
+        if not self.lazy_assets:
+            return
+        for job, result in decoded:
+            if not self.is_resident(job.kind, job.key):
+                self.install_asset(job, result)
+        failed = False
+        for job in self.missing_asset_jobs(trial):
+            try:
+                self.install_asset(job, decode_asset(job, self.get_sprite_cache()))
             except Exception as e:
-                print(f"Error cargando road_background.png: {e}")
-                self.background_pil = None
-                
-        except Exception as e:
-            print(f"Error general cargando imágenes: {e}")
+                self.failed_assets.add((job.kind, job.key))
+                print(f"Error cargando {job.name}: {e}")
+                failed = True
+        if failed:
+            # Este ensayo sale sin ese sprite; los siguientes ya no lo eligen
+            self.update_engine_assets()
+        keep = self.trial_assets(trial)
+        for key in [key for key in self.vehicle_sources if ("vehicle", key) not in keep]:
+            del self.vehicle_sources[key]
+            self.vehicle_images.pop(key, None)
+            self.vehicle_sprites.pop(key, None)
+        for key in [key for key in self.sign_sources if ("sign", key) not in keep]:
+            del self.sign_sources[key]
+    
+    def update_engine_assets(self):
+        """Los ensayos sólo usan las imágenes que se pudieron cargar"""
+        index = self.asset_index
+        for engine in (self.ladder_engine, self.adaptive_engine):
+            engine.vehicle_ids = [key for key in index.keys("vehicle")
+                                  if ("vehicle", key) not in self.failed_assets]
+            engine.sign_ids = [key for key in index.keys("sign")
+                               if ("sign", key) not in self.failed_assets]
+        self.recorder.assets(self.ladder_engine.vehicle_ids, self.ladder_engine.sign_ids)
+        self.prefetcher.invalidate()
+    
+    def finish_asset_loading(self):
+        self.asset_loader = None
+        self.update_engine_assets()
+        # Las pantallas pudieron colocarse antes de tener el fondo
+        self.stage_images_size = self.position_images_size = None
+        self.tracer.mark("startup", "assets_loaded", perf_ms() - PROCESS_START_MS)
+        self.update_loading_progress()
+        self.warm_caches()
+    
+    def next_ladder_trial(self):
+        """El ensayo que presentará la escalera al pulsar INICIAR VIAJE"""
+        engine = self.ladder_engine
+        return engine.build_trial(engine.trial_index, engine.level)
+    
+    def trial_assets(self, trial):
+        """Imágenes (tipo, clave) que necesita un ensayo"""
+        needed = {("background", None), ("route66", None)}
+        needed.update(("vehicle", vehicle) for vehicle in trial.vehicle_options)
+        needed.update(("sign", sign.sign_id) for sign in trial.signs if not sign.is_route66)
+        return needed
+    
+    def assets_ready(self, adaptive=False):
+        """True si ya se puede empezar: la evaluación adaptativa espera a todo"""
+        if self.asset_loader is None:
+            return True
+        if adaptive:
+            return False
+        available = {(job.kind, job.key) for job in self.asset_jobs}
+        return self.trial_assets(self.next_ladder_trial()) & available <= self.processed_assets
+    
+    def update_loading_progress(self):
+        """Barra de progreso del menú y botones de inicio según lo ya cargado"""
+        if self.asset_loader is None:
+            self.loading_bar.pack_forget()
+            self.loading_label.pack_forget()
+        else:
+            done, total = len(self.processed_assets), len(self.asset_jobs)
+            self.loading_bar.config(maximum=max(total, 1), value=done)
+            self.loading_label.config(text=f"Cargando imágenes... {done}/{total}")
+        for button, adaptive in ((self.start_btn, False), (self.adaptive_btn, True)):
+            button.config(state="normal" if self.assets_ready(adaptive) else "disabled")
+        if self.asset_loader is None or self.assets_ready():
+            if "first_trial_ready" not in self.startup_marks:
+                self.startup_marks.add("first_trial_ready")
+                self.tracer.mark("startup", "first_trial_ready", perf_ms() - PROCESS_START_MS)
+    
+    def on_first_expose(self, event):
+        """Anota cuándo se dibujó el menú por primera vez"""
+        self.scenes["menu"].unbind("<Expose>")
+        self.tracer.mark("startup", "first_pixel", perf_ms() - PROCESS_START_MS)
     
     def get_num_total_signs(self):
         """Calcula el número total de señales según el nivel"""
-        # Progresión: 3, 5, 7, 9, 11, 13, 15, 17, 19, 21+ señales
-        num_signs = 3 + (self.level * 2)
-        return num_signs
+        return self.engine.num_signs(self.level)
     
-    def create_menu(self):
-        self.clear_screen()
-        
-        bg_frame = tk.Frame(self.root, bg="#1a1a1a")
-        bg_frame.pack(fill="both", expand=True)
+    def build_scenes(self):
+        """Construye una sola vez todas las pantallas del juego.
+
+        Cada pantalla es un Frame apilado en la misma celda de la ventana; las
+        fases sólo actualizan sus widgets e items y la traen al frente.
+        """
+        self.root.grid_rowconfigure(0, weight=1)
+        self.root.grid_columnconfigure(0, weight=1)
+        self.scenes = {}
+        self.build_menu_scene()
+        self.build_preview_scene()
+        self.build_stage_scene()
+        self.build_position_scene()
+        self.build_game_over_scene()
+
+    def add_scene(self, name):
+        frame = tk.Frame(self.root, bg="#1a1a1a")
+        frame.grid(row=0, column=0, sticky="nsew")
+        self.scenes[name] = frame
+        return frame
+
+    def show_scene(self, name):
+        """Trae al frente una pantalla ya construida"""
+        self.cancel_countdown()
+        self.game_state = name
+        self.scenes[name].tkraise()
+
+    def build_menu_scene(self):
+        bg_frame = self.add_scene("menu")
         
         title_frame = tk.Frame(bg_frame, bg="#1a1a1a")
         title_frame.pack(pady=40)
@@ -170,36 +945,68 @@ class DoubleDecisionGame:
         info_card = tk.Frame(bg_frame, bg="#2a2a2a", relief="raised", bd=2)
         info_card.pack(pady=20, padx=100, fill="x")
         
-        total_signs = self.get_num_total_signs()
-        
-        tk.Label(info_card, 
-                text=f"Entrena tu visión periférica mientras conduces por la legendaria Ruta 66.\n"
-                     f"Mantén el enfoque en el vehículo central y detecta las señales de peligro.\n\n"
-                     f"Nivel actual: {total_signs} señales en pantalla",
+        self.menu_info_label = tk.Label(info_card, 
                 font=("Arial", 14), 
                 bg="#2a2a2a", fg="#cccccc", justify="center",
-                pady=20).pack()
+                pady=20)
+        self.menu_info_label.pack()
         
         stats_frame = tk.Frame(bg_frame, bg="#1a1a1a")
         stats_frame.pack(pady=20)
         
-        tk.Label(stats_frame, text=f"NIVEL ACTUAL: {self.level + 1}", 
+        self.menu_level_label = tk.Label(stats_frame, 
                 font=("Arial", 16, "bold"), 
-                bg="#1a1a1a", fg="#ffcc00").pack(side="left", padx=20)
+                bg="#1a1a1a", fg="#ffcc00")
+        self.menu_level_label.pack(side="left", padx=20)
         
-        tk.Label(stats_frame, text=f"PUNTUACIÓN: {self.score}", 
+        self.menu_score_label = tk.Label(stats_frame, 
                 font=("Arial", 16, "bold"), 
-                bg="#1a1a1a", fg="#44ff44").pack(side="left", padx=20)
+                bg="#1a1a1a", fg="#44ff44")
+        self.menu_score_label.pack(side="left", padx=20)
         
-        start_btn = tk.Button(bg_frame, text="INICIAR VIAJE", 
+        participant_frame = tk.Frame(bg_frame, bg="#1a1a1a")
+        participant_frame.pack()
+        
+        tk.Label(participant_frame, text="PARTICIPANTE:", 
+                font=("Arial", 14, "bold"), 
+                bg="#1a1a1a", fg="#ffffff").pack(side="left", padx=10)
+        
+        self.participant_entry = tk.Entry(participant_frame, font=("Arial", 14), width=20,
+                                          bg="#2a2a2a", fg="#ffffff", insertbackground="#ffffff")
+        self.participant_entry.insert(0, self.participant)
+        self.participant_entry.pack(side="left")
+        self.participant_entry.bind("<Return>", lambda event: self.select_participant())
+        self.participant_entry.bind("<FocusOut>", lambda event: self.select_participant())
+        
+        self.menu_history_label = tk.Label(bg_frame, 
+                font=("Arial", 11), 
+                bg="#1a1a1a", fg="#888888", justify="center")
+        self.menu_history_label.pack(pady=5)
+        
+        self.start_btn = start_btn = tk.Button(bg_frame, text="INICIAR VIAJE", 
                              font=("Arial", 20, "bold"),
                              bg="#ffcc00", fg="#000000",
-                             command=self.start_game,
+                             command=lambda: self.start_mode(adaptive=False),
                              padx=40, pady=15,
                              cursor="hand2",
                              relief="raised",
                              bd=4)
-        start_btn.pack(pady=30)
+        start_btn.pack(pady=(30, 10))
+        
+        self.adaptive_btn = adaptive_btn = tk.Button(bg_frame, text="EVALUACIÓN ADAPTATIVA", 
+                                font=("Arial", 14, "bold"),
+                                bg="#2a2a2a", fg="#ffcc00",
+                                command=lambda: self.start_mode(adaptive=True),
+                                padx=20, pady=8,
+                                cursor="hand2")
+        adaptive_btn.pack(pady=(0, 10))
+        
+        # Progreso de la carga de imágenes; desaparece al terminar
+        self.loading_bar = ttk.Progressbar(bg_frame, length=300, mode="determinate")
+        self.loading_bar.pack()
+        self.loading_label = tk.Label(bg_frame, font=("Arial", 10), 
+                                      bg="#1a1a1a", fg="#888888")
+        self.loading_label.pack()
         
         controls_info = tk.Label(bg_frame, 
                                text="🎯 OBJETIVO: Identifica el vehículo y recuerda el SECTOR de la señal RUTA 66\n"
@@ -208,575 +1015,783 @@ class DoubleDecisionGame:
                                bg="#1a1a1a", fg="#888888",
                                justify="center")
         controls_info.pack(pady=20)
+
+    def show_menu(self):
+        total_signs = self.get_num_total_signs()
+        self.menu_info_label.config(
+            text=f"Entrena tu visión periférica mientras conduces por la legendaria Ruta 66.\n"
+                 f"Mantén el enfoque en el vehículo central y detecta las señales de peligro.\n\n"
+                 f"Nivel actual: {total_signs} señales en pantalla")
+        self.menu_level_label.config(text=f"NIVEL ACTUAL: {self.level + 1}")
+        self.menu_score_label.config(text=f"PUNTUACIÓN: {self.score}")
+        self.refresh_history()
+        self.prefetcher.invalidate()
+        self.recorder.phase("menu")
+        self.show_scene("menu")
     
-    def clear_screen(self):
-        for widget in self.root.winfo_children():
-            widget.destroy()
+    def select_participant(self):
+        """Cambia de participante; una partida a medias no pasa al siguiente"""
+        name = self.participant_entry.get().strip() or DEFAULT_PARTICIPANT
+        if name == self.participant:
+            return
+        self.participant = name
+        self.ladder_engine.reset()
+        self.adaptive_engine.reset()
+        self.recorder.reset("ladder")
+        self.recorder.reset("adaptive")
+        self.game_trials = 0
+        self.menu_level_label.config(text=f"NIVEL ACTUAL: {self.level + 1}")
+        self.menu_score_label.config(text=f"PUNTUACIÓN: {self.score}")
+        self.refresh_history()
+    
+    def refresh_history(self):
+        """Lee del almacén el historial del participante actual.
+
+        Si el escritor aún no ha guardado la última partida de ese participante
+        se sigue mostrando el historial en memoria, que ya la incluye.
+        """
+        pending = self.history_written is not None and not self.history_written.is_set()
+        if pending and self.history and self.history["participant"] == self.participant:
+            pass
+        else:
+            if pending:
+                # Otro participante: se lee la base ya con la partida guardada
+                self.history_written.wait(2.0)
+            self.history = self.store.history(self.participant)
+            self.history_written = None
+        self.menu_history_label.config(text=self.format_history(self.history))
+    
+    def format_history(self, history):
+        lines = []
+        best = history["best"]
+        if best:
+            lines.append(f"Récord de {history['participant']}: {best['best_score']} puntos "
+                         f"(nivel {best['best_level'] + 1}) en {best['games']} partidas")
+        if history["recent"]:
+            lines.append("Últimas partidas: " + ", ".join(
+                f"{game['score']} pts/N{game['level'] + 1}" for game in history["recent"]))
+        leader = history["leader"]
+        if leader:
+            lines.append(f"Récord general: {leader['participant']} con {leader['best_score']} puntos")
+        return "\n".join(lines)
+    
+    def start_mode(self, adaptive):
+        """Empieza desde el menú la escalera de niveles o la evaluación adaptativa"""
+        if not self.assets_ready(adaptive):
+            return
+        self.engine = self.adaptive_engine if adaptive else self.ladder_engine
+        self.recorder.mode(self.engine.mode)
+        # Una evaluación terminada no se continúa: se empieza otra
+        if adaptive and self.engine.stage == "over":
+            self.engine.reset()
+            self.recorder.reset(self.engine.mode)
+        self.start_game()
     
     def start_game(self):
-        self.game_state = "preview"
+        self.select_participant()
         self.show_preview()
-    
-    def show_preview(self):
-        self.clear_screen()
+
+    def build_preview_scene(self):
+        scene = self.add_scene("preview")
         
-        info_frame = tk.Frame(self.root, bg="#1a1a1a")
+        info_frame = tk.Frame(scene, bg="#1a1a1a")
         info_frame.pack(pady=10)
         
-        total_signs = self.get_num_total_signs()
-        
-        tk.Label(info_frame, 
-                text=f"Nivel: {self.level + 1} | Puntuación: {self.score} | Señales: {total_signs}", 
-                font=("Arial", 16), bg="#1a1a1a", fg="#ffffff").pack()
+        self.preview_info_label = tk.Label(info_frame, 
+                font=("Arial", 16), bg="#1a1a1a", fg="#ffffff")
+        self.preview_info_label.pack()
         
-        tk.Label(self.root, text="Memoriza estos vehículos:", 
+        tk.Label(scene, text="Memoriza estos vehículos:", 
                 font=("Arial", 18, "bold"), 
                 bg="#1a1a1a", fg="#ffcc00").pack(pady=20)
         
-        available_vehicles = list(self.vehicle_images.keys())
-        self.vehicle_options = random.sample(available_vehicles, 
-                                            min(2, len(available_vehicles)))
-        
-        preview_frame = tk.Frame(self.root, bg="#1a1a1a")
+        preview_frame = tk.Frame(scene, bg="#1a1a1a")
         preview_frame.pack(pady=20)
         
-        for vehicle_idx in self.vehicle_options:
+        # Un hueco por vehículo a elegir; cada ensayo sólo cambia su imagen
+        self.preview_vehicle_labels = []
+        for _ in range(2):
             vehicle_frame = tk.Frame(preview_frame, bg="#2a2a2a", 
                                     highlightbackground="#ffcc00", 
                                     highlightthickness=3)
             vehicle_frame.pack(side="left", padx=40)
             
-            if vehicle_idx in self.vehicle_images:
-                img_label = tk.Label(vehicle_frame, 
-                                    image=self.vehicle_images[vehicle_idx],
-                                    bg="#2a2a2a")
-                img_label.pack(padx=20, pady=20)
+            img_label = tk.Label(vehicle_frame, bg="#2a2a2a")
+            img_label.pack(padx=20, pady=20)
+            self.preview_vehicle_labels.append(img_label)
         
-        continue_btn = tk.Button(self.root, text="¡LISTO! Continuar", 
+        continue_btn = tk.Button(scene, text="¡LISTO! Continuar", 
                                 font=("Arial", 16, "bold"),
                                 bg="#44ff44", fg="#000000",
                                 command=self.show_stimulus,
                                 padx=20, pady=10,
                                 cursor="hand2")
         continue_btn.pack(pady=40)
+    
+    def show_preview(self):
+        # El ensayo completo (vehículos, señales y RUTA 66) sale del motor; si
+        # ya se preparó durante el ensayo anterior y sigue siendo el que toca,
+        # se usa ese junto con su estímulo compuesto
+        prepared = self.prefetcher.take()
+        if prepared is not None and not self.prefetch_valid(prepared):
+            prepared = None
+        self.trial = self.engine.new_trial(prepared[1] if prepared else None)
+        self.prefetched_frame = prepared
+        self.recorder.trial(self.trial)
+        # Después de grabar el ensayo: si falla un sprite, el cambio de imágenes
+        # disponibles se graba para los ensayos siguientes
+        self.ensure_trial_assets(self.trial, prepared[4] if prepared else ())
+        self.recorder.phase("preview")
+        self.begin_trial_record()
+        
+        total_signs = len(self.trial.signs)
+        self.preview_info_label.config(
+            text=f"Nivel: {self.level + 1} | Puntuación: {self.score} | Señales: {total_signs}")
+        
+        options = self.trial.vehicle_options
+        for slot, img_label in enumerate(self.preview_vehicle_labels):
+            vehicle_idx = options[slot] if slot < len(options) else None
+            img_label.config(image=self.vehicle_images.get(vehicle_idx, ""))
+        
+        self.show_scene("preview")
+        # El estímulo se compone mientras el participante mira la vista previa
+        self.root.after_idle(self.prepare_stimulus)
 
-    def show_stimulus(self):
-        self.clear_screen()
-        
-        self.current_vehicle = random.choice(self.vehicle_options)
-        
+    def build_stage_scene(self):
+        """Canvas compartido por el estímulo y la elección de vehículo.
+
+        Todos los items existen desde el principio; cada fase los mueve con
+        coords, cambia su imagen o los oculta con state="hidden".
+        """
+        scene = self.add_scene("stage")
+        self.stage_canvas = tk.Canvas(scene, bg="#1a1a1a", highlightthickness=0)
+        self.stage_canvas.pack(fill="both", expand=True)
+        canvas = self.stage_canvas
+        
+        self.stage_size = None
+        self.stage_images_size = None
+        self.stage_background_image = None
+        self.stage_background_id = canvas.create_image(0, 0, tags="background")
+        # El estímulo completo es una sola imagen compuesta antes de mostrarse
+        self.stage_stimulus_id = canvas.create_image(0, 0, anchor="nw", state="hidden",
+                                                     tags="stimulus")
+        
+        self.choice_item_ids = []
+        self.choice_vehicles = [None, None]
+        for slot in range(2):
+            tag = f"choice_{slot}"
+            self.choice_item_ids.append(canvas.create_image(0, 0, state="hidden",
+                                                            tags=(tag, "response")))
+            canvas.tag_bind(tag, "<Button-1>", 
+                           lambda event, s=slot: self.check_vehicle(self.choice_vehicles[s], event))
+            canvas.tag_bind(tag, "<Enter>", 
+                           lambda event, s=slot: self.highlight_vehicle(self.choice_vehicles[s]))
+            canvas.tag_bind(tag, "<Leave>", 
+                           lambda event, s=slot: self.unhighlight_vehicle(self.choice_vehicles[s]))
+        
+        self.stage_timer_id = canvas.create_text(0, 50, font=("Arial", 16, "bold"),
+                                                 fill="#ffcc00", tags="timer")
+        self.vehicle_positions = {}
+
+    def layout_stage(self, update_images=True):
+        """Recoloca los items del estímulo y la elección si cambió el tamaño de la ventana"""
         canvas_width, canvas_height = self.get_canvas_dimensions()
+        if self.stage_size != (canvas_width, canvas_height):
+            self.stage_size = (canvas_width, canvas_height)
+            canvas = self.stage_canvas
+            center_x, center_y = canvas_width // 2, canvas_height // 2
+            canvas.coords(self.stage_background_id, center_x, center_y)
+            canvas.coords(self.stage_timer_id, canvas_width // 2, 50)
+            for slot, item_id in enumerate(self.choice_item_ids):
+                canvas.coords(item_id, self.choice_x(slot, center_x), center_y)
+            for slot, vehicle_idx in enumerate(self.choice_vehicles):
+                if vehicle_idx in self.vehicle_positions:
+                    self.vehicle_positions[vehicle_idx].update(
+                        x=self.choice_x(slot, center_x), y=center_y)
+        if update_images:
+            self.update_stage_images()
+        return canvas_width, canvas_height
+
+    def update_stage_images(self):
+        """Pone el fondo escalado al tamaño actual del estímulo"""
+        if self.stage_images_size == self.stage_size:
+            return
+        self.stage_images_size = self.stage_size
+        self.stage_background_image = self.get_scaled_background(*self.stage_size)
+        self.stage_canvas.itemconfig(self.stage_background_id,
+                                     image=self.stage_background_image or "")
+
+    def choice_x(self, slot, center_x):
+        return center_x + (slot - 0.5) * VEHICLE_SPACING
+
+    def prepare_stimulus(self):
+        """Compone fuera de pantalla el estímulo del ensayo actual para el tamaño actual"""
+        trial = self.trial
+        if trial is None:
+            return
+        canvas_width, canvas_height = self.layout_stage()
+        key = (trial, canvas_width, canvas_height)
+        if self.stimulus_key == key:
+            return
+        prepared, self.prefetched_frame = self.prefetched_frame, None
+        if prepared is not None and prepared[1] is trial and prepared[2] == (canvas_width,
+                                                                             canvas_height):
+            frame = prepared[3]
+        else:
+            frame = self.render_stimulus(trial, (canvas_width, canvas_height),
+                                         self.background_cache.scaled(canvas_width, canvas_height))
+        
+        # Sólo la creación del PhotoImage tiene que ocurrir en el hilo de Tk
+        from PIL import ImageTk
+        self.stimulus_image = ImageTk.PhotoImage(frame)
+        self.stage_canvas.itemconfig(self.stage_stimulus_id, image=self.stimulus_image)
+        self.stimulus_key = key
+
+    def render_stimulus(self, trial, size, background, decoded=()):
+        """Imagen PIL del estímulo de un ensayo; no toca Tk, vale para cualquier hilo.
+
+        decoded son sprites (job, imagen) aún sin instalar, de la carga perezosa.
+        """
+        vehicle_sources, sign_sources = self.vehicle_sources, self.sign_sources
+        if decoded:
+            vehicle_sources, sign_sources = dict(vehicle_sources), dict(sign_sources)
+            for job, result in decoded:
+                if job.kind == "vehicle":
+                    vehicle_sources[job.key] = result[0]
+                else:
+                    sign_sources[job.key] = result
+        layers = stimulus_layers(trial, size, vehicle_sources, sign_sources, self.route66_source)
+        return compose_stimulus(size, background, layers)
+
+    def prefetch_next_trial(self):
+        """Prepara en segundo plano el ensayo siguiente y su estímulo compuesto"""
+        size = self.stage_size
+        if size is None or self.asset_loader is not None or self.prefetcher.busy():
+            return
+        ready = self.prefetcher.peek()
+        if ready is not None and self.prefetch_valid(ready):
+            return
+        # El fondo escalado se saca aquí: la caché no se comparte entre hilos
+        background = self.background_cache.scaled(*size)
+        sprite_cache = self.get_sprite_cache() if self.lazy_assets else None
+        self.prefetcher.submit(self.build_prefetch, self.engine, size, background, sprite_cache)
+
+    def build_prefetch(self, engine, size, background, sprite_cache):
+        """Trabajo del hilo de preparación: ensayo previsto, sus sprites que no
+        estaban cargados y su imagen"""
+        spec = engine.predict_next_trial()
+        if spec is None:
+            return None
+        decoded = self.decode_missing(spec, sprite_cache) if sprite_cache is not None else []
+        return engine, spec, size, self.render_stimulus(spec, size, background, decoded), decoded
+
+    def prefetch_valid(self, prepared):
+        """True si lo preparado sigue siendo el próximo ensayo, con el tamaño actual"""
+        engine, spec, size = prepared[:3]
+        return (engine is self.engine and size == self.stage_size
+                and engine.is_next_trial(spec))
+
+    def show_stimulus(self):
+        trial = self.trial
+        canvas = self.stage_canvas
+        self.canvas = canvas
         
-        self.canvas = tk.Canvas(self.root, width=canvas_width, height=canvas_height, 
-                            bg="#1a1a1a", highlightthickness=0)
-        self.canvas.pack(fill="both", expand=True, pady=20)
-        
-        self.background_image = self.get_scaled_background(canvas_width, canvas_height)
-        if self.background_image:
-            self.canvas.create_image(canvas_width//2, canvas_height//2, image=self.background_image)
-        
-        center_x, center_y = canvas_width // 2, canvas_height // 2
-        
-        if self.current_vehicle in self.vehicle_images:
-            self.canvas.create_image(center_x, center_y, 
-                                    image=self.vehicle_images[self.current_vehicle])
-        
-        # NUEVO: Calcular posiciones para múltiples señales por sector
-        num_total_signs = self.get_num_total_signs()
-        
-        # Generar todas las posiciones posibles (8 sectores x 3 distancias = 24 posiciones)
-        all_positions = []
-        for sector in range(8):
-            for distance_multiplier in [0.25, 0.35, 0.45]:  # 3 anillos de distancia
-                all_positions.append({
-                    'sector': sector,
-                    'distance_multiplier': distance_multiplier
-                })
-        
-        # Seleccionar posiciones aleatorias para las señales
-        selected_positions = random.sample(all_positions, min(num_total_signs, len(all_positions)))
-        
-        # Una de ellas será RUTA 66
-        route66_index = random.randint(0, len(selected_positions) - 1)
-        route66_position_data = selected_positions[route66_index]
-        self.route66_sector = route66_position_data['sector']
-        self.route66_position = route66_position_data  # Guardar toda la info
-        
-        available_signs = list(self.sign_images.keys())
-        
-        # Colocar todas las señales
-        for i, pos_data in enumerate(selected_positions):
-            sector = pos_data['sector']
-            distance_mult = pos_data['distance_multiplier']
-            
-            # Calcular posición
-            angle_degrees = sector * 45
-            # Añadir variación aleatoria dentro del sector para que no estén perfectamente alineadas
-            angle_variation = random.uniform(-15, 15)
-            angle_degrees += angle_variation
-            
-            angle_radians = math.radians(angle_degrees)
-            sign_distance = min(canvas_width, canvas_height) * distance_mult
-            
-            x = center_x + sign_distance * math.cos(angle_radians)
-            y = center_y + sign_distance * math.sin(angle_radians)
-            
-            # Decidir si es RUTA 66 o distractor
-            if i == route66_index:
-                if self.route66_image:
-                    self.canvas.create_image(x, y, image=self.route66_image)
-            else:
-                if available_signs:
-                    sign_idx = random.choice(available_signs)
-                    self.canvas.create_image(x, y, image=self.sign_images[sign_idx])
+        # Normalmente ya está compuesto desde la vista previa; sólo se repite
+        # si la ventana cambió de tamaño o se pulsó antes de tiempo
+        self.prepare_stimulus()
+        canvas.itemconfig("response", state="hidden")
+        # Inicio del estímulo: un único cambio de imagen
+        canvas.itemconfig(self.stage_stimulus_id, state="normal")
         
-        # Obtener el tiempo de visualización según el nivel
-        display_time = self.level_times.get(self.level, self.level_times[9])["total"]
+        display_time = trial.exposure_ms
         
         self.time_remaining = display_time / 1000
         
-        self.timer_text = self.canvas.create_text(canvas_width//2, 50, 
-                                                text=f"Tiempo: {self.time_remaining:.1f}s",
-                                                font=("Arial", 16, "bold"),
-                                                fill="#ffcc00")
+        self.timer_text = self.stage_timer_id
+        canvas.itemconfig(self.timer_text, text=f"Tiempo: {self.time_remaining:.1f}s")
+        self.show_scene("stage")
         
+        self.stimulus_scheduler.start(display_time, self.show_response_screen, self.level)
+        self.recorder.phase("stimulus")
         self.update_timer()
-        self.root.after(display_time, self.show_response_screen)
         
     def update_timer(self):
-        if hasattr(self, 'timer_text') and self.time_remaining > 0:
-            self.time_remaining -= 0.1
-            self.canvas.itemconfig(self.timer_text, text=f"Tiempo: {self.time_remaining:.1f}s")
-            if self.time_remaining > 0:
-                self.root.after(100, self.update_timer)
+        if not self.stimulus_scheduler.active:
+            return
+        remaining = self.stimulus_scheduler.remaining_ms()
+        self.time_remaining = remaining / 1000
+        self.canvas.itemconfig(self.timer_text, text=f"Tiempo: {self.time_remaining:.1f}s")
+        # Siguiente décima de segundo según el reloj, no según el número de ticks
+        next_tick = int(remaining % 100) or 100
+        if remaining > next_tick:
+            self.root.after(next_tick, self.update_timer)
     
     def show_response_screen(self):
-        self.clear_screen()
-        
-        canvas_width, canvas_height = self.get_canvas_dimensions()
-    
-        self.canvas = tk.Canvas(self.root, width=canvas_width, height=canvas_height, 
-                            bg="#1a1a1a", highlightthickness=0)
-        self.canvas.pack(fill="both", expand=True)
-        
-        self.background_image = self.get_scaled_background(canvas_width, canvas_height)
-        if self.background_image:
-            self.canvas.create_image(canvas_width//2, canvas_height//2, image=self.background_image)
+        canvas = self.stage_canvas
+        self.canvas = canvas
         
+        canvas_width, canvas_height = self.stage_size
         center_x, center_y = canvas_width // 2, canvas_height // 2
-
-        self.vehicle_time_remaining = 2.0
-        self.vehicle_timer_text = self.canvas.create_text(canvas_width//2, 50, 
-                                                text=f"Tiempo para elegir vehículo: {self.vehicle_time_remaining:.1f}s",
-                                                font=("Arial", 16, "bold"),
-                                                fill="#ffcc00")
         
-        self.vehicle_normal_images = {}
-        self.vehicle_bright_images = {}
+        # Fin del estímulo: se oculta de una vez toda la capa
+        canvas.itemconfig("stimulus", state="hidden")
+        self.recorder.phase("response")
+        
         self.vehicle_positions = {}
         
-        vehicle_spacing = 200
-        
-        for i, vehicle_idx in enumerate(self.vehicle_options):
-            if vehicle_idx in self.vehicle_images:
-                x_offset = (i - 0.5) * vehicle_spacing
-                x_pos = center_x + x_offset
-                y_pos = center_y
-                
-                original_img = self.vehicle_images[vehicle_idx]
-                
-                try:
-                    img_path = os.path.join(self.vehicles_folder, f"vehicle{vehicle_idx+1}.png")
-                    if os.path.exists(img_path):
-                        pil_img = Image.open(img_path)
-                        pil_img = pil_img.resize((150, 150), Image.Resampling.LANCZOS)
-                        
-                        enhancer = ImageEnhance.Brightness(pil_img)
-                        bright_img = enhancer.enhance(1.3)
-                        
-                        glow_img = Image.new('RGBA', (160, 160), (255, 255, 0, 50))
-                        glow_img.paste(bright_img, (5, 5), bright_img)
-                        
-                        bright_photoimage = ImageTk.PhotoImage(glow_img)
-                        
-                        self.vehicle_normal_images[vehicle_idx] = original_img
-                        self.vehicle_bright_images[vehicle_idx] = bright_photoimage
-                except Exception as e:
-                    self.vehicle_normal_images[vehicle_idx] = original_img
-                    self.vehicle_bright_images[vehicle_idx] = original_img
-                
-                vehicle_id = self.canvas.create_image(x_pos, y_pos, 
-                                                     image=self.vehicle_normal_images[vehicle_idx],
-                                                     tags=f"vehicle_{vehicle_idx}")
-                
-                self.vehicle_positions[vehicle_idx] = {
-                    'id': vehicle_id,
-                    'x': x_pos,
-                    'y': y_pos
-                }
-                
-                self.canvas.tag_bind(f"vehicle_{vehicle_idx}", "<Button-1>", 
-                                   lambda event, v=vehicle_idx: self.check_vehicle(v))
-                self.canvas.tag_bind(f"vehicle_{vehicle_idx}", "<Enter>", 
-                                   lambda event, v=vehicle_idx: self.highlight_vehicle(v))
-                self.canvas.tag_bind(f"vehicle_{vehicle_idx}", "<Leave>", 
-                                   lambda event, v=vehicle_idx: self.unhighlight_vehicle(v))
-        
-        self.update_vehicle_timer()
+        options = self.trial.vehicle_options
+        for slot, item_id in enumerate(self.choice_item_ids):
+            vehicle_idx = options[slot] if slot < len(options) else None
+            self.choice_vehicles[slot] = vehicle_idx
+            if vehicle_idx not in self.vehicle_sprites:
+                canvas.itemconfig(item_id, state="hidden")
+                continue
+            x_pos = self.choice_x(slot, center_x)
+            y_pos = center_y
+            
+            canvas.coords(item_id, x_pos, y_pos)
+            canvas.itemconfig(item_id, image=self.vehicle_sprites[vehicle_idx]["normal"],
+                              state="normal")
+            
+            self.vehicle_positions[vehicle_idx] = {
+                'id': item_id,
+                'x': x_pos,
+                'y': y_pos
+            }
+        
+        self.start_countdown(self.stage_timer_id, "Tiempo para elegir vehículo")
         self.response_timer_id = self.root.after(2000, self.vehicle_timeout)
+        # Mientras se responde se prepara el ensayo siguiente
+        self.prefetch_next_trial()
     
-    def update_vehicle_timer(self):
-        if hasattr(self, 'vehicle_timer_text') and self.vehicle_time_remaining > 0:
-            self.vehicle_time_remaining -= 0.1
-            if hasattr(self, 'canvas') and self.canvas.winfo_exists():
-                try:
-                    self.canvas.itemconfig(self.vehicle_timer_text, 
-                                        text=f"Tiempo para elegir vehículo: {self.vehicle_time_remaining:.1f}s")
-                    if self.vehicle_time_remaining > 0:
-                        self.root.after(100, self.update_vehicle_timer)
-                except:
-                    pass
+    def start_countdown(self, text_id, label):
+        """Cuenta atrás de la fase de respuesta sobre un texto del canvas actual"""
+        self.cancel_countdown()
+        # En décimas enteras para que la cuenta no acumule error de coma flotante
+        self.countdown = {"text_id": text_id, "label": label,
+                          "tenths": self.response_time // 100}
+        self.canvas.itemconfig(text_id, text=f"{label}: {self.countdown['tenths'] / 10:.1f}s")
+        self.update_countdown()
+
+    def update_countdown(self):
+        self.countdown_job = None
+        countdown = self.countdown
+        countdown["tenths"] -= 1
+        self.canvas.itemconfig(countdown["text_id"],
+                               text=f"{countdown['label']}: {countdown['tenths'] / 10:.1f}s")
+        if countdown["tenths"] > 0:
+            self.countdown_job = self.root.after(100, self.update_countdown)
+
+    def cancel_countdown(self):
+        """Detiene la cuenta atrás en curso; las pantallas ya no se destruyen al cambiar"""
+        if self.countdown_job is not None:
+            self.root.after_cancel(self.countdown_job)
+            self.countdown_job = None
 
     def vehicle_timeout(self):
-        messagebox.showerror("¡Tiempo Agotado!", 
+        self.response_timer_id = None
+        self.recorder.timeout()
+        self.handle_miss(self.finish_trial_record(self.engine.timeout()), "¡Tiempo Agotado!", 
                             "No seleccionaste un vehículo a tiempo\n\nLa carretera no perdona la indecisión")
-        self.game_over()
+
+    def handle_miss(self, outcome, title, message):
+        """Tras un fallo: fin de partida en la escalera, siguiente ensayo si la evaluación sigue"""
+        messagebox.showerror(title, message)
+        if outcome.game_over:
+            self.game_over()
+        else:
+            self.start_game()
 
     def highlight_vehicle(self, vehicle_idx):
-        if vehicle_idx in self.vehicle_positions and vehicle_idx in self.vehicle_bright_images:
+        if vehicle_idx in self.vehicle_positions:
             vehicle_id = self.vehicle_positions[vehicle_idx]['id']
-            self.canvas.itemconfig(vehicle_id, image=self.vehicle_bright_images[vehicle_idx])
+            self.canvas.itemconfig(vehicle_id, image=self.vehicle_sprites[vehicle_idx]["hover"])
     
     def unhighlight_vehicle(self, vehicle_idx):
-        if vehicle_idx in self.vehicle_positions and vehicle_idx in self.vehicle_normal_images:
+        if vehicle_idx in self.vehicle_positions:
             vehicle_id = self.vehicle_positions[vehicle_idx]['id']
-            self.canvas.itemconfig(vehicle_id, image=self.vehicle_normal_images[vehicle_idx])
+            self.canvas.itemconfig(vehicle_id, image=self.vehicle_sprites[vehicle_idx]["normal"])
     
-    def check_vehicle(self, selected_vehicle):
+    def check_vehicle(self, selected_vehicle, event=None):
+        # Ignora clics repetidos una vez registrada la respuesta
+        if self.engine.stage != "vehicle":
+            return
         if self.response_timer_id is not None:
             self.root.after_cancel(self.response_timer_id)
             self.response_timer_id = None
         
-        if selected_vehicle == self.current_vehicle:
+        rt_ms, rt_handler_ms = self.reaction_times(event)
+        self.trial_record.update(chosen_vehicle=selected_vehicle, vehicle_rt_ms=rt_ms,
+                                 vehicle_rt_handler_ms=rt_handler_ms)
+        self.recorder.vehicle(selected_vehicle)
+        
+        outcome = self.engine.submit_vehicle(selected_vehicle)
+        if not outcome.correct:
+            self.finish_trial_record(outcome)
+        if outcome.correct:
             if selected_vehicle in self.vehicle_positions:
                 vehicle_id = self.vehicle_positions[selected_vehicle]['id']
-                self.canvas.itemconfig(vehicle_id, image=self.vehicle_bright_images[selected_vehicle])
+                self.canvas.itemconfig(vehicle_id, image=self.vehicle_sprites[selected_vehicle]["selected"])
             
             self.root.after(500, self.show_position_selection)
         else:
-            messagebox.showerror("¡Señal de Peligro!", 
+            self.handle_miss(outcome, "¡Señal de Peligro!", 
                             "Vehículo incorrecto\n\nRecuerda: La carretera exige máxima atención")
-            self.game_over()
     
-    def show_position_selection(self):
-        self.clear_screen()
+    def build_position_scene(self):
+        scene = self.add_scene("position")
         
-        tk.Label(self.root, text="¡Correcto! Ahora selecciona el SECTOR donde estaba RUTA 66", 
+        tk.Label(scene, text="¡Correcto! Ahora selecciona el SECTOR donde estaba RUTA 66", 
                 font=("Arial", 18, "bold"), 
                 bg="#1a1a1a", fg="#44ff44").pack(pady=20)
         
-        canvas_width, canvas_height = self.get_canvas_dimensions()
-        canvas_height -= 60
-        
-        self.canvas = tk.Canvas(self.root, width=canvas_width, height=canvas_height, 
-                            bg="#1a1a1a", highlightthickness=0)
-        self.canvas.pack(fill="both", expand=True)
-        
-        center_x, center_y = canvas_width // 2, canvas_height // 2
-    
-        self.background_image = self.get_scaled_background(canvas_width, canvas_height)
-        if self.background_image:
-            self.canvas.create_image(center_x, center_y, image=self.background_image)
+        self.position_canvas = tk.Canvas(scene, bg="#1a1a1a", highlightthickness=0)
+        self.position_canvas.pack(fill="both", expand=True)
+        canvas = self.position_canvas
         
+        self.position_size = None
+        self.position_images_size = None
+        self.position_background_image = None
+        self.sector_states = ["normal"] * 8
+        self.position_background_id = canvas.create_image(0, 0, tags="background")
         self.sectors = []
-        self.sector_images = {}
         self.sector_image_ids = {}
-                
         for i in range(8):
-            angle_start = i * 45 - 22.5
-            angle_end = angle_start + 45
-            
-            sector_image = self.create_transparent_sector(
-                canvas_width, canvas_height, center_x, center_y,
-                angle_start, angle_end, 
-                color_rgb=(42, 42, 42),
-                alpha=100
-            )
-            
-            self.sector_images[f"sector_{i}"] = sector_image
-            
-            image_id = self.canvas.create_image(center_x, center_y, image=sector_image, tags=f"sector_{i}")
+            image_id = canvas.create_image(0, 0, anchor="nw", tags=f"sector_{i}")
             self.sector_image_ids[f"sector_{i}"] = image_id
             self.sectors.append(image_id)
+        self.position_vehicle_id = canvas.create_image(0, 0, state="hidden")
+        self.signal_timer_text = canvas.create_text(0, 0, font=("Arial", 16, "bold"),
+                                                    fill="#ffcc00")
+        self.route66_reveal_id = canvas.create_image(0, 0, state="hidden")
         
-        if self.current_vehicle in self.vehicle_images:
-            self.canvas.create_image(center_x, center_y, 
-                                    image=self.vehicle_images[self.current_vehicle])
+        canvas.bind("<Motion>", self.on_mouse_move)
+        canvas.bind("<Button-1>", self.on_sector_click)
+
+    def layout_position(self, update_images=True):
+        """Recalcula la geometría de los sectores si cambió el tamaño de la ventana.
+
+        Con update_images=False sólo se mueven los items y se actualiza el
+        clasificador; las imágenes se ponen luego con update_position_images.
+        """
+        canvas_width, canvas_height = self.get_canvas_dimensions()
+        canvas_height -= POSITION_HEADER_HEIGHT
+        if self.position_size != (canvas_width, canvas_height):
+            self.position_size = (canvas_width, canvas_height)
+            canvas = self.position_canvas
+            center_x, center_y = canvas_width // 2, canvas_height // 2
+            
+            canvas.coords(self.position_background_id, center_x, center_y)
+            canvas.coords(self.position_vehicle_id, center_x, center_y)
+            canvas.coords(self.signal_timer_text, canvas_width//2, canvas_height - 30)
+            
+            self.current_center_x = center_x
+            self.current_center_y = center_y
+            self.current_canvas_width = canvas_width
+            self.current_canvas_height = canvas_height
+            self.sector_classifier = SectorClassifier(center_x, center_y)
+            self.recorder.size(canvas_width, canvas_height)
+            
+            # RUTA 66 ya revelada sigue en su sitio relativo al centro
+            if self.trial is not None:
+                x, y = self.trial.route66.position(center_x, center_y, canvas_width, canvas_height)
+                canvas.coords(self.route66_reveal_id, x, y)
+        if update_images:
+            self.update_position_images()
+
+    def update_position_images(self):
+        """Pone fondo y sectores renderizados para el tamaño actual"""
+        if self.position_images_size == self.position_size:
+            return
+        self.position_images_size = self.position_size
+        canvas_width, canvas_height = self.position_size
+        self.position_background_image = self.get_scaled_background(canvas_width, canvas_height)
+        self.position_canvas.itemconfig(self.position_background_id,
+                                        image=self.position_background_image or "")
+        # Los 8 sectores normales y resaltados se renderizan una sola vez por tamaño
+        self.sector_cache.warm(canvas_width, canvas_height, states=("normal", "hover"))
+        for sector, state in enumerate(self.sector_states):
+            self.set_sector_state(sector, state)
+        self.sector_cache.show(canvas_width, canvas_height)
+
+    def show_position_selection(self):
+        canvas = self.position_canvas
+        self.canvas = canvas
+        self.layout_position()
         
-        # CREAR EL TEMPORIZADOR AL FINAL para que esté al frente
-        self.signal_time_remaining = 2.0
-        self.signal_timer_text = self.canvas.create_text(canvas_width//2, canvas_height - 30, 
-                                                text=f"Tiempo para elegir sector: {self.signal_time_remaining:.1f}s",
-                                                font=("Arial", 16, "bold"),
-                                                fill="#ffcc00")
+        for i in range(8):
+            self.set_sector_state(i, "normal")
+        canvas.itemconfig(self.route66_reveal_id, state="hidden")
         
-        self.current_center_x = center_x
-        self.current_center_y = center_y
-        self.current_canvas_width = canvas_width
-        self.current_canvas_height = canvas_height
-
-        self.canvas.bind("<Motion>", self.on_mouse_move)
-        self.canvas.bind("<Button-1>", self.on_sector_click)
+        if self.trial.target_vehicle in self.vehicle_images:
+            canvas.itemconfig(self.position_vehicle_id, state="normal",
+                              image=self.vehicle_images[self.trial.target_vehicle])
+        else:
+            canvas.itemconfig(self.position_vehicle_id, state="hidden")
         
         self.sector_highlight = None
         self.current_highlighted_sector = -1
+        self.pending_motion = None
 
-        self.update_signal_timer()
+        self.recorder.phase("position")
+        self.show_scene("position")
+        self.start_countdown(self.signal_timer_text, "Tiempo para elegir sector")
         self.response_timer_id = self.root.after(2000, self.signal_timeout)
 
-    def update_signal_timer(self):
-        if hasattr(self, 'signal_timer_text') and self.signal_time_remaining > 0:
-            self.signal_time_remaining -= 0.1
-            if hasattr(self, 'canvas') and self.canvas.winfo_exists():
-                try:
-                    self.canvas.itemconfig(self.signal_timer_text, 
-                                        text=f"Tiempo para elegir sector: {self.signal_time_remaining:.1f}s")
-                    if self.signal_time_remaining > 0:
-                        self.root.after(100, self.update_signal_timer)
-                except:
-                    pass
-
     def signal_timeout(self):
-        messagebox.showerror("¡Tiempo Agotado!", 
+        self.response_timer_id = None
+        self.recorder.timeout()
+        self.handle_miss(self.finish_trial_record(self.engine.timeout()), "¡Tiempo Agotado!", 
                             "No seleccionaste el sector a tiempo\n\nLa carretera exige reflejos rápidos")
-        self.game_over()
     
     def on_mouse_move(self, event):
-        center_x = self.current_center_x
-        center_y = self.current_center_y
-        
-        dx = event.x - center_x
-        dy = event.y - center_y
-        distance = math.sqrt(dx**2 + dy**2)
-        
-        if distance > 10:
-            # Calcular ángulo desde el eje X positivo (mismo método que para dibujar)
-            angle = math.degrees(math.atan2(dy, dx))
-            
-            # Normalizar ángulo a rango [0, 360)
-            if angle < 0:
-                angle += 360
-            
-            # Los sectores están centrados en: 0°, 45°, 90°, 135°, 180°, 225°, 270°, 315°
-            # Cada sector va desde (centro - 22.5°) hasta (centro + 22.5°)
-            # Sector 0: -22.5° a 22.5° (o 337.5° a 22.5°)
-            # Sector 1: 22.5° a 67.5°
-            # etc.
-            
-            # Ajustar ángulo para que el sector 0 comience en -22.5° (337.5°)
-            adjusted_angle = (angle + 22.5) % 360
-            sector = int(adjusted_angle / 45)
-            
-            # Asegurar que el sector esté en rango [0, 7]
-            if sector >= 8:
-                sector = 0
-            
-            if sector != self.current_highlighted_sector:
-                if self.current_highlighted_sector != -1:
-                    angle_start_prev = self.current_highlighted_sector * 45 - 22.5
-                    angle_end_prev = angle_start_prev + 45
-                    
-                    normal_image = self.create_transparent_sector(
-                        self.current_canvas_width, self.current_canvas_height,
-                        center_x, center_y,
-                        angle_start_prev, angle_end_prev,
-                        color_rgb=(42, 42, 42),
-                        alpha=100
-                    )
-                    
-                    self.sector_images[f"sector_{self.current_highlighted_sector}"] = normal_image
-                    self.canvas.itemconfig(self.sector_image_ids[f"sector_{self.current_highlighted_sector}"], 
-                                        image=normal_image)
-                
-                angle_start_new = sector * 45 - 22.5
-                angle_end_new = angle_start_new + 45
-                
-                highlighted_image = self.create_transparent_sector(
-                    self.current_canvas_width, self.current_canvas_height,
-                    center_x, center_y,
-                    angle_start_new, angle_end_new,
-                    color_rgb=(255, 204, 136),
-                    alpha=150,
-                    is_highlighted=True
-                )
-                
-                self.sector_images[f"sector_{sector}"] = highlighted_image
-                self.canvas.itemconfig(self.sector_image_ids[f"sector_{sector}"], 
-                                    image=highlighted_image)
-                
-                self.current_highlighted_sector = sector
-        else:
-            if self.current_highlighted_sector != -1:
-                angle_start_prev = self.current_highlighted_sector * 45 - 22.5
-                angle_end_prev = angle_start_prev + 45
-                
-                normal_image = self.create_transparent_sector(
-                    self.current_canvas_width, self.current_canvas_height,
-                    center_x, center_y,
-                    angle_start_prev, angle_end_prev,
-                    color_rgb=(42, 42, 42),
-                    alpha=100
-                )
-                
-                self.sector_images[f"sector_{self.current_highlighted_sector}"] = normal_image
-                self.canvas.itemconfig(self.sector_image_ids[f"sector_{self.current_highlighted_sector}"], 
-                                    image=normal_image)
-                self.current_highlighted_sector = -1
+        """Guarda la última posición; se procesa como mucho una vez por fotograma"""
+        self.event_clock.observe(event.time)
+        self.pending_motion = (event.x, event.y)
+        if self.motion_job is None:
+            self.motion_job = self.root.after(MOTION_FRAME_MS, self.process_motion)
     
-    def on_sector_click(self, event):
+    def process_motion(self):
+        self.motion_job = None
+        # Tras responder (o al agotarse el tiempo) se conserva la corrección en pantalla
+        if self.pending_motion is None or self.engine.stage != "sector":
+            return
+        x, y = self.pending_motion
+        self.pending_motion = None
+        self.recorder.motion(x - self.current_center_x, y - self.current_center_y)
+        self.highlight_sector(self.sector_classifier.classify(x, y))
+    
+    def highlight_sector(self, sector):
+        """Resalta el sector indicado (-1 para ninguno) y anota el recorrido"""
+        if sector == self.current_highlighted_sector:
+            return
         if self.current_highlighted_sector != -1:
+            self.set_sector_state(self.current_highlighted_sector, "normal")
+        if sector != -1:
+            self.set_sector_state(sector, "hover")
+        self.current_highlighted_sector = sector
+        
+        if self.trial_record is not None:
+            _, elapsed_ms = self.reaction_times(None)
+            self.trial_record["cursor_path"].append([elapsed_ms, sector])
+    
+    def set_sector_state(self, sector, state):
+        """Cambia la imagen de un sector por la versión cacheada del estado dado"""
+        image, x, y = self.sector_cache.get(self.current_canvas_width, self.current_canvas_height,
+                                            sector, state)
+        image_id = self.sector_image_ids[f"sector_{sector}"]
+        self.position_canvas.coords(image_id, x, y)
+        self.position_canvas.itemconfig(image_id, image=image)
+        self.sector_states[sector] = state
+    
+    def on_sector_click(self, event):
+        if self.engine.stage != "sector":
+            return
+        # El clic se clasifica por su propia posición, no por el último movimiento procesado
+        sector = self.sector_classifier.classify(event.x, event.y)
+        if sector != -1:
+            self.recorder.sector(sector, event.x - self.current_center_x,
+                                 event.y - self.current_center_y)
             if self.response_timer_id is not None:
                 self.root.after_cancel(self.response_timer_id)
                 self.response_timer_id = None
+            if self.motion_job is not None:
+                self.root.after_cancel(self.motion_job)
+                self.motion_job = None
             
-            self.check_position(self.current_highlighted_sector)
+            rt_ms, rt_handler_ms = self.reaction_times(event)
+            self.trial_record.update(sector_rt_ms=rt_ms, sector_rt_handler_ms=rt_handler_ms)
+            self.highlight_sector(sector)
+            self.check_position(sector)
     
     def check_position(self, selected_sector):
         """Verifica si el sector seleccionado es correcto"""
-        center_x = self.current_center_x
-        center_y = self.current_center_y
+        outcome = self.engine.submit_sector(selected_sector)
+        self.trial_record["chosen_sector"] = selected_sector
+        self.finish_trial_record(outcome)
+        route66 = self.trial.route66
         
-        if selected_sector == self.route66_sector:
+        if outcome.correct:
             # Correcto - Iluminar sector en verde
-            correct_image = self.create_transparent_sector(
-                self.current_canvas_width, self.current_canvas_height,
-                center_x, center_y,
-                selected_sector * 45 - 22.5, selected_sector * 45 + 22.5,
-                color_rgb=(68, 255, 68),
-                alpha=200,
-                is_highlighted=True
-            )
-            
-            self.sector_images[f"sector_{selected_sector}"] = correct_image
-            self.canvas.itemconfig(self.sector_image_ids[f"sector_{selected_sector}"], 
-                                image=correct_image)
-            
-            # Mostrar la señal RUTA 66 en su posición original
-            route66_angle = self.route66_position['sector'] * 45
-            route66_angle += random.uniform(-15, 15)  # Recrear variación
-            route66_radians = math.radians(route66_angle)
-            route66_distance = min(self.current_canvas_width, self.current_canvas_height) * self.route66_position['distance_multiplier']
-            
-            x = center_x + route66_distance * math.cos(route66_radians)
-            y = center_y + route66_distance * math.sin(route66_radians)
-            
-            if self.route66_image:
-                self.canvas.create_image(x, y, image=self.route66_image)
-            
-            self.score += 10 * (self.level + 1)
-            self.root.after(1500, lambda: self.show_success_message())
+            self.set_sector_state(selected_sector, "correct")
         else:
             # Incorrecto - Iluminar sector seleccionado en rojo
-            incorrect_image = self.create_transparent_sector(
-                self.current_canvas_width, self.current_canvas_height,
-                center_x, center_y,
-                selected_sector * 45 - 22.5, selected_sector * 45 + 22.5,
-                color_rgb=(255, 68, 68),
-                alpha=200,
-                is_highlighted=True
-            )
-            
-            self.sector_images[f"sector_{selected_sector}"] = incorrect_image
-            self.canvas.itemconfig(self.sector_image_ids[f"sector_{selected_sector}"], 
-                                image=incorrect_image)
+            self.set_sector_state(selected_sector, "incorrect")
             
             # Mostrar sector correcto en verde
-            correct_image = self.create_transparent_sector(
-                self.current_canvas_width, self.current_canvas_height,
-                center_x, center_y,
-                self.route66_sector * 45 - 22.5, self.route66_sector * 45 + 22.5,
-                color_rgb=(68, 255, 68),
-                alpha=200,
-                is_highlighted=True
-            )
-            
-            self.sector_images[f"sector_{self.route66_sector}"] = correct_image
-            self.canvas.itemconfig(self.sector_image_ids[f"sector_{self.route66_sector}"], 
-                                image=correct_image)
-            
-            # Mostrar la señal RUTA 66 en su posición correcta
-            route66_angle = self.route66_position['sector'] * 45
-            route66_angle += random.uniform(-15, 15)
-            route66_radians = math.radians(route66_angle)
-            route66_distance = min(self.current_canvas_width, self.current_canvas_height) * self.route66_position['distance_multiplier']
-            
-            x = center_x + route66_distance * math.cos(route66_radians)
-            y = center_y + route66_distance * math.sin(route66_radians)
-            
-            if self.route66_image:
-                self.canvas.create_image(x, y, image=self.route66_image)
-            
+            self.set_sector_state(route66.sector, "correct")
+        
+        # Mostrar la señal RUTA 66 exactamente donde apareció en el estímulo
+        x, y = route66.position(self.current_center_x, self.current_center_y,
+                                self.current_canvas_width, self.current_canvas_height)
+        if self.route66_image:
+            self.canvas.coords(self.route66_reveal_id, x, y)
+            self.canvas.itemconfig(self.route66_reveal_id, image=self.route66_image,
+                                   state="normal")
+        
+        if outcome.correct:
+            self.root.after(1500, lambda: self.show_success_message(outcome))
+        elif outcome.game_over:
             self.root.after(2000, lambda: self.game_over())
+        else:
+            self.root.after(2000, self.start_game)
     
-    def show_success_message(self):
-        points_earned = 10 * (self.level + 1)
-        
-        if self.level < 9:
-            self.level += 1
+    def begin_trial_record(self):
+        """Empieza el registro del ensayo actual con su distribución completa"""
+        trial = self.trial
+        self.trial_record = {
+            "session": self.session_id,
+            "seed": self.engine.seed,
+            "mode": self.engine.mode,
+            "trial": trial.index,
+            "level": trial.level,
+            "exposure_ms": trial.exposure_ms,
+            "vehicle_options": list(trial.vehicle_options),
+            "target_vehicle": trial.target_vehicle,
+            "route66_index": trial.route66_index,
+            "route66_sector": trial.route66_sector,
+            "signs": [[sign.sector, sign.ring, round(sign.jitter, 3), sign.sign_id,
+                       round(sign.distance_multiplier, 4)]
+                      for sign in trial.signs],
+            "spacing": trial.spacing,
+            "chosen_vehicle": None,
+            "vehicle_rt_ms": None,
+            "vehicle_rt_handler_ms": None,
+            "chosen_sector": None,
+            "sector_rt_ms": None,
+            "sector_rt_handler_ms": None,
+            # [ms desde el final del estímulo, sector] cada vez que el cursor cambia de sector
+            "cursor_path": [],
+        }
+    
+    def reaction_times(self, event):
+        """Tiempo desde el final del estímulo hasta la respuesta, en ms.
+
+        Devuelve (según la marca de tiempo del evento, según el reloj al
+        ejecutar el manejador); el primero es None si aún no hay calibración.
+        """
+        handler_ms = perf_ms()
+        event_time = getattr(event, "time", None)
+        self.event_clock.observe(event_time, handler_ms)
+        offset_ms = self.stimulus_scheduler.records[-1]["offset_ns"] / 1_000_000
+        event_ms = self.event_clock.to_perf_ms(event_time)
+        rt_ms = None if event_ms is None else round(event_ms - offset_ms, 3)
+        return rt_ms, round(handler_ms - offset_ms, 3)
+    
+    def finish_trial_record(self, outcome):
+        """Completa el registro con el resultado y lo envía al hilo escritor.
+
+        Devuelve el mismo outcome para poder encadenar la llamada.
+        """
+        record = self.trial_record
+        if record is None:
+            return outcome
+        exposure = self.stimulus_scheduler.records[-1]
+        record.update(
+            exposure_actual_ms=round(exposure["exposure_ms"], 3),
+            exposure_error_ms=round(exposure["error_ms"], 3),
+            correct=outcome.correct,
+            failed_stage=None if outcome.correct else outcome.stage,
+            timed_out=outcome.timed_out,
+            score=outcome.score,
+            level_after=outcome.level,
+            wall_time=round(time.time(), 3),
+        )
+        if self.engine.mode == "adaptive":
+            record["threshold_ms"] = round(self.engine.staircase.threshold_ms, 1)
+        self.trial_log.append(record)
+        self.store.add_trial(self.participant, record)
+        self.recorder.outcome(outcome)
+        self.recorder.flush()
+        self.game_trials += 1
+        if outcome.game_over:
+            self.store.add_game(self.session_id, self.participant, outcome.score,
+                                outcome.level, self.game_trials)
+            # La pantalla final usa el historial en memoria, sin esperar a la escritura
+            apply_game(self.history, outcome.score, outcome.level)
+            self.history_written = self.store.mark()
+            self.game_trials = 0
+        else:
+            # Si el ensayo siguiente sólo se sabe ahora (modo adaptativo), se prepara ya
+            self.prefetch_next_trial()
+        self.trial_record = None
+        return outcome
+    
+    def close(self):
+        """Vacía los registros pendientes antes de salir"""
+        self.trial_log.close()
+        self.recorder.close()
+        self.store.end_session(self.session_id)
+        self.store.close()
+        self.prefetcher.close()
+        self.layout_executor.shutdown(wait=False, cancel_futures=True)
+        if self.sprite_cache is not None:
+            self.sprite_cache.save()
+        self.tracer.export()
+    
+    def show_success_message(self, outcome):
+        if self.engine.mode == "adaptive":
+            messagebox.showinfo("¡Correcto!", 
+                              f"¡Correcto! +{outcome.points} puntos\n\n"
+                              f"El siguiente ensayo se ajusta a tu umbral")
+        elif outcome.level_up:
             total_signs = self.get_num_total_signs()
             messagebox.showinfo("¡Excelente!", 
-                              f"¡Correcto! +{points_earned} puntos\n\n"
+                              f"¡Correcto! +{outcome.points} puntos\n\n"
                               f"Avanzando al nivel {self.level + 1}\n"
                               f"Próximo desafío: {total_signs} señales")
         else:
             messagebox.showinfo("¡Increíble!", 
-                              f"¡Perfecto! +{points_earned} puntos\n\n"
+                              f"¡Perfecto! +{outcome.points} puntos\n\n"
                               f"Has alcanzado el nivel máximo con {self.get_num_total_signs()} señales")
         
-        self.start_game()
-    
-    def game_over(self):
-        self.clear_screen()
-        
-        if self.level >= 7:
-            performance = "¡Maestro de la Carretera!"
-            color = "#ffcc00"
-        elif self.level >= 4:
-            performance = "¡Conductor Experto!"
-            color = "#44ff44"
-        elif self.level >= 2:
-            performance = "Buen Manejo"
-            color = "#88ff88"
+        if outcome.game_over:
+            self.game_over()
         else:
-            performance = "Sigue Practicando"
-            color = "#ff4444"
+            self.start_game()
+    
+    def build_game_over_scene(self):
+        scene = self.add_scene("game_over")
         
-        main_frame = tk.Frame(self.root, bg="#1a1a1a")
+        main_frame = tk.Frame(scene, bg="#1a1a1a")
         main_frame.pack(fill="both", expand=True, pady=50)
         
         tk.Label(main_frame, text="FIN DEL VIAJE", 
                 font=("Arial", 40, "bold"), 
                 bg="#1a1a1a", fg="#ff4444").pack(pady=20)
         
-        tk.Label(main_frame, text=performance, 
+        self.performance_label = tk.Label(main_frame, 
                 font=("Arial", 24, "bold"), 
-                bg="#1a1a1a", fg=color).pack(pady=10)
+                bg="#1a1a1a")
+        self.performance_label.pack(pady=10)
         
         stats_frame = tk.Frame(main_frame, bg="#2a2a2a", relief="sunken", bd=2)
         stats_frame.pack(pady=30, padx=100, fill="x")
         
-        tk.Label(stats_frame, text=f"Puntuación Final: {self.score}", 
+        self.final_score_label = tk.Label(stats_frame, 
                 font=("Arial", 20), 
-                bg="#2a2a2a", fg="#ffffff").pack(pady=15)
+                bg="#2a2a2a", fg="#ffffff")
+        self.final_score_label.pack(pady=15)
         
-        tk.Label(stats_frame, text=f"Nivel Alcanzado: {self.level + 1}", 
+        self.final_level_label = tk.Label(stats_frame, 
                 font=("Arial", 18), 
-                bg="#2a2a2a", fg="#cccccc").pack(pady=10)
+                bg="#2a2a2a", fg="#cccccc")
+        self.final_level_label.pack(pady=10)
         
-        max_signs = self.get_num_total_signs()
-        tk.Label(stats_frame, text=f"Máximo de señales manejadas: {max_signs}", 
+        self.max_signs_label = tk.Label(stats_frame, 
                 font=("Arial", 16), 
-                bg="#2a2a2a", fg="#cccccc").pack(pady=5)
+                bg="#2a2a2a", fg="#cccccc")
+        self.max_signs_label.pack(pady=5)
+        
+        self.record_label = tk.Label(stats_frame, 
+                font=("Arial", 16, "bold"), 
+                bg="#2a2a2a", fg="#ffcc00", justify="center")
+        self.record_label.pack(pady=5)
+        
+        # Se empaqueta sólo cuando hay datos de exposición que mostrar
+        self.exposure_label = tk.Label(stats_frame, 
+                font=("Arial", 11), 
+                bg="#2a2a2a", fg="#888888", justify="center")
         
         btn_frame = tk.Frame(main_frame, bg="#1a1a1a")
         btn_frame.pack(pady=40)
@@ -792,7 +1807,7 @@ class DoubleDecisionGame:
         menu_btn = tk.Button(btn_frame, text="MENÚ PRINCIPAL", 
                             font=("Arial", 16, "bold"),
                             bg="#ffcc00", fg="#000000",
-                            command=self.create_menu,
+                            command=self.show_menu,
                             padx=25, pady=12,
                             cursor="hand2")
         menu_btn.pack(side="left", padx=15)
@@ -804,13 +1819,66 @@ class DoubleDecisionGame:
                             padx=25, pady=12,
                             cursor="hand2")
         quit_btn.pack(side="left", padx=15)
+
+    def game_over(self):
+        self.recorder.phase("game_over")
+        if self.level >= 7:
+            performance = "¡Maestro de la Carretera!"
+            color = "#ffcc00"
+        elif self.level >= 4:
+            performance = "¡Conductor Experto!"
+            color = "#44ff44"
+        elif self.level >= 2:
+            performance = "Buen Manejo"
+            color = "#88ff88"
+        else:
+            performance = "Sigue Practicando"
+            color = "#ff4444"
+        
+        self.performance_label.config(text=performance, fg=color)
+        self.final_score_label.config(text=f"Puntuación Final: {self.score}")
+        self.final_level_label.config(text=f"Nivel Alcanzado: {self.level + 1}")
+        
+        max_signs = self.get_num_total_signs()
+        signs_text = f"Máximo de señales manejadas: {max_signs}"
+        if self.engine.mode == "adaptive":
+            staircase = self.engine.staircase
+            spread = (10 ** staircase.sd - 1) * 100
+            signs_text = (f"Umbral estimado: {staircase.threshold_ms:.0f} ms (±{spread:.0f}%) "
+                          f"en {self.engine.assessment_trials} ensayos")
+        self.max_signs_label.config(text=signs_text)
+        
+        best = self.history["best"]
+        previous_best = self.history.get("previous_best")
+        if previous_best is None or self.score > previous_best:
+            record_text = f"¡Nuevo récord personal de {self.participant}!"
+        else:
+            record_text = (f"Récord personal de {self.participant}: {best['best_score']} puntos "
+                           f"(nivel {best['best_level'] + 1})")
+        self.record_label.config(text=record_text)
+        
+        # Precisión de la exposición del estímulo en esta máquina, por nivel
+        exposure_lines = [
+            f"Nivel {level + 1}: {stats['requested_ms']} ms, "
+            f"error medio {stats['mean_error_ms']:+.1f} ms, máx {stats['max_error_ms']:.1f} ms"
+            for level, stats in sorted(self.stimulus_scheduler.summary().items())
+        ]
+        if exposure_lines:
+            self.exposure_label.config(text="\n".join(exposure_lines))
+            self.exposure_label.pack(pady=5)
+        else:
+            self.exposure_label.pack_forget()
+        
+        self.show_scene("game_over")
     
     def restart_game(self):
-        self.score = 0
-        self.level = 0
-        self.create_menu()
+        self.engine.reset()
+        self.recorder.reset(self.engine.mode)
+        self.stimulus_scheduler.records = []
+        self.show_menu()
 
 if __name__ == "__main__":
     root = tk.Tk()
     game = DoubleDecisionGame(root)
-    root.mainloop()
\ No newline at end of file
+    root.mainloop()
+    game.close()
\ No newline at end of file
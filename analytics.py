@@ -0,0 +1,390 @@
+"""Análisis por lotes de los registros de ensayos (logs/trials-*.jsonl).
+
+Lee los registros por bloques de tamaño fijo, convierte cada bloque en arrays
+de NumPy y acumula contadores con bincount, así que la memoria no depende del
+tamaño de los registros. El estado acumulado (contadores y hasta qué byte se
+leyó cada archivo) se guarda en la carpeta de salida: al volver a ejecutarlo
+sólo se procesan las líneas nuevas.
+
+Genera:
+    sectors.csv      aciertos por sector de RUTA 66
+    rings.csv        aciertos por anillo de excentricidad (0.25/0.35/0.45)
+    sector_ring.csv  aciertos por sector y anillo
+    exposure.csv     aciertos por exposición con la curva ajustada
+    fits.csv         ajuste psicométrico logístico (global y por anillo)
+    sessions.csv     resumen por sesión (las terminadas se van añadiendo)
+
+La precisión de sector se calcula sobre los ensayos en que el vehículo fue
+correcto; la curva psicométrica usa el acierto del ensayo completo. En el
+estado sólo quedan las sesiones abiertas: una sesión sin ensayos en
+SESSION_IDLE_S (según wall_time) se da por terminada, su fila se añade a
+sessions.csv y se olvida; las abiertas se reescriben al final del archivo en
+cada ejecución.
+
+Uso:
+    python analytics.py [carpeta_logs] [--out analytics] [--rebuild] [--chunk-mb 16]
+"""
+import argparse
+import csv
+import glob
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from engine import NUM_SECTORS, RING_MULTIPLIERS
+
+STATE_NAME = "state.npz"
+STATE_VERSION = 2
+# Una sesión sin ensayos nuevos durante este tiempo se da por terminada
+SESSION_IDLE_S = 6 * 3600
+SESSIONS_HEADER = ("session", "trials", "correct", "max_level", "mean_sector_rt_ms")
+MAX_EXPOSURE_MS = 4000
+NUM_RINGS = len(RING_MULTIPLIERS)
+# Acertar por azar (dos vehículos, ocho sectores) y tasa de despistes
+GUESS_RATE = 1 / 2 * 1 / NUM_SECTORS
+LAPSE_RATE = 0.02
+
+# Contadores acumulados: nombre -> forma
+COUNTERS = {
+    "sector_trials": (NUM_SECTORS,),
+    "sector_vehicle_ok": (NUM_SECTORS,),
+    "sector_correct": (NUM_SECTORS,),
+    "ring_trials": (NUM_RINGS,),
+    "ring_vehicle_ok": (NUM_RINGS,),
+    "ring_correct": (NUM_RINGS,),
+    "sector_ring_vehicle_ok": (NUM_SECTORS, NUM_RINGS),
+    "sector_ring_correct": (NUM_SECTORS, NUM_RINGS),
+    "exposure_trials": (NUM_RINGS, MAX_EXPOSURE_MS + 1),
+    "exposure_correct": (NUM_RINGS, MAX_EXPOSURE_MS + 1),
+}
+
+
+class Aggregate:
+    """Contadores acumulados más el progreso de lectura de cada archivo.
+
+    sessions sólo guarda las sesiones abiertas; finished_sessions cuenta las
+    ya escritas en sessions.csv, que ocupan sus primeros sessions_offset bytes.
+    """
+
+    def __init__(self):
+        self.counts = {name: np.zeros(shape, dtype=np.int64) for name, shape in COUNTERS.items()}
+        self.files = {}
+        self.sessions = {}
+        self.finished_sessions = 0
+        self.sessions_offset = 0
+        self.latest_time = 0.0
+        self.bad_lines = 0
+
+    @classmethod
+    def load(cls, path):
+        agg = cls()
+        try:
+            with np.load(path) as data:
+                meta = json.loads(str(data["meta"]))
+                if meta.get("version") != STATE_VERSION:
+                    return agg
+                for name in COUNTERS:
+                    agg.counts[name] = data[name].astype(np.int64)
+        except (OSError, KeyError, ValueError):
+            return agg
+        agg.files = meta["files"]
+        agg.sessions = meta["sessions"]
+        agg.finished_sessions = meta["finished_sessions"]
+        agg.sessions_offset = meta["sessions_offset"]
+        agg.latest_time = meta["latest_time"]
+        agg.bad_lines = meta["bad_lines"]
+        return agg
+
+    def save(self, path):
+        meta = {"version": STATE_VERSION, "files": self.files, "sessions": self.sessions,
+                "finished_sessions": self.finished_sessions,
+                "sessions_offset": self.sessions_offset, "latest_time": self.latest_time,
+                "bad_lines": self.bad_lines}
+        tmp_path = path + ".tmp.npz"
+        np.savez_compressed(tmp_path, meta=json.dumps(meta), **self.counts)
+        os.replace(tmp_path, path)
+
+    def add_chunk(self, lines):
+        """Acumula un bloque de líneas JSON"""
+        sectors, rings, exposure, vehicle_ok, correct = [], [], [], [], []
+        sessions = self.sessions
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                r = json.loads(line)
+                sector = r["route66_sector"]
+                ring = r["signs"][r["route66_index"]][1]
+                ok = bool(r["correct"])
+                failed = r["failed_stage"]
+                level = r["level"]
+                exposure_ms = r["exposure_ms"]
+                # Fuera de rango romperían los bincount de todo el bloque
+                if not (0 <= sector < NUM_SECTORS and 0 <= ring < NUM_RINGS):
+                    raise ValueError("sector o anillo fuera de rango")
+            except (ValueError, KeyError, IndexError, TypeError):
+                self.bad_lines += 1
+                continue
+            sectors.append(sector)
+            rings.append(ring)
+            exposure.append(exposure_ms)
+            vehicle_ok.append(failed != "vehicle")
+            correct.append(ok)
+            # Resumen por sesión abierta:
+            # [ensayos, aciertos, nivel máximo, suma TR sector, n TR, último wall_time]
+            summary = sessions.get(r.get("session"))
+            if summary is None:
+                summary = sessions[r.get("session")] = [0, 0, 0, 0.0, 0, 0.0]
+            summary[0] += 1
+            summary[1] += ok
+            summary[2] = max(summary[2], level)
+            rt = r.get("sector_rt_ms") or r.get("sector_rt_handler_ms")
+            if rt is not None:
+                summary[3] += rt
+                summary[4] += 1
+            wall_time = r.get("wall_time")
+            if isinstance(wall_time, (int, float)):
+                summary[5] = max(summary[5], wall_time)
+                self.latest_time = max(self.latest_time, wall_time)
+        if not sectors:
+            return 0
+
+        sectors = np.asarray(sectors, dtype=np.int64)
+        rings = np.asarray(rings, dtype=np.int64)
+        exposure = np.clip(np.asarray(exposure, dtype=np.int64), 0, MAX_EXPOSURE_MS)
+        vehicle_ok = np.asarray(vehicle_ok, dtype=bool)
+        correct = np.asarray(correct, dtype=bool)
+        c = self.counts
+        c["sector_trials"] += np.bincount(sectors, minlength=NUM_SECTORS)
+        c["sector_vehicle_ok"] += np.bincount(sectors[vehicle_ok], minlength=NUM_SECTORS)
+        c["sector_correct"] += np.bincount(sectors[correct], minlength=NUM_SECTORS)
+        c["ring_trials"] += np.bincount(rings, minlength=NUM_RINGS)
+        c["ring_vehicle_ok"] += np.bincount(rings[vehicle_ok], minlength=NUM_RINGS)
+        c["ring_correct"] += np.bincount(rings[correct], minlength=NUM_RINGS)
+        cell = sectors * NUM_RINGS + rings
+        size = NUM_SECTORS * NUM_RINGS
+        c["sector_ring_vehicle_ok"] += np.bincount(
+            cell[vehicle_ok], minlength=size).reshape(NUM_SECTORS, NUM_RINGS)
+        c["sector_ring_correct"] += np.bincount(
+            cell[correct], minlength=size).reshape(NUM_SECTORS, NUM_RINGS)
+        bins = rings * (MAX_EXPOSURE_MS + 1) + exposure
+        size = NUM_RINGS * (MAX_EXPOSURE_MS + 1)
+        c["exposure_trials"] += np.bincount(bins, minlength=size).reshape(NUM_RINGS, -1)
+        c["exposure_correct"] += np.bincount(bins[correct], minlength=size).reshape(NUM_RINGS, -1)
+        return len(sectors)
+
+    def pop_finished_sessions(self):
+        """Quita y devuelve (sesión, resumen) de las que llevan SESSION_IDLE_S sin
+        ensayos respecto al último ensayo leído"""
+        cutoff = self.latest_time - SESSION_IDLE_S
+        finished = sorted((session, summary) for session, summary in self.sessions.items()
+                          if summary[5] < cutoff)
+        for session, _ in finished:
+            del self.sessions[session]
+        self.finished_sessions += len(finished)
+        return finished
+
+
+def iter_chunks(path, offset, chunk_bytes):
+    """Bloques de líneas completas a partir de offset: (líneas, bytes consumidos)"""
+    with open(path, "rb") as f:
+        f.seek(offset)
+        rest = b""
+        while True:
+            data = f.read(chunk_bytes)
+            if not data:
+                break
+            data = rest + data
+            end = data.rfind(b"\n")
+            if end < 0:
+                rest = data
+                continue
+            rest = data[end + 1:]
+            yield data[:end].split(b"\n"), end + 1
+        # Una última línea sin salto es una escritura en curso: se lee la próxima vez
+
+
+def update(agg, paths, chunk_bytes):
+    """Procesa lo nuevo de cada archivo; devuelve el número de ensayos añadidos"""
+    added = 0
+    for path in paths:
+        key = os.path.abspath(path)
+        st = os.stat(path)
+        entry = agg.files.get(key)
+        if entry and st.st_size < entry["offset"]:
+            raise RuntimeError(f"{path} es más corto que en la última ejecución; usa --rebuild")
+        offset = entry["offset"] if entry else 0
+        if offset == st.st_size:
+            continue
+        for lines, consumed in iter_chunks(path, offset, chunk_bytes):
+            added += agg.add_chunk(lines)
+            offset += consumed
+        agg.files[key] = {"offset": offset}
+    return added
+
+
+def fit_logistic(exposure_ms, trials, correct, gamma=GUESS_RATE, lapse=LAPSE_RATE):
+    """Ajuste de máxima verosimilitud de p = g + (1-g-l) / (1 + exp(-(log10 ms - a) / b)).
+
+    Se busca en una rejilla vectorizada de (a, b); devuelve (a, b) o None.
+    """
+    mask = trials > 0
+    if mask.sum() < 2:
+        return None
+    x = np.log10(np.maximum(exposure_ms[mask], 1))[None, None, :]
+    n = trials[mask][None, None, :]
+    k = correct[mask][None, None, :]
+    alphas = np.linspace(1.0, 3.6, 261)[:, None, None]
+    betas = np.geomspace(0.01, 0.5, 60)[None, :, None]
+    p = gamma + (1 - gamma - lapse) / (1 + np.exp(-(x - alphas) / betas))
+    p = np.clip(p, 1e-9, 1 - 1e-9)
+    log_likelihood = (k * np.log(p) + (n - k) * np.log(1 - p)).sum(axis=2)
+    i, j = np.unravel_index(np.argmax(log_likelihood), log_likelihood.shape)
+    return float(alphas[i, 0, 0]), float(betas[0, j, 0])
+
+
+def logistic(exposure_ms, fit, gamma=GUESS_RATE, lapse=LAPSE_RATE):
+    alpha, beta = fit
+    x = np.log10(np.maximum(exposure_ms, 1))
+    return gamma + (1 - gamma - lapse) / (1 + np.exp(-(x - alpha) / beta))
+
+
+def _ratio(k, n):
+    return round(k / n, 4) if n else ""
+
+
+def write_reports(agg, out):
+    c = agg.counts
+    with open(os.path.join(out, "sectors.csv"), "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(("sector", "trials", "vehicle_ok", "sector_correct", "sector_accuracy"))
+        for s in range(NUM_SECTORS):
+            writer.writerow((s, c["sector_trials"][s], c["sector_vehicle_ok"][s],
+                             c["sector_correct"][s],
+                             _ratio(c["sector_correct"][s], c["sector_vehicle_ok"][s])))
+
+    with open(os.path.join(out, "rings.csv"), "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(("ring", "distance_multiplier", "trials", "vehicle_ok", "sector_correct",
+                         "sector_accuracy"))
+        for r in range(NUM_RINGS):
+            writer.writerow((r, RING_MULTIPLIERS[r], c["ring_trials"][r], c["ring_vehicle_ok"][r],
+                             c["ring_correct"][r],
+                             _ratio(c["ring_correct"][r], c["ring_vehicle_ok"][r])))
+
+    with open(os.path.join(out, "sector_ring.csv"), "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(("sector", "ring", "vehicle_ok", "sector_correct", "sector_accuracy"))
+        for s in range(NUM_SECTORS):
+            for r in range(NUM_RINGS):
+                n = c["sector_ring_vehicle_ok"][s, r]
+                k = c["sector_ring_correct"][s, r]
+                writer.writerow((s, r, n, k, _ratio(k, n)))
+
+    exposure_ms = np.arange(MAX_EXPOSURE_MS + 1)
+    groups = {"all": (c["exposure_trials"].sum(axis=0), c["exposure_correct"].sum(axis=0))}
+    for r in range(NUM_RINGS):
+        groups[f"ring{r}"] = (c["exposure_trials"][r], c["exposure_correct"][r])
+    fits = {name: fit_logistic(exposure_ms, n, k) for name, (n, k) in groups.items()}
+
+    with open(os.path.join(out, "fits.csv"), "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(("group", "trials", "alpha_log10ms", "beta", "threshold_ms"))
+        for name, fit in fits.items():
+            n = int(groups[name][0].sum())
+            if fit is None:
+                writer.writerow((name, n, "", "", ""))
+            else:
+                # alpha es el punto medio entre azar y techo de la curva
+                writer.writerow((name, n, round(fit[0], 4), round(fit[1], 4),
+                                 round(10 ** fit[0], 1)))
+
+    with open(os.path.join(out, "exposure.csv"), "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(("group", "exposure_ms", "trials", "correct", "p_observed", "p_fit"))
+        for name, (n, k) in groups.items():
+            fitted = logistic(exposure_ms, fits[name]) if fits[name] else None
+            for ms in np.flatnonzero(n):
+                writer.writerow((name, ms, n[ms], k[ms], _ratio(k[ms], n[ms]),
+                                 "" if fitted is None else round(float(fitted[ms]), 4)))
+
+    write_sessions(agg, os.path.join(out, "sessions.csv"))
+    return fits
+
+
+def _session_row(session, summary):
+    trials, correct, max_level, rt_sum, rt_n, _ = summary
+    return (session, trials, correct, max_level + 1, round(rt_sum / rt_n, 1) if rt_n else "")
+
+
+def write_sessions(agg, path):
+    """Añade las sesiones terminadas a sessions.csv y reescribe detrás las abiertas.
+
+    Las filas anteriores a agg.sessions_offset no se vuelven a escribir; si el
+    archivo es más corto que eso, RuntimeError.
+    """
+    finished = agg.pop_finished_sessions()
+    try:
+        f = open(path, "r+", newline="", encoding="utf-8")
+    except FileNotFoundError:
+        if agg.sessions_offset:
+            raise RuntimeError(f"falta {path}; usa --rebuild")
+        f = open(path, "w+", newline="", encoding="utf-8")
+    with f:
+        if f.seek(0, os.SEEK_END) < agg.sessions_offset:
+            raise RuntimeError(f"{path} es más corto que en la última ejecución; usa --rebuild")
+        f.seek(agg.sessions_offset)
+        f.truncate()
+        writer = csv.writer(f)
+        if not agg.sessions_offset:
+            writer.writerow(SESSIONS_HEADER)
+        for session, summary in finished:
+            writer.writerow(_session_row(session, summary))
+        agg.sessions_offset = f.tell()
+        for session, summary in sorted(agg.sessions.items()):
+            writer.writerow(_session_row(session, summary))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Análisis de los registros de ensayos")
+    parser.add_argument("logs", nargs="?", default="logs")
+    parser.add_argument("--out", default="analytics")
+    parser.add_argument("--rebuild", action="store_true", help="descarta el estado y relee todo")
+    parser.add_argument("--chunk-mb", type=float, default=16)
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.out, exist_ok=True)
+    state_path = os.path.join(args.out, STATE_NAME)
+    agg = Aggregate() if args.rebuild else Aggregate.load(state_path)
+    paths = sorted(glob.glob(os.path.join(args.logs, "trials-*.jsonl")))
+
+    start = time.perf_counter()
+    try:
+        added = update(agg, paths, int(args.chunk_mb * 1024 * 1024))
+    except RuntimeError as e:
+        print(e)
+        return 1
+    elapsed = time.perf_counter() - start
+    # Los informes van antes que el estado: si se interrumpe, la próxima
+    # ejecución recorta sessions.csv al punto guardado y lo repite
+    try:
+        fits = write_reports(agg, args.out)
+    except RuntimeError as e:
+        print(e)
+        return 1
+    agg.save(state_path)
+
+    total = int(agg.counts["sector_trials"].sum())
+    print(f"{added} ensayos nuevos en {elapsed:.2f} s ({total} en total, "
+          f"{agg.finished_sessions + len(agg.sessions)} sesiones, {len(agg.sessions)} abiertas, "
+          f"{agg.bad_lines} líneas inválidas)")
+    if fits["all"]:
+        print(f"Umbral global (punto medio de la curva): {10 ** fits['all'][0]:.0f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+"""Carga de imágenes en segundo plano.
+
+Un grupo de hilos decodifica y escala los PNG (con la caché de sprites) y deja
+los resultados en una cola; el hilo de Tk los recoge poco a poco y sólo crea
+los PhotoImage, que no pueden crearse fuera de él. PIL se importa en el hilo
+de carga, así que no retrasa la primera pantalla.
+"""
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+
+@dataclass(slots=True)
+class AssetJob:
+    """Una imagen a cargar: tipo (vehicle, sign, route66, background), clave, ruta y tamaño"""
+    kind: str
+    key: object
+    path: str
+    size: tuple = None  # tamaño del sprite; None para el fondo
+
+    @property
+    def name(self):
+        return os.path.basename(self.path)
+
+
+def asset_job(index, kind, key):
+    """AssetJob de una imagen del índice, o None si no existe"""
+    path = index.path(kind, key)
+    if path is None:
+        return None
+    return AssetJob(kind, key, path, index.manifest.sets[kind].size)
+
+
+def scan_assets(assets_folder, index=None):
+    """Lista las imágenes que existen en la carpeta de assets.
+
+    Sale del índice construido a partir del manifiesto, así que la
+    biblioteca puede crecer sin tocar el código.
+    """
+    if index is None:
+        from manifest import index_assets
+        index = index_assets(assets_folder)
+    jobs = []
+    for kind in ("vehicle", "sign", "route66", "background"):
+        jobs.extend(asset_job(index, kind, key) for key in index.keys(kind))
+    return jobs
+
+
+def make_glow_image(img):
+    """Versión iluminada de un vehículo sobre un halo amarillo translúcido"""
+    from PIL import Image, ImageEnhance
+    bright_img = ImageEnhance.Brightness(img).enhance(1.3)
+    glow_img = Image.new('RGBA', (img.width + 10, img.height + 10), (255, 255, 0, 50))
+    glow_img.paste(bright_img, (5, 5), bright_img)
+    return glow_img
+
+
+def decode_asset(job, sprite_cache):
+    """Decodifica una imagen en PIL; los vehículos devuelven (normal, halo)"""
+    if job.kind == "background":
+        from PIL import Image
+        img = Image.open(job.path)
+        # Image.open es perezoso: se decodifica aquí y no en el hilo de Tk
+        img.load()
+        return img
+    img = sprite_cache.load(job.path, job.size)
+    if job.kind == "vehicle":
+        return img, make_glow_image(img)
+    return img
+
+
+class AssetLoader:
+    """Decodifica una lista de AssetJob en un grupo de hilos.
+
+    PIL suelta el GIL al decodificar y escalar, así que la carga escala con
+    los núcleos. Los trabajos se reparten en el orden de la lista y cada
+    resultado llega a results como (job, imagen, error) en cuanto está listo;
+    cuando terminan todos se encola None.
+    """
+
+    def __init__(self, assets_folder, jobs, workers=None):
+        self.assets_folder = assets_folder
+        self.jobs = list(jobs)
+        self.workers = max(1, min(workers or os.cpu_count() or 1, len(self.jobs)))
+        self.results = queue.SimpleQueue()
+        self.thread = threading.Thread(target=self._run, name="AssetLoader", daemon=True)
+
+    @property
+    def total(self):
+        return len(self.jobs)
+
+    def start(self):
+        self.thread.start()
+
+    def _decode(self, job, sprite_cache):
+        try:
+            self.results.put((job, decode_asset(job, sprite_cache), None))
+        except Exception as e:
+            self.results.put((job, None, e))
+
+    def _run(self):
+        from sprite_cache import SpriteCache
+        sprite_cache = SpriteCache(self.assets_folder)
+        with ThreadPoolExecutor(self.workers, thread_name_prefix="AssetDecode") as pool:
+            for job in self.jobs:
+                pool.submit(self._decode, job, sprite_cache)
+        sprite_cache.save()
+        self.results.put(None)
@@ -0,0 +1,396 @@
+"""Banco de pruebas de los caminos críticos de dibujo y carga de assets.
+
+Cada prueba se repite a varios tamaños de ventana y números de señales y se
+resume en percentiles (ms) y memoria máxima:
+
+    load        carga de sprites con SpriteCache (en frío y con caché)
+    sector      render de un sector con transparencia (render_sector_image)
+    background  escalado del fondo al tamaño de la ventana (fallo de caché)
+    stimulus    generar el ensayo y componerlo con compose_stimulus del juego
+    motion      barrido del ratón: SectorClassifier y cambio de imagen en SectorOverlayCache
+
+Por defecto todo se mide en PIL y no hace falta pantalla. Con --tk se miden
+además los métodos reales del juego en una ventana (necesita DISPLAY, p. ej.
+con Xvfb); lo que el juego registre va a una carpeta temporal.
+
+Uso:
+    python bench.py [--repeat N] [--sizes 1000x800,1920x1080]
+                    [--save base.json] [--compare base.json] [--tk]
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from PIL import Image, __version__ as PIL_VERSION
+
+import DoubleDecision as game_module
+from asset_loader import decode_asset, scan_assets
+from engine import SectorClassifier, TrialEngine
+from manifest import index_assets, load_manifest
+from sprite_cache import SpriteCache, iter_sprite_assets
+from store import ScoreStore
+from telemetry import NullTracer, TrialLog
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+DEFAULT_SIZES = ((1000, 800), (1920, 1080), (3840, 2160))
+# Niveles 1, 5 y 10: 3, 11 y 21 señales
+DEFAULT_LEVELS = (0, 4, 9)
+# Un resultado es una regresión si su mediana empeora más que este factor
+REGRESSION_FACTOR = 1.25
+# ...y la diferencia supera este margen (las pruebas de microsegundos son ruidosas)
+REGRESSION_MIN_MS = 0.1
+
+
+def percentile(sorted_values, fraction):
+    """Percentil por rango más cercano de una lista ya ordenada"""
+    if not sorted_values:
+        return None
+    index = max(0, math.ceil(fraction * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+def rss_peak_kb():
+    """Memoria residente máxima del proceso en KiB, si el sistema la ofrece"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS la da en bytes, Linux en KiB
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def measure(fn, repeat, setup=None):
+    """Ejecuta fn repeat veces y devuelve el resumen de tiempos y memoria.
+
+    Los tiempos se toman sin tracemalloc; una ejecución adicional con
+    tracemalloc da el pico de memoria de Python de una llamada.
+    """
+    samples = []
+    for _ in range(repeat):
+        state = setup() if setup else None
+        start = time.perf_counter_ns()
+        fn(state)
+        samples.append((time.perf_counter_ns() - start) / 1_000_000)
+
+    state = setup() if setup else None
+    tracemalloc.start()
+    fn(state)
+    _, py_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    samples.sort()
+    return {
+        "n": repeat,
+        "mean_ms": round(sum(samples) / len(samples), 4),
+        "p50_ms": round(percentile(samples, 0.50), 4),
+        "p90_ms": round(percentile(samples, 0.90), 4),
+        "p99_ms": round(percentile(samples, 0.99), 4),
+        "max_ms": round(samples[-1], 4),
+        "py_peak_kb": py_peak // 1024,
+        "rss_peak_kb": rss_peak_kb(),
+    }
+
+
+def sweep_path(width, height, steps=1000):
+    """Recorrido del ratón en espiral alrededor del centro del canvas"""
+    center_x, center_y = width // 2, height // 2
+    radius = min(width, height) * 0.45
+    return [(int(center_x + radius * (i / steps) * math.cos(i * 0.05)),
+             int(center_y + radius * (i / steps) * math.sin(i * 0.05)))
+            for i in range(steps)]
+
+
+class PilBench:
+    """Pruebas que sólo usan PIL; no necesitan ventana"""
+
+    def __init__(self, assets_folder, repeat):
+        self.assets_folder = assets_folder
+        self.repeat = repeat
+        # Las mismas imágenes, niveles y colocación que cargaría el juego, con
+        # una caché de sprites temporal para no tocar assets/.sprite_cache
+        manifest = load_manifest(assets_folder)
+        self.vehicle_sources = {}
+        self.sign_sources = {}
+        self.route66 = None
+        self.background = None
+        with tempfile.TemporaryDirectory(prefix="ddbench-") as tmp:
+            cache = SpriteCache(assets_folder, tmp)
+            for job in scan_assets(assets_folder, index_assets(assets_folder, manifest)):
+                result = decode_asset(job, cache)
+                if job.kind == "vehicle":
+                    self.vehicle_sources[job.key] = result[0]
+                elif job.kind == "sign":
+                    self.sign_sources[job.key] = result
+                elif job.kind == "route66":
+                    self.route66 = result
+                else:
+                    self.background = result
+        self.engine = TrialEngine(self.vehicle_sources, self.sign_sources, seed=1234,
+                                  level_times=manifest.level_times, placer=manifest.placement)
+
+    def bench_load(self):
+        # Copia de los assets para no tocar la caché real
+        with tempfile.TemporaryDirectory() as tmp:
+            folder = os.path.join(tmp, "assets")
+            shutil.copytree(self.assets_folder, folder,
+                            ignore=shutil.ignore_patterns(".sprite_cache"))
+            assets = list(iter_sprite_assets(folder))
+
+            def cold_setup():
+                shutil.rmtree(os.path.join(folder, ".sprite_cache"), ignore_errors=True)
+                return SpriteCache(folder)
+
+            def load_all(cache):
+                for path, size in assets:
+                    cache.load(path, size)
+                cache.save()
+
+            results = {"load/cold": measure(load_all, self.repeat, cold_setup)}
+            load_all(cold_setup())
+            results["load/warm"] = measure(load_all, self.repeat, lambda: SpriteCache(folder))
+        return results
+
+    def bench_sector(self, width, height):
+        center_x, center_y = width // 2, height // 2
+        results = {}
+        for state in ("normal", "hover"):
+            params = game_module.SECTOR_STATES[state]
+
+            def render(_):
+                for sector in range(8):
+                    angle_start = sector * 45 - 22.5
+                    game_module.render_sector_image(width, height, center_x, center_y,
+                                                    angle_start, angle_start + 45, **params)
+
+            results[f"sector/{state}x8"] = measure(render, self.repeat)
+        return results
+
+    def bench_background(self, width, height):
+        if self.background is None:
+            return {}
+        return {"background/resize": measure(
+            lambda _: self.background.resize((width, height), Image.Resampling.LANCZOS),
+            self.repeat)}
+
+    def bench_stimulus(self, width, height, level):
+        if self.background is None:
+            return {}
+        size = (width, height)
+        frame_bg = self.background.resize(size, Image.Resampling.LANCZOS)
+        center_x, center_y = width // 2, height // 2
+        counter = iter(range(10**9))
+
+        def layout(_):
+            trial = self.engine.build_trial(next(counter), level)
+            return [sign.position(center_x, center_y, width, height) for sign in trial.signs]
+
+        def draw(_):
+            # El mismo camino que render_stimulus al preparar el estímulo
+            trial = self.engine.build_trial(next(counter), level)
+            layers = game_module.stimulus_layers(trial, size, self.vehicle_sources,
+                                                 self.sign_sources, self.route66)
+            return game_module.compose_stimulus(size, frame_bg, layers)
+
+        return {
+            "stimulus/layout": measure(layout, self.repeat),
+            "stimulus/draw": measure(draw, self.repeat),
+        }
+
+    def bench_motion(self, width, height):
+        # El clasificador y la caché de sectores del juego; shown hace de
+        # items del canvas (imagen y posición de cada sector)
+        classifier = SectorClassifier(width // 2, height // 2)
+        cache = game_module.SectorOverlayCache(game_module.render_sector_image)
+        cache.warm(width, height, states=("normal", "hover"))
+        cache.show(width, height)
+        shown = [cache.get(width, height, sector, "normal") for sector in range(8)]
+        path = sweep_path(width, height)
+
+        def sweep(_):
+            current = -1
+            for x, y in path:
+                sector = classifier.classify(x, y)
+                if sector != current:
+                    if current != -1:
+                        shown[current] = cache.get(width, height, current, "normal")
+                    if sector != -1:
+                        shown[sector] = cache.get(width, height, sector, "hover")
+                    current = sector
+
+        return {f"motion/sweep{len(path)}": measure(sweep, self.repeat)}
+
+
+class TkBench:
+    """Pruebas sobre los métodos reales del juego en una ventana Tk"""
+
+    def __init__(self, repeat):
+        import tkinter as tk
+        self.repeat = repeat
+        # Puntuaciones, registro de ensayos y grabación no se mezclan con los datos reales
+        self.folder = tempfile.mkdtemp(prefix="ddbench-")
+        self.root = tk.Tk()
+        self.game = game_module.DoubleDecisionGame(
+            self.root, tracer=NullTracer(),
+            store=ScoreStore(os.path.join(self.folder, "bench.db")),
+            trial_log=TrialLog(self.folder), recorder_folder=self.folder)
+        self.root.update()
+
+    def resize(self, width, height):
+        self.root.geometry(f"{width}x{height}")
+        self.root.update()
+
+    def bench_load(self):
+        return {"tk/load_images": measure(lambda _: self.game.load_images(), self.repeat)}
+
+    def bench_size(self, width, height, levels):
+        game = self.game
+        self.resize(width, height)
+        width, height = game.get_canvas_dimensions()
+        results = {}
+
+        def sector(_):
+            for i in range(8):
+                angle_start = i * 45 - 22.5
+                game.create_transparent_sector(width, height, width // 2, height // 2,
+                                               angle_start, angle_start + 45,
+                                               **game_module.SECTOR_STATES["hover"])
+
+        results["tk/create_transparent_sector x8"] = measure(sector, self.repeat)
+
+        def background(_):
+            game.background_cache.images.clear()
+            game.get_scaled_background(width, height)
+
+        results["tk/get_scaled_background"] = measure(background, self.repeat)
+
+        for level in levels:
+            counter = iter(range(10**9))
+
+            def setup():
+                game.trial = game.engine.build_trial(next(counter), level)
+
+            def stimulus(_):
+                game.show_stimulus()
+                self.root.update_idletasks()
+                # Sólo interesa el dibujo: el final del estímulo no se ejecuta
+                game.stimulus_scheduler.active = False
+
+            results[f"tk/show_stimulus/{game.engine.num_signs(level)}signs"] = measure(
+                stimulus, self.repeat, setup)
+
+        game.canvas = game.position_canvas
+        game.layout_position()
+        game.trial_record = None
+        path = sweep_path(game.current_canvas_width, game.current_canvas_height)
+
+        def sweep(_):
+            for x, y in path:
+                game.highlight_sector(game.sector_classifier.classify(x, y))
+            self.root.update_idletasks()
+
+        results[f"tk/motion_sweep{len(path)}"] = measure(sweep, self.repeat)
+        return results
+
+    def close(self):
+        self.game.close()
+        self.root.destroy()
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+
+def run(args):
+    sizes = [tuple(int(v) for v in size.split("x")) for size in args.sizes.split(",")]
+    results = {}
+    bench = PilBench(args.assets, args.repeat)
+    results.update(bench.bench_load())
+    for width, height in sizes:
+        prefix = f"{width}x{height}"
+        partial = {}
+        partial.update(bench.bench_sector(width, height))
+        partial.update(bench.bench_background(width, height))
+        for level in DEFAULT_LEVELS:
+            for name, stats in bench.bench_stimulus(width, height, level).items():
+                partial[f"{name}/{bench.engine.num_signs(level)}signs"] = stats
+        partial.update(bench.bench_motion(width, height))
+        results.update({f"{prefix}/{name}": stats for name, stats in partial.items()})
+
+    if args.tk:
+        tk_bench = TkBench(args.repeat)
+        try:
+            results.update(tk_bench.bench_load())
+            for width, height in sizes:
+                for name, stats in tk_bench.bench_size(width, height, DEFAULT_LEVELS).items():
+                    results[f"{width}x{height}/{name}"] = stats
+        finally:
+            tk_bench.close()
+    return results
+
+
+def print_results(results, baseline=None):
+    """Tabla de resultados; con baseline añade la relación de medianas"""
+    regressions = []
+    print(f"{'prueba':<48} {'p50':>9} {'p90':>9} {'p99':>9} {'max':>9} {'pyKiB':>7}  ref")
+    for name, stats in results.items():
+        line = (f"{name:<48} {stats['p50_ms']:>9.3f} {stats['p90_ms']:>9.3f} "
+                f"{stats['p99_ms']:>9.3f} {stats['max_ms']:>9.3f} {stats['py_peak_kb']:>7}")
+        reference = (baseline or {}).get(name)
+        if reference and reference["p50_ms"] > 0:
+            ratio = stats["p50_ms"] / reference["p50_ms"]
+            line += f"  x{ratio:.2f}"
+            if (ratio > REGRESSION_FACTOR
+                    and stats["p50_ms"] - reference["p50_ms"] > REGRESSION_MIN_MS):
+                line += "  REGRESIÓN"
+                regressions.append(name)
+        print(line)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Banco de pruebas de dibujo y carga")
+    parser.add_argument("--repeat", type=int, default=30)
+    parser.add_argument("--sizes", default=",".join(f"{w}x{h}" for w, h in DEFAULT_SIZES))
+    parser.add_argument("--assets", default="assets")
+    parser.add_argument("--save", metavar="JSON", help="guarda los resultados como referencia")
+    parser.add_argument("--compare", metavar="JSON", help="compara con una referencia guardada")
+    parser.add_argument("--tk", action="store_true", help="mide también los métodos del juego en Tk")
+    args = parser.parse_args(argv)
+
+    results = run(args)
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+    regressions = print_results(results, baseline)
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({
+                "meta": {
+                    "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+                    "python": platform.python_version(),
+                    "pillow": PIL_VERSION,
+                    "platform": platform.platform(),
+                    "repeat": args.repeat,
+                    "tk": args.tk,
+                },
+                "results": results,
+            }, f, indent=1)
+        print(f"Referencia guardada en {args.save}")
+
+    if regressions:
+        print(f"{len(regressions)} pruebas más lentas que la referencia (>{REGRESSION_FACTOR}x)")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,356 @@
+"""Lógica del juego sin interfaz gráfica.
+
+Genera los ensayos (vehículos, señales y sector de RUTA 66), puntúa las
+respuestas y controla el avance de nivel. No depende de Tkinter ni de PIL,
+así que puede usarse para simulaciones y pruebas sin pantalla. La colocación
+de las señales sin solapes (placement.py) es lo que más cuesta de cada
+ensayo: la simulación da del orden de 10k ensayos por segundo, frente a los
+20-50k de cuando las señales salían de la rejilla fija de 24 posiciones. Para
+simulaciones masivas está layouts.simulate_batch (NumPy), que vectoriza la
+escalera de niveles y genera las posiciones por lotes.
+
+Uso:
+    python engine.py [num_ensayos] [semilla]
+"""
+import bisect
+import math
+import random
+import sys
+import time
+from dataclasses import dataclass
+
+from placement import SignPlacer, sprite_side
+
+# Sistema de niveles según la narrativa
+LEVEL_TIMES = {
+    0: {"vehicle": 1000, "signal": 500, "total": 1500},  # Práctica
+    1: {"vehicle": 800, "signal": 400, "total": 1200},   # Nivel 1
+    2: {"vehicle": 650, "signal": 350, "total": 1000},   # Nivel 2
+    3: {"vehicle": 500, "signal": 300, "total": 800},    # Nivel 3
+    4: {"vehicle": 400, "signal": 250, "total": 650},    # Nivel 4
+    5: {"vehicle": 300, "signal": 200, "total": 500},    # Modo PRO
+    6: {"vehicle": 200, "signal": 150, "total": 350},    # Modo Extremo
+    7: {"vehicle": 150, "signal": 120, "total": 270},    # Nivel Extra 1
+    8: {"vehicle": 120, "signal": 100, "total": 220},    # Nivel Extra 2
+    9: {"vehicle": 100, "signal": 80, "total": 180}      # Nivel Máximo
+}
+MAX_LEVEL = max(LEVEL_TIMES)
+RESPONSE_TIME_MS = 2000
+
+NUM_SECTORS = 8
+SECTOR_ANGLE = 360 / NUM_SECTORS
+RING_MULTIPLIERS = (0.25, 0.35, 0.45)  # 3 anillos de distancia
+
+# Fronteras entre anillos: el punto medio entre cada par de radios
+_RING_BOUNDS = tuple((a + b) / 2 for a, b in zip(RING_MULTIPLIERS, RING_MULTIPLIERS[1:]))
+
+# sign_id que identifica a la señal RUTA 66 dentro de un ensayo
+ROUTE66_SIGN = -1
+
+
+def num_total_signs(level):
+    """Número total de señales según el nivel"""
+    # Progresión: 3, 5, 7, 9, 11, 13, 15, 17, 19, 21+ señales
+    return 3 + (level * 2)
+
+
+def nearest_ring(radius):
+    """Anillo de la rejilla clásica más cercano a un radio"""
+    return bisect.bisect_left(_RING_BOUNDS, radius)
+
+
+def points_for_level(level):
+    """Puntos que da un ensayo correcto en el nivel dado"""
+    return 10 * (level + 1)
+
+
+# tan(22.5°): frontera entre un sector de eje y uno diagonal
+_TAN_HALF_SECTOR = math.tan(math.radians(SECTOR_ANGLE / 2))
+
+
+def sector_for_offset(dx, dy, dead_zone=10):
+    """Sector (0-7) al que apunta un desplazamiento desde el centro, o -1.
+
+    Equivale a tomar el ángulo con atan2 (sector 0 de -22.5° a 22.5°, en el
+    sentido en que se dibujan los sectores) pero sólo compara magnitudes, sin
+    raíces ni trigonometría.
+    """
+    if dx * dx + dy * dy <= dead_zone * dead_zone:
+        return -1
+    ax = dx if dx >= 0 else -dx
+    ay = dy if dy >= 0 else -dy
+    if ay < ax * _TAN_HALF_SECTOR:
+        return 0 if dx > 0 else 4
+    if ax < ay * _TAN_HALF_SECTOR:
+        return 2 if dy > 0 else 6
+    if dx > 0:
+        return 1 if dy > 0 else 7
+    return 3 if dy > 0 else 5
+
+
+class SectorClassifier:
+    """Clasificador de píxeles del canvas en sectores para un centro dado.
+
+    Se crea de nuevo sólo cuando cambia la geometría del canvas.
+    """
+
+    def __init__(self, center_x, center_y, dead_zone=10):
+        self.center_x = center_x
+        self.center_y = center_y
+        self.dead_zone = dead_zone
+
+    def classify(self, x, y):
+        return sector_for_offset(x - self.center_x, y - self.center_y, self.dead_zone)
+
+
+@dataclass(slots=True)
+class SignSpec:
+    """Una señal del estímulo: sector, anillo, variación angular y sprite.
+
+    radius es la distancia al centro en fracción del lado menor del canvas;
+    sin él se usa la del anillo. ring es siempre el anillo más cercano.
+    """
+    sector: int
+    ring: int
+    jitter: float
+    sign_id: int
+    radius: float = None
+
+    @property
+    def is_route66(self):
+        return self.sign_id == ROUTE66_SIGN
+
+    @property
+    def angle(self):
+        """Ángulo en grados desde el eje X positivo (sentido horario en pantalla)"""
+        return self.sector * SECTOR_ANGLE + self.jitter
+
+    @property
+    def distance_multiplier(self):
+        return RING_MULTIPLIERS[self.ring] if self.radius is None else self.radius
+
+    def position(self, center_x, center_y, width, height):
+        """Coordenadas en píxeles de la señal en un canvas del tamaño dado"""
+        angle_radians = math.radians(self.angle)
+        sign_distance = min(width, height) * self.distance_multiplier
+        return (center_x + sign_distance * math.cos(angle_radians),
+                center_y + sign_distance * math.sin(angle_radians))
+
+
+@dataclass(slots=True)
+class TrialSpec:
+    """Todo lo necesario para presentar un ensayo"""
+    index: int
+    level: int
+    exposure_ms: int
+    vehicle_options: list
+    target_vehicle: int
+    signs: list
+    route66_index: int
+    spacing: float = None  # distancia mínima entre señales, en fracción del lado menor
+
+    @property
+    def route66(self):
+        return self.signs[self.route66_index]
+
+    @property
+    def route66_sector(self):
+        return self.signs[self.route66_index].sector
+
+    def sprite_scale(self, width, height, sprite_size):
+        """Escala para que un sprite de ese lado no pise a sus vecinas en el canvas dado"""
+        if self.spacing is None:
+            return 1.0
+        return min(1.0, sprite_side(self.spacing) * min(width, height) / sprite_size)
+
+
+@dataclass(slots=True)
+class Outcome:
+    """Resultado de una respuesta"""
+    stage: str  # "vehicle" o "sector"
+    correct: bool
+    timed_out: bool
+    points: int
+    score: int
+    level: int  # nivel tras aplicar la respuesta
+    level_up: bool
+    game_over: bool
+
+
+class TrialEngine:
+    """Secuencia de ensayos de una partida.
+
+    Cada ensayo usa su propio generador derivado de la semilla de la partida y
+    del índice del ensayo, así que el mismo (semilla, índice, nivel) produce
+    siempre el mismo ensayo.
+    """
+
+    mode = "ladder"
+
+    def __init__(self, vehicle_ids, sign_ids, seed=None, level_times=LEVEL_TIMES, placer=None):
+        self.vehicle_ids = sorted(vehicle_ids)
+        self.sign_ids = sorted(sign_ids)
+        self.level_times = level_times
+        self.placer = placer if placer is not None else SignPlacer(NUM_SECTORS)
+        self.max_level = max(level_times)
+        self.seed = seed if seed is not None else random.randrange(2**63)
+        # El índice no se reinicia entre partidas para no repetir ensayos
+        self.trial_index = 0
+        self.reset()
+
+    def reset(self):
+        """Vuelve al nivel inicial con la puntuación a cero"""
+        self.score = 0
+        self.level = 0
+        self.trial = None
+        self.stage = "idle"
+
+    def exposure_ms(self, level):
+        return self.level_times.get(level, self.level_times[self.max_level])["total"]
+
+    def num_signs(self, level):
+        """Señales del nivel: las que fije su definición o la progresión de siempre"""
+        times = self.level_times.get(level, self.level_times[self.max_level])
+        return times.get("signs", num_total_signs(min(level, self.max_level)))
+
+    def trial_rng(self, index):
+        return random.Random(self.seed * 1_000_003 + index)
+
+    def build_trial(self, index, level, num_signs=None):
+        """Genera el ensayo número index para el nivel dado, sin cambiar el estado.
+
+        num_signs sustituye al número de señales del nivel (modo adaptativo).
+        """
+        rng = self.trial_rng(index)
+        if num_signs is None:
+            num_signs = self.num_signs(level)
+
+        vehicle_options = rng.sample(self.vehicle_ids, min(2, len(self.vehicle_ids)))
+        target_vehicle = rng.choice(vehicle_options) if vehicle_options else None
+
+        # Posiciones sin solapes repartidas por sectores; una de ellas será RUTA 66
+        layout = self.placer.place(rng, num_signs)
+        route66_index = layout.route66_index
+
+        sign_ids = self.sign_ids
+        signs = []
+        for i, (sector, jitter, radius) in enumerate(layout.slots):
+            if i == route66_index:
+                sign_id = ROUTE66_SIGN
+            else:
+                sign_id = rng.choice(sign_ids) if sign_ids else None
+            signs.append(SignSpec(sector, nearest_ring(radius), jitter, sign_id, radius))
+
+        return TrialSpec(index, level, self.exposure_ms(level), vehicle_options,
+                         target_vehicle, signs, route66_index, layout.spacing)
+
+    def predict_next_trial(self):
+        """El ensayo que probablemente seguirá al actual, sin cambiar el estado.
+
+        Mientras se responde se supone un acierto, porque un fallo termina la
+        partida. Devuelve None si no se puede saber.
+        """
+        if self.stage in ("vehicle", "sector"):
+            return self.build_trial(self.trial_index, min(self.level + 1, self.max_level))
+        if self.stage == "idle":
+            return self.build_trial(self.trial_index, self.level)
+        return None
+
+    def is_next_trial(self, spec):
+        """True si spec es exactamente el ensayo que daría ahora new_trial()"""
+        return (spec.index == self.trial_index and spec.level == self.level
+                and spec.exposure_ms == self.exposure_ms(self.level))
+
+    def new_trial(self, spec=None):
+        """Genera el siguiente ensayo y espera la respuesta de vehículo.
+
+        Con spec se usa un ensayo ya preparado (p. ej. de un LayoutBatch).
+        Tras un fallo se puede seguir en el mismo nivel (como al volver al
+        menú) o llamar a reset() para empezar de cero.
+        """
+        self.trial = spec if spec is not None else self.build_trial(self.trial_index, self.level)
+        self.trial_index += 1
+        self.stage = "vehicle"
+        return self.trial
+
+    def _outcome(self, stage, correct, timed_out=False):
+        points = 0
+        level_up = False
+        game_over = not correct
+        if correct and stage == "sector":
+            points = points_for_level(self.level)
+            self.score += points
+            if self.level < self.max_level:
+                self.level += 1
+                level_up = True
+        self.stage = "over" if game_over else ("sector" if stage == "vehicle" else "idle")
+        return Outcome(stage, correct, timed_out, points, self.score, self.level,
+                       level_up, game_over)
+
+    def submit_vehicle(self, vehicle):
+        """Registra la elección de vehículo"""
+        if self.stage != "vehicle":
+            raise RuntimeError(f"No se espera un vehículo en la fase '{self.stage}'")
+        return self._outcome("vehicle", vehicle == self.trial.target_vehicle)
+
+    def submit_sector(self, sector):
+        """Registra la elección de sector"""
+        if self.stage != "sector":
+            raise RuntimeError(f"No se espera un sector en la fase '{self.stage}'")
+        return self._outcome("sector", sector == self.trial.route66_sector)
+
+    def timeout(self):
+        """El participante no respondió a tiempo en la fase actual"""
+        if self.stage not in ("vehicle", "sector"):
+            raise RuntimeError(f"No hay respuesta pendiente en la fase '{self.stage}'")
+        return self._outcome(self.stage, False, timed_out=True)
+
+
+def simulate(num_trials, seed=None, accuracy=0.9, vehicle_ids=range(8), sign_ids=range(7)):
+    """Juega num_trials ensayos con un participante simulado.
+
+    Cada respuesta es correcta con probabilidad accuracy; tras un fin de
+    partida se empieza otra. Devuelve un resumen de la simulación.
+    """
+    engine = TrialEngine(vehicle_ids, sign_ids, seed=seed)
+    responder = random.Random(engine.seed)
+    games = 0
+    correct = 0
+    best_score = 0
+    level_counts = [0] * (engine.max_level + 1)
+    for _ in range(num_trials):
+        trial = engine.new_trial()
+        level_counts[trial.level] += 1
+        if responder.random() < accuracy:
+            vehicle = trial.target_vehicle
+        else:
+            vehicle = next((v for v in trial.vehicle_options if v != trial.target_vehicle), None)
+        outcome = engine.submit_vehicle(vehicle)
+        if not outcome.game_over:
+            sector = trial.route66_sector
+            if responder.random() >= accuracy:
+                sector = (sector + responder.randrange(1, NUM_SECTORS)) % NUM_SECTORS
+            outcome = engine.submit_sector(sector)
+        if outcome.game_over:
+            games += 1
+            best_score = max(best_score, engine.score)
+            engine.reset()
+        else:
+            correct += 1
+    return {
+        "trials": num_trials,
+        "correct": correct,
+        "games": games,
+        "best_score": max(best_score, engine.score),
+        "trials_per_level": level_counts,
+    }
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    seed = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    start = time.perf_counter()
+    result = simulate(count, seed=seed)
+    elapsed = time.perf_counter() - start
+    print(result)
+    print(f"{count / elapsed:,.0f} ensayos/s")
@@ -0,0 +1,348 @@
+"""Generación de bloques de distribuciones de estímulos con NumPy.
+
+Produce N ensayos de una vez a partir de una semilla explícita y los guarda
+en arrays compactos. Las posiciones siguen las reglas de placement.SignPlacer
+(corona, cuotas por sector, separación mínima, margen de RUTA 66). Hasta
+SMALL_COUNT señales los dardos se lanzan para todos los ensayos a la vez,
+señal a señal: la distribución es la de place(), pero no las posiciones
+concretas. Con más señales cada ensayo llama a place() en un bucle de Python.
+Sirve para precalcular bloques de entrenamiento y para simulaciones grandes:
+simulate_batch juega como engine.simulate, pero con la escalera de niveles y
+la puntuación vectorizadas y las posiciones generadas por lotes de nivel.
+La línea de órdenes usa los assets, niveles y colocación del manifiesto.
+
+Uso:
+    python layouts.py num_ensayos nivel semilla salida.npz
+    python layouts.py simulate num_ensayos [semilla]
+"""
+import math
+import random
+import sys
+import time
+
+import numpy as np
+
+from engine import (LEVEL_TIMES, NUM_SECTORS, RING_MULTIPLIERS, ROUTE66_SIGN, SECTOR_ANGLE,
+                    SignSpec, TrialSpec, num_total_signs, points_for_level)
+from manifest import ManifestError, index_assets, load_manifest
+from placement import MAX_ATTEMPTS, MAX_SIGNS, SMALL_COUNT, SPACING_SHRINK, SignPlacer
+
+_RING_MULTIPLIERS = np.asarray(RING_MULTIPLIERS, dtype=np.float32)
+# Fronteras entre anillos, como engine.nearest_ring
+_RING_BOUNDS = (_RING_MULTIPLIERS[1:] + _RING_MULTIPLIERS[:-1]) / 2
+# Señales por pasada y dardos por ensayo en cada ronda; acotan la memoria
+_CHUNK_SIGNS = 1 << 20
+_DARTS_PER_ROUND = 2
+# Distractor sin sprite disponible (sign_id None en SignSpec)
+_NO_SIGN = -2
+
+
+class LayoutBatch:
+    """N ensayos de un mismo nivel guardados como arrays.
+
+    sectors, rings, jitter, radius y sign_ids tienen forma (n, k), con k
+    señales por ensayo; sign_ids vale ROUTE66_SIGN en la posición
+    route66_index de cada fila. spacing (n,) es la separación de cada ensayo,
+    vehicle_options tiene forma (n, 2) y target_vehicle (n,). Los bloques
+    guardados antes de SignPlacer no tienen radius ni spacing (None): sus
+    señales están a la distancia de su anillo.
+    """
+
+    FIELDS = ("sectors", "rings", "jitter", "sign_ids", "route66_index",
+              "vehicle_options", "target_vehicle", "radius", "spacing")
+
+    def __init__(self, seed, level, sectors, rings, jitter, sign_ids, route66_index,
+                 vehicle_options, target_vehicle, radius=None, spacing=None):
+        self.seed = seed
+        self.level = level
+        self.sectors = sectors
+        self.rings = rings
+        self.jitter = jitter
+        self.sign_ids = sign_ids
+        self.route66_index = route66_index
+        self.vehicle_options = vehicle_options
+        self.target_vehicle = target_vehicle
+        self.radius = radius
+        self.spacing = spacing
+
+    def __len__(self):
+        return len(self.sectors)
+
+    @property
+    def route66_sectors(self):
+        return self.sectors[np.arange(len(self)), self.route66_index]
+
+    def angles(self):
+        """Ángulo real (con la variación usada) de cada señal, en grados"""
+        return self.sectors * np.float32(SECTOR_ANGLE) + self.jitter
+
+    def pixel_coords(self, width, height):
+        """Coordenadas (x, y) de cada señal en un canvas; forma (n, k, 2)"""
+        radians = np.radians(self.angles())
+        multipliers = _RING_MULTIPLIERS[self.rings] if self.radius is None else self.radius
+        distance = np.float32(min(width, height)) * multipliers
+        coords = np.empty(self.sectors.shape + (2,), dtype=np.float32)
+        coords[..., 0] = width // 2 + distance * np.cos(radians)
+        coords[..., 1] = height // 2 + distance * np.sin(radians)
+        return coords
+
+    def trial(self, i, index=None, level_times=LEVEL_TIMES):
+        """Convierte la fila i en un TrialSpec que el juego puede presentar"""
+        radii = [None] * len(self.sectors[i]) if self.radius is None else self.radius[i]
+        signs = [SignSpec(int(sector), int(ring), float(jitter),
+                          None if sign_id == _NO_SIGN else int(sign_id),
+                          None if radius is None else float(radius))
+                 for sector, ring, jitter, sign_id, radius in zip(
+                     self.sectors[i], self.rings[i], self.jitter[i], self.sign_ids[i], radii)]
+        exposure = level_times.get(self.level, level_times[max(level_times)])["total"]
+        spacing = None if self.spacing is None else float(self.spacing[i])
+        return TrialSpec(i if index is None else index, self.level, exposure,
+                         [int(v) for v in self.vehicle_options[i]],
+                         int(self.target_vehicle[i]), signs, int(self.route66_index[i]),
+                         spacing)
+
+    def save(self, path):
+        fields = {name: getattr(self, name) for name in self.FIELDS}
+        np.savez_compressed(path, seed=self.seed, level=self.level,
+                            **{name: value for name, value in fields.items() if value is not None})
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(int(data["seed"]), int(data["level"]),
+                       *(data[name] if name in data else None for name in cls.FIELDS))
+
+
+def _sample_without_replacement(rng, n, population, k):
+    """k índices distintos de range(population) por fila; forma (n, k)"""
+    return np.argsort(rng.random((n, population)), axis=1)[:, :k]
+
+
+def _sign_sectors(rng, placer, n, k):
+    """Sector de cada señal (n, k) con RUTA 66 en la columna 0 y el resto por sectores"""
+    sectors = placer.num_sectors
+    if placer.balance:
+        base, extra = divmod(k, sectors)
+        quotas = np.full((n, sectors), base, dtype=np.int64)
+        if extra:
+            chosen = _sample_without_replacement(rng, n, sectors, extra)
+            np.put_along_axis(quotas, chosen, base + 1, axis=1)
+    else:
+        quotas = np.zeros((n, sectors), dtype=np.int64)
+        np.add.at(quotas, (np.repeat(np.arange(n), k), rng.integers(0, sectors, n * k)), 1)
+    # RUTA 66 en uno de los sectores con señales, todos con la misma probabilidad
+    route66 = np.where(quotas > 0, rng.random((n, sectors)), -1.0).argmax(axis=1)
+    quotas[np.arange(n), route66] -= 1
+    ends = np.cumsum(quotas, axis=1)
+    rest = (ends[:, None, :] <= np.arange(k - 1)[None, :, None]).sum(axis=2)
+    return np.concatenate([route66[:, None], rest], axis=1)
+
+
+def _throw_darts(rng, placer, sign_sectors):
+    """Lanzamiento de dardos de SignPlacer para todas las filas a la vez.
+
+    Columna a columna, cada fila prueba hasta MAX_ATTEMPTS posiciones (en
+    rondas de _DARTS_PER_ROUND) contra las señales ya colocadas; si ninguna
+    vale se reduce su separación, como en place(). Devuelve desvío en grados,
+    radio y separación final.
+    """
+    n, k = sign_sectors.shape
+    sector_angle = 2 * math.pi / placer.num_sectors
+    half_sector = sector_angle / 2
+    spacing = placer.spacing_for(k)
+    low, high = placer.route66_band(spacing)
+    margin = math.asin(min(1.0, spacing / 2 / low))
+    bands = [(low, high, half_sector - margin)] + [placer.band(spacing) + (half_sector,)] * (k - 1)
+    offsets = np.zeros((n, k))
+    radius = np.zeros((n, k))
+    xs = np.zeros((n, k))
+    ys = np.zeros((n, k))
+    min_sq = np.full(n, spacing * spacing)
+    darts = np.arange(_DARTS_PER_ROUND)
+    for col, (low, high, max_offset) in enumerate(bands):
+        pending = np.arange(n)
+        used = np.zeros(n, dtype=np.int64)
+        while len(pending):
+            m = len(pending)
+            # En la primera ronda están todas las filas: vistas en lugar de copias
+            index = pending if m < n else slice(None)
+            # Radio uniforme en área y ángulo uniforme dentro del margen
+            r = np.sqrt(low * low + rng.random((m, _DARTS_PER_ROUND)) * (high * high - low * low))
+            offset = (2 * rng.random((m, _DARTS_PER_ROUND)) - 1) * max_offset
+            angle = sign_sectors[index, col, None] * sector_angle + offset
+            x = r * np.cos(angle)
+            y = r * np.sin(angle)
+            dx = xs[index, None, :col] - x[:, :, None]
+            dy = ys[index, None, :col] - y[:, :, None]
+            dx *= dx
+            dy *= dy
+            dx += dy
+            ok = (dx >= min_sq[index, None, None]).all(axis=2)
+            ok &= darts < (MAX_ATTEMPTS - used[index])[:, None]
+            placed = ok.any(axis=1)
+            hit = ok.argmax(axis=1)[placed]
+            rows = pending[placed]
+            offsets[rows, col] = offset[placed, hit]
+            radius[rows, col] = r[placed, hit]
+            xs[rows, col] = x[placed, hit]
+            ys[rows, col] = y[placed, hit]
+            pending = pending[~placed]
+            used[pending] += _DARTS_PER_ROUND
+            exhausted = used[pending] >= MAX_ATTEMPTS
+            min_sq[pending[exhausted]] *= SPACING_SHRINK * SPACING_SHRINK
+            used[pending[exhausted]] = 0
+    return np.degrees(offsets), radius, np.sqrt(min_sq)
+
+
+def _place_batch(rng, placer, n, k):
+    """Colocación vectorizada de n ensayos de k señales, por bloques de filas"""
+    sectors = np.zeros((n, k), dtype=np.int8)
+    jitter = np.zeros((n, k), dtype=np.float32)
+    radius = np.zeros((n, k), dtype=np.float32)
+    spacing = np.zeros(n, dtype=np.float32)
+    step = max(1, _CHUNK_SIGNS // k)
+    for start in range(0, n, step):
+        chunk = slice(start, min(n, start + step))
+        sign_sectors = _sign_sectors(rng, placer, chunk.stop - start, k)
+        sectors[chunk] = sign_sectors
+        jitter[chunk], radius[chunk], spacing[chunk] = _throw_darts(rng, placer, sign_sectors)
+    # RUTA 66 se coloca la primera; se lleva a una posición al azar
+    route66_index = rng.integers(0, k, n).astype(np.int16)
+    columns = np.arange(k)[None, :]
+    source = np.where(columns < route66_index[:, None], columns + 1, columns)
+    source[columns == route66_index[:, None]] = 0
+    sectors, jitter, radius = (np.take_along_axis(a, source, axis=1)
+                               for a in (sectors, jitter, radius))
+    return sectors, jitter, radius, spacing, route66_index
+
+
+def _place_each(rng, placer, n, k):
+    """Colocación ensayo a ensayo con place(), cada uno con un generador
+    derivado de rng; con muchas señales la tabla de celdas de place() sale
+    más barata que comparar cada dardo con todas las anteriores."""
+    sectors = np.zeros((n, k), dtype=np.int8)
+    jitter = np.zeros((n, k), dtype=np.float32)
+    radius = np.zeros((n, k), dtype=np.float32)
+    spacing = np.zeros(n, dtype=np.float32)
+    route66_index = np.zeros(n, dtype=np.int16)
+    for row, row_seed in enumerate(rng.integers(0, 2**63, n).tolist()):
+        layout = placer.place(random.Random(row_seed), k)
+        sectors[row], jitter[row], radius[row] = zip(*layout.slots)
+        spacing[row] = layout.spacing
+        route66_index[row] = layout.route66_index
+    return sectors, jitter, radius, spacing, route66_index
+
+
+def generate_layouts(n, level, seed, vehicle_ids=range(8), sign_ids=range(7),
+                     level_times=LEVEL_TIMES, placer=None):
+    """Genera n ensayos del nivel dado a partir de la semilla.
+
+    El número de señales (entre 1 y MAX_SIGNS) y las reglas de colocación
+    son los del juego con esos niveles y ese SignPlacer (el de por defecto
+    si no se da).
+    """
+    rng = np.random.default_rng(seed)
+    placer = placer if placer is not None else SignPlacer(NUM_SECTORS)
+    vehicle_ids = np.asarray(sorted(vehicle_ids), dtype=np.int16)
+    sign_ids = np.asarray(sorted(sign_ids), dtype=np.int16)
+    rows = np.arange(n)
+
+    choices = min(2, len(vehicle_ids))
+    vehicle_options = vehicle_ids[_sample_without_replacement(rng, n, len(vehicle_ids), choices)]
+    target_vehicle = vehicle_options[rows, rng.integers(0, choices, n)]
+
+    times = level_times.get(level, level_times[max(level_times)])
+    k = max(1, min(times.get("signs", num_total_signs(min(level, max(level_times)))), MAX_SIGNS))
+    if k <= SMALL_COUNT:
+        sectors, jitter, radius, spacing, route66_index = _place_batch(rng, placer, n, k)
+    else:
+        sectors, jitter, radius, spacing, route66_index = _place_each(rng, placer, n, k)
+    rings = np.searchsorted(_RING_BOUNDS, radius, side="left").astype(np.int8)
+
+    if len(sign_ids):
+        signs = sign_ids[rng.integers(0, len(sign_ids), (n, k))]
+    else:
+        signs = np.full((n, k), _NO_SIGN, dtype=np.int16)
+    signs[rows, route66_index] = ROUTE66_SIGN
+
+    return LayoutBatch(seed, level, sectors, rings, jitter, signs, route66_index,
+                       vehicle_options, target_vehicle, radius, spacing)
+
+
+def simulate_batch(num_trials, seed=None, accuracy=0.9, vehicle_ids=range(8), sign_ids=range(7),
+                   level_times=LEVEL_TIMES, placer=None, layouts=True):
+    """Juega num_trials ensayos con un participante simulado, todos a la vez.
+
+    Mismo participante y mismo resumen que engine.simulate (cada respuesta
+    acierta con probabilidad accuracy y tras un fallo empieza otra partida),
+    aunque con otra secuencia aleatoria. Como las respuestas no dependen de
+    las posiciones, primero se resuelve la escalera de niveles y luego se
+    genera de una vez el bloque de cada nivel; con layouts=False sólo se
+    simula la puntuación. Devuelve (resumen, {nivel: LayoutBatch}); la fila
+    j del bloque de un nivel es su j-ésimo ensayo de la simulación.
+    """
+    rng = np.random.default_rng(seed)
+    max_level = max(level_times)
+    index = np.arange(num_trials)
+    correct = (rng.random(num_trials) < accuracy) & (rng.random(num_trials) < accuracy)
+    # Cada partida empieza en el ensayo que sigue a un fallo
+    starts = np.zeros(num_trials, dtype=np.int64)
+    starts[1:] = np.where(correct[:-1], 0, index[1:])
+    np.maximum.accumulate(starts, out=starts)
+    levels = np.minimum(index - starts, max_level)
+    score = np.cumsum(np.where(correct, points_for_level(levels), 0))
+    # Puntuación de cada partida: la acumulada al acabar menos la de antes de empezar
+    ends = np.flatnonzero(~correct)
+    if not len(ends) or ends[-1] != num_trials - 1:
+        ends = np.append(ends, num_trials - 1)
+    game_starts = starts[ends]
+    scores = score[ends] - np.where(game_starts > 0, score[game_starts - 1], 0)
+    trials_per_level = np.bincount(levels, minlength=max_level + 1)
+    summary = {
+        "trials": num_trials,
+        "correct": int(correct.sum()),
+        "games": int((~correct).sum()),
+        "best_score": int(scores.max()) if num_trials else 0,
+        "trials_per_level": trials_per_level.tolist(),
+    }
+    batches = {}
+    if layouts:
+        for level, count in enumerate(trials_per_level.tolist()):
+            if count:
+                batches[level] = generate_layouts(count, level, rng.integers(2**63), vehicle_ids,
+                                                  sign_ids, level_times, placer)
+    return summary, batches
+
+
+def _simulate_main(argv):
+    count = int(argv[0]) if argv else 1_000_000
+    seed = int(argv[1]) if len(argv) > 1 else None
+    for layouts in (False, True):
+        start = time.perf_counter()
+        summary, _ = simulate_batch(count, seed, layouts=layouts)
+        elapsed = time.perf_counter() - start
+        what = "con posiciones" if layouts else "sólo puntuación"
+        print(f"{what}: {count / elapsed:,.0f} ensayos/s")
+    print(summary)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "simulate":
+        _simulate_main(sys.argv[2:])
+        sys.exit(0)
+    if len(sys.argv) != 5:
+        print(__doc__)
+        sys.exit(2)
+    count, level, seed = (int(v) for v in sys.argv[1:4])
+    try:
+        manifest = load_manifest("assets")
+    except ManifestError as e:
+        print(f"Manifiesto no válido: {e}")
+        sys.exit(1)
+    index = index_assets("assets", manifest)
+    start = time.perf_counter()
+    batch = generate_layouts(count, level, seed, index.keys("vehicle"), index.keys("sign"),
+                             manifest.level_times, manifest.placement)
+    elapsed = time.perf_counter() - start
+    batch.save(sys.argv[4])
+    print(f"{count} ensayos de nivel {level + 1} en {elapsed * 1000:.1f} ms -> {sys.argv[4]}")
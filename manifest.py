@@ -0,0 +1,290 @@
+"""Manifiesto de assets y niveles.
+
+assets/manifest.json declara los conjuntos de imágenes (carpeta y patrón de
+nombre, o archivo fijo, y el tamaño al que se escalan) y la definición de
+cada nivel, y opcionalmente cómo se colocan las señales. Se valida una sola
+vez al arrancar; si falta se usan los valores de siempre. index_assets
+recorre cada carpeta declarada una sola vez y deja en memoria qué archivo
+corresponde a cada vehículo y señal.
+
+Uso:
+    python manifest.py [carpeta_assets]
+"""
+import json
+import os
+import re
+import sys
+from dataclasses import dataclass
+
+from engine import LEVEL_TIMES, NUM_SECTORS, num_total_signs
+from placement import MAX_SIGNS, SignPlacer
+
+MANIFEST_NAME = "manifest.json"
+FORMAT_VERSION = 1
+# Con más sprites que esto sólo se mantienen cargados los del ensayo actual
+DEFAULT_LAZY_THRESHOLD = 64
+
+# Tamaños a los que se escala cada tipo de sprite
+DEFAULT_SPRITE_SIZES = {
+    "vehicle": (150, 150),
+    "route66": (80, 80),
+    "sign": (70, 70),
+}
+# Los archivos numerados van de 1 a MAX_ASSET_ID (claves 0 a MAX_ASSET_ID - 1,
+# lo que cabe en las grabaciones)
+MAX_ASSET_ID = 65536
+_ASSET_NUMBER = re.compile(r"[1-9]\d*")
+SPRITE_KINDS = ("vehicle", "sign", "route66")
+REQUIRED_SETS = SPRITE_KINDS + ("background",)
+
+
+class ManifestError(ValueError):
+    """El manifiesto no es válido; el mensaje enumera todos los problemas"""
+
+
+@dataclass(slots=True)
+class AssetSet:
+    """Un conjunto de imágenes: numeradas en una carpeta (pattern) o un único archivo"""
+    kind: str
+    folder: str
+    pattern: object = None  # expresión regular compilada con el número en el grupo 1
+    file: str = None
+    size: tuple = None
+
+    def match(self, name):
+        """Clave del archivo dentro del conjunto (número - 1, o None), o False si no es suyo.
+
+        Un archivo con el patrón pero numerado fuera de 1..MAX_ASSET_ID (o con
+        ceros a la izquierda) da ValueError.
+        """
+        if self.file is not None:
+            return None if name.lower() == self.file.lower() else False
+        found = self.pattern.match(name)
+        if not found:
+            return False
+        number = found.group(1)
+        if not _ASSET_NUMBER.fullmatch(number) or int(number) > MAX_ASSET_ID:
+            raise ValueError(f"el número debe ir de 1 a {MAX_ASSET_ID} sin ceros delante")
+        return int(number) - 1
+
+
+@dataclass(slots=True)
+class Manifest:
+    sets: dict
+    level_times: dict
+    lazy_threshold: int = DEFAULT_LAZY_THRESHOLD
+    placement: SignPlacer = None
+
+    @property
+    def sprite_sizes(self):
+        return {kind: s.size for kind, s in self.sets.items() if s.size is not None}
+
+
+def _pattern(text):
+    """Convierte 'vehicle{n}.png' en una expresión regular con el número capturado"""
+    before, sep, after = text.partition("{n}")
+    if not sep:
+        raise ValueError("falta {n}")
+    return re.compile(f"^{re.escape(before)}(\\d+){re.escape(after)}$", re.IGNORECASE)
+
+
+def default_manifest_data():
+    """El manifiesto equivalente a los assets y niveles de siempre"""
+    placer = SignPlacer(NUM_SECTORS)
+    return {
+        "version": FORMAT_VERSION,
+        "lazy_threshold": DEFAULT_LAZY_THRESHOLD,
+        "sets": {
+            "vehicle": {"folder": "vehicles", "pattern": "vehicle{n}.png",
+                        "size": list(DEFAULT_SPRITE_SIZES["vehicle"])},
+            "sign": {"folder": "signs", "pattern": "sign{n}.png",
+                     "size": list(DEFAULT_SPRITE_SIZES["sign"])},
+            "route66": {"folder": "signs", "file": "route66.png",
+                        "size": list(DEFAULT_SPRITE_SIZES["route66"])},
+            "background": {"folder": "backgrounds", "file": "road_background.png"},
+        },
+        "levels": [dict(times, signs=num_total_signs(level))
+                   for level, times in sorted(LEVEL_TIMES.items())],
+        "placement": {"inner": placer.inner, "outer": placer.outer, "density": placer.density,
+                      "max_spacing": placer.max_spacing, "balance": placer.balance},
+    }
+
+
+def parse_manifest(data):
+    """Valida los datos de un manifiesto y devuelve un Manifest; si no, ManifestError"""
+    problems = []
+    if not isinstance(data, dict):
+        raise ManifestError("el manifiesto debe ser un objeto JSON")
+    if data.get("version") != FORMAT_VERSION:
+        problems.append(f"versión {data.get('version')!r} no soportada (se espera {FORMAT_VERSION})")
+
+    sets = {}
+    raw_sets = data.get("sets")
+    if not isinstance(raw_sets, dict):
+        problems.append("'sets' debe ser un objeto")
+        raw_sets = {}
+    for kind in REQUIRED_SETS:
+        spec = raw_sets.get(kind)
+        if not isinstance(spec, dict):
+            problems.append(f"sets.{kind}: falta")
+            continue
+        folder = spec.get("folder")
+        if not isinstance(folder, str) or not folder or os.path.isabs(folder) or ".." in folder:
+            problems.append(f"sets.{kind}.folder: debe ser una carpeta relativa dentro de assets")
+            continue
+        pattern = file = None
+        if isinstance(spec.get("file"), str) and spec["file"]:
+            file = spec["file"]
+        elif isinstance(spec.get("pattern"), str):
+            try:
+                pattern = _pattern(spec["pattern"])
+            except ValueError as e:
+                problems.append(f"sets.{kind}.pattern: {e}")
+                continue
+        else:
+            problems.append(f"sets.{kind}: hace falta 'file' o 'pattern'")
+            continue
+        size = spec.get("size")
+        if kind in SPRITE_KINDS:
+            if (not isinstance(size, list) or len(size) != 2
+                    or not all(isinstance(v, int) and 0 < v <= 4096 for v in size)):
+                problems.append(f"sets.{kind}.size: debe ser [ancho, alto] en píxeles")
+                continue
+            size = tuple(size)
+        elif size is not None:
+            problems.append(f"sets.{kind}.size: el fondo se escala a la ventana, sin tamaño fijo")
+            continue
+        sets[kind] = AssetSet(kind, folder, pattern, file, size)
+    for kind in ("vehicle", "sign"):
+        if kind in sets and sets[kind].pattern is None:
+            problems.append(f"sets.{kind}: necesita 'pattern' para numerar la biblioteca")
+
+    level_times = {}
+    levels = data.get("levels")
+    if not isinstance(levels, list) or not levels:
+        problems.append("'levels' debe ser una lista no vacía")
+        levels = []
+    for i, level in enumerate(levels):
+        if not isinstance(level, dict):
+            problems.append(f"levels[{i}]: debe ser un objeto")
+            continue
+        bad = [key for key in ("vehicle", "signal", "total")
+               if not isinstance(level.get(key), int) or level[key] <= 0]
+        if bad:
+            problems.append(f"levels[{i}]: {', '.join(bad)} deben ser milisegundos positivos")
+            continue
+        signs = level.get("signs", num_total_signs(i))
+        if not isinstance(signs, int) or not 1 <= signs <= MAX_SIGNS:
+            problems.append(f"levels[{i}].signs: entre 1 y {MAX_SIGNS}")
+            continue
+        level_times[i] = {"vehicle": level["vehicle"], "signal": level["signal"],
+                          "total": level["total"], "signs": signs}
+
+    lazy_threshold = data.get("lazy_threshold", DEFAULT_LAZY_THRESHOLD)
+    if not isinstance(lazy_threshold, int) or lazy_threshold < 0:
+        problems.append("'lazy_threshold' debe ser un entero no negativo")
+
+    placer = SignPlacer(NUM_SECTORS)
+    placement = data.get("placement", {})
+    if not isinstance(placement, dict):
+        problems.append("'placement' debe ser un objeto")
+        placement = {}
+    for key, value in placement.items():
+        if key == "balance" and isinstance(value, bool):
+            placer.balance = value
+        elif (key in ("inner", "outer", "density", "max_spacing")
+              and isinstance(value, (int, float)) and not isinstance(value, bool)):
+            setattr(placer, key, float(value))
+        else:
+            problems.append(f"placement.{key}: clave o valor no válidos")
+    problems.extend(f"placement: {problem}" for problem in placer.check())
+
+    if problems:
+        raise ManifestError("; ".join(problems))
+    return Manifest(sets, level_times, lazy_threshold, placer)
+
+
+def load_manifest(assets_folder):
+    """Lee y valida assets/manifest.json; sin archivo se usa el manifiesto por defecto"""
+    path = os.path.join(assets_folder, MANIFEST_NAME)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        data = default_manifest_data()
+    except (OSError, ValueError) as e:
+        raise ManifestError(f"{path}: {e}") from e
+    return parse_manifest(data)
+
+
+class AssetIndex:
+    """Qué archivo hay para cada (tipo, clave), sacado de un único recorrido por carpeta.
+
+    Los archivos mal numerados se descartan y quedan en problems.
+    """
+
+    def __init__(self, assets_folder, manifest):
+        self.assets_folder = assets_folder
+        self.manifest = manifest
+        self.files = {kind: {} for kind in manifest.sets}
+        self.problems = []
+        by_folder = {}
+        for asset_set in manifest.sets.values():
+            by_folder.setdefault(asset_set.folder, []).append(asset_set)
+        for folder, asset_sets in by_folder.items():
+            try:
+                with os.scandir(os.path.join(assets_folder, folder)) as entries:
+                    for entry in entries:
+                        for asset_set in asset_sets:
+                            try:
+                                key = asset_set.match(entry.name)
+                            except ValueError as e:
+                                self.problems.append(f"{folder}/{entry.name}: {e}")
+                                break
+                            if key is not False and entry.is_file():
+                                self.files[asset_set.kind][key] = entry.path
+                                break
+            except OSError:
+                continue
+
+    def keys(self, kind):
+        return sorted(self.files[kind])
+
+    def path(self, kind, key):
+        return self.files[kind].get(key)
+
+    @property
+    def sprite_count(self):
+        return len(self.files["vehicle"]) + len(self.files["sign"])
+
+
+def index_assets(assets_folder, manifest=None):
+    """Índice de los assets según el manifiesto (el de la carpeta si no se da).
+
+    Avisa de cada archivo descartado.
+    """
+    index = AssetIndex(assets_folder, manifest or load_manifest(assets_folder))
+    for problem in index.problems:
+        print(f"Asset ignorado: {problem}")
+    return index
+
+
+def main(argv):
+    assets_folder = argv[1] if len(argv) > 1 else "assets"
+    try:
+        manifest = load_manifest(assets_folder)
+    except ManifestError as e:
+        print(f"Manifiesto no válido: {e}")
+        return 1
+    index = index_assets(assets_folder, manifest)
+    for kind in REQUIRED_SETS:
+        print(f"{kind}: {len(index.files[kind])} archivos")
+    print(f"{len(manifest.level_times)} niveles; carga perezosa con más de "
+          f"{manifest.lazy_threshold} sprites")
+    print(f"Señales en la corona {manifest.placement.inner}-{manifest.placement.outer} "
+          f"con densidad {manifest.placement.density}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,272 @@
+"""Colocación de las señales del estímulo sin solapes.
+
+Las señales se reparten en una corona alrededor del vehículo central (radios
+en fracción del lado menor del canvas) con muestreo de disco de Poisson por
+lanzamiento de dardos: cada posición candidata sólo se acepta si queda a la
+distancia mínima de todas las anteriores, y una tabla hash de celdas de ese
+tamaño limita la comprobación a las nueve celdas vecinas. La distancia
+mínima sale de la densidad pedida y del número de señales, así que no hay un
+máximo fijo de posiciones. Cada sector recibe el mismo número de señales
+(±1) y RUTA 66 se coloca con un margen angular que deja su sprite entero
+dentro de su sector. Cada señal se trata como un disco de diámetro igual a
+la separación, y los sprites, que son cuadrados, se escalan al cuadrado
+inscrito en ese disco (sprite_side) para que ni sus esquinas se pisen.
+
+Uso:
+    python placement.py [num_señales] [repeticiones]
+"""
+import math
+import random
+import sys
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+
+MAX_SIGNS = 1000
+# Si una señal no encuentra hueco tras tantos dardos se reduce la separación
+MAX_ATTEMPTS = 30
+SPACING_SHRINK = 0.85
+# Hasta este número de señales se comparan sólo con las de su sector y los
+# contiguos, que sale más barato que la tabla hash de celdas
+SMALL_COUNT = 48
+
+
+def sprite_side(spacing):
+    """Lado máximo de un sprite cuadrado cuyas esquinas no salen del disco de la señal"""
+    return spacing / math.sqrt(2)
+
+
+@lru_cache(maxsize=256)
+def _spacing_for(inner, outer, density, max_spacing, count):
+    spacing = max_spacing
+    # El área útil crece al reducir la separación; converge en pocas vueltas
+    for _ in range(4):
+        low, high = inner + spacing / 2, outer - spacing / 2
+        area = math.pi * (high * high - low * low)
+        spacing = min(max_spacing, math.sqrt(4 * density * area / (math.pi * max(count, 1))))
+    return spacing
+
+
+@dataclass(slots=True)
+class Layout:
+    """Resultado de una colocación.
+
+    slots son tuplas (sector, desvío en grados respecto al centro del sector,
+    radio) y spacing la distancia mínima entre centros, ambas en fracción del
+    lado menor del canvas. Ningún sprite debe pasar de sprite_side(spacing)
+    de lado: con más, las esquinas de dos vecinas podrían solaparse.
+    """
+    spacing: float
+    slots: list
+    route66_index: int
+
+
+@dataclass(slots=True)
+class SignPlacer:
+    """Parámetros de la colocación: corona, densidad y reparto por sectores.
+
+    inner y outer limitan la corona que pueden ocupar los sprites enteros;
+    density es la fracción de su área que cubren los discos de las señales.
+    """
+    num_sectors: int = 8
+    inner: float = 0.18
+    outer: float = 0.5
+    density: float = 0.35
+    max_spacing: float = 0.16
+    balance: bool = True
+
+    def check(self):
+        """Lista de problemas de la configuración (vacía si es válida)"""
+        problems = []
+        if not 0 <= self.inner < self.outer <= 0.5:
+            problems.append("hace falta 0 <= inner < outer <= 0.5")
+        if not 0 < self.density <= 0.5:
+            problems.append("density debe estar entre 0 y 0.5")
+        if not 0 < self.max_spacing <= (self.outer - self.inner) / 2:
+            problems.append("max_spacing debe ser positivo y caber en la corona")
+        elif self.route66_band(self.max_spacing)[0] > self.route66_band(self.max_spacing)[1]:
+            problems.append("la corona es demasiado estrecha para centrar RUTA 66 en su sector")
+        return problems
+
+    def band(self, spacing):
+        """Radios posibles para el centro de una señal con esa separación"""
+        return self.inner + spacing / 2, self.outer - spacing / 2
+
+    def route66_band(self, spacing):
+        """Radios para RUTA 66: más cerca del centro su sprite no cabría en el sector"""
+        low, high = self.band(spacing)
+        half_sector = math.pi / self.num_sectors
+        return max(low, spacing / 2 / math.sin(half_sector)), high
+
+    def spacing_for(self, count):
+        """Separación con la que count discos cubren density del área disponible"""
+        return _spacing_for(self.inner, self.outer, self.density, self.max_spacing, count)
+
+    def quotas(self, rng, count):
+        """Señales por sector: iguales (±1) o al azar si no se equilibra"""
+        sectors = self.num_sectors
+        if not self.balance:
+            quotas = [0] * sectors
+            for _ in range(count):
+                quotas[rng.randrange(sectors)] += 1
+            return quotas
+        base, extra = divmod(count, sectors)
+        quotas = [base] * sectors
+        for sector in rng.sample(range(sectors), extra):
+            quotas[sector] += 1
+        return quotas
+
+    def place(self, rng, count):
+        """Coloca count señales (una es RUTA 66) con el generador rng"""
+        count = max(1, min(count, MAX_SIGNS))
+        quotas = self.quotas(rng, count)
+        route66_sector = rng.choice([sector for sector, quota in enumerate(quotas) if quota])
+        route66_index = rng.randrange(count)
+        spacing = self.spacing_for(count)
+        if count <= SMALL_COUNT and self.sectors_apart(spacing):
+            spacing, slots = self._throw_darts_by_sector(rng, spacing, quotas, route66_sector)
+        else:
+            spacing, slots = self._throw_darts(rng, spacing, quotas, route66_sector)
+        # RUTA 66 se coloca la primera; se lleva a su posición en la lista
+        slots.insert(route66_index, slots.pop(0))
+        return Layout(spacing, slots, route66_index)
+
+    def sectors_apart(self, spacing):
+        """True si dos señales con un sector entero entre medias nunca se pisan"""
+        return 2 * self.band(spacing)[0] * math.sin(math.pi / self.num_sectors) >= spacing
+
+    def _throw_darts_by_sector(self, rng, spacing, quotas, route66_sector):
+        """Como _throw_darts, pero cada dardo se compara con las señales de su
+        sector y de los dos contiguos (válido si sectors_apart). Consume el
+        generador igual y da las mismas posiciones."""
+        sectors = self.num_sectors
+        sector_angle = 2 * math.pi / sectors
+        half_sector = sector_angle / 2
+        random_, sqrt, cos, sin = rng.random, math.sqrt, math.cos, math.sin
+        to_degrees = 180 / math.pi
+        by_sector = [[] for _ in range(sectors)]
+        nearby = [(by_sector[sector - 1], by_sector[sector], by_sector[(sector + 1) % sectors])
+                  for sector in range(sectors)]
+        slots = []
+        min_sq = spacing * spacing
+
+        def throw(sector, low, high, max_offset):
+            low_sq = low * low
+            span_sq = high * high - low_sq
+            base = sector * sector_angle
+            lists = nearby[sector]
+            for _ in range(MAX_ATTEMPTS):
+                radius = sqrt(low_sq + random_() * span_sq)
+                offset = (2 * random_() - 1) * max_offset
+                x = radius * cos(base + offset)
+                y = radius * sin(base + offset)
+                for points in lists:
+                    for px, py in points:
+                        dx = px - x
+                        dy = py - y
+                        if dx * dx + dy * dy < min_sq:
+                            break
+                    else:
+                        continue
+                    break
+                else:
+                    by_sector[sector].append((x, y))
+                    slots.append((sector, offset * to_degrees, radius))
+                    return True
+            return False
+
+        low, high = self.route66_band(spacing)
+        margin = math.asin(min(1.0, spacing / 2 / low))
+        throw(route66_sector, low, high, half_sector - margin)
+        low, high = self.band(spacing)
+        for sector, quota in enumerate(quotas):
+            for _ in range(quota - (sector == route66_sector)):
+                while not throw(sector, low, high, half_sector):
+                    spacing *= SPACING_SHRINK
+                    min_sq = spacing * spacing
+        return spacing, slots
+
+    def _throw_darts(self, rng, spacing, quotas, route66_sector):
+        """Lanzamiento de dardos sector a sector; devuelve (separación final, posiciones).
+
+        Si una señal no encuentra hueco, la separación se reduce para ella y
+        las siguientes. Las celdas de la tabla conservan el tamaño inicial,
+        que sigue cubriendo a todas las vecinas a la nueva distancia.
+        """
+        sector_angle = 2 * math.pi / self.num_sectors
+        half_sector = sector_angle / 2
+        random_, sqrt, cos, sin = rng.random, math.sqrt, math.cos, math.sin
+        cell = spacing
+        # Clave entera por celda: fila * stride + columna, sin crear tuplas
+        stride = 2 * int(self.outer / cell) + 8
+        origin = (stride // 2) * (stride + 1)
+        neighbours = tuple(row * stride + col for row in (-1, 0, 1) for col in (-1, 0, 1))
+        grid = {}
+        get = grid.get
+        slots = []
+        min_sq = spacing * spacing
+
+        def throw(sector, low, high, max_offset):
+            low_sq = low * low
+            span_sq = high * high - low_sq
+            base = sector * sector_angle
+            for _ in range(MAX_ATTEMPTS):
+                # Radio uniforme en área y ángulo uniforme dentro del margen
+                radius = sqrt(low_sq + random_() * span_sq)
+                offset = (2 * random_() - 1) * max_offset
+                x = radius * cos(base + offset)
+                y = radius * sin(base + offset)
+                key = origin + int(y // cell) * stride + int(x // cell)
+                for step in neighbours:
+                    points = get(key + step)
+                    if points:
+                        for px, py in points:
+                            dx = px - x
+                            dy = py - y
+                            if dx * dx + dy * dy < min_sq:
+                                break
+                        else:
+                            continue
+                        break
+                else:
+                    points = get(key)
+                    if points is None:
+                        grid[key] = [(x, y)]
+                    else:
+                        points.append((x, y))
+                    slots.append((sector, math.degrees(offset), radius))
+                    return True
+            return False
+
+        # RUTA 66 va primero, con la tabla vacía: su sprite entero dentro del
+        # sector, lejos de las fronteras
+        low, high = self.route66_band(spacing)
+        margin = math.asin(min(1.0, spacing / 2 / low))
+        throw(route66_sector, low, high, half_sector - margin)
+        low, high = self.band(spacing)
+        for sector, quota in enumerate(quotas):
+            for _ in range(quota - (sector == route66_sector)):
+                while not throw(sector, low, high, half_sector):
+                    spacing *= SPACING_SHRINK
+                    min_sq = spacing * spacing
+        return spacing, slots
+
+
+def main(argv):
+    count = int(argv[1]) if len(argv) > 1 else 500
+    repeats = int(argv[2]) if len(argv) > 2 else 200
+    placer = SignPlacer()
+    rng = random.Random(1)
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        layout = placer.place(rng, count)
+        times.append((time.perf_counter() - start) * 1000)
+    times.sort()
+    print(f"{count} señales, separación {layout.spacing:.4f}: mediana {times[len(times) // 2]:.2f} ms, "
+          f"p99 {times[int(len(times) * 0.99)]:.2f} ms, máximo {times[-1]:.2f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,573 @@
+"""Grabación binaria de sesiones y reproducción.
+
+SessionRecorder guarda en logs/session-<sesión>.ddr las semillas de los dos
+motores, la distribución de cada ensayo y los eventos de fase y de respuesta
+con su instante. Cada evento ocupa unos pocos bytes: tipo (u8), microsegundos
+desde el evento anterior (u32) y su carga. El hilo de Tk sólo añade bytes a un
+búfer; un hilo propio los escribe al terminar cada ensayo.
+
+La reproducción rápida pasa los eventos por TrialEngine/AdaptiveEngine sin
+interfaz y comprueba que cada ensayo y cada resultado coinciden con los
+grabados, además de medir el error de exposición. La reproducción en tiempo
+real conduce un DoubleDecisionGame con las mismas entradas.
+
+Uso:
+    python replay.py check [--jobs N] logs/session-*.ddr
+    python replay.py play logs/session-<sesión>.ddr
+"""
+import glob
+import math
+import os
+import queue
+import struct
+import sys
+import threading
+import time
+
+from engine import LEVEL_TIMES, SignSpec, TrialEngine, TrialSpec, num_total_signs
+from placement import SignPlacer
+from staircase import AdaptiveEngine
+from telemetry import perf_ms
+
+MAGIC = b"DDR1"
+# v2: posiciones libres (radio) y separación de placement.py; v1 era la rejilla fija
+# v3: vehículo objetivo y sprite de la señal en 32 bits (claves hasta 65535
+# además de los valores especiales negativos)
+FORMAT_VERSION = 3
+HEADER = struct.Struct("<4sHQQd")  # magia, versión, semillas escalera/adaptativa, inicio
+EVENT = struct.Struct("<BI")  # tipo, µs desde el evento anterior
+MAX_DELTA_US = 2**32 - 1
+
+MODES = ("ladder", "adaptive")
+PHASES = ("menu", "preview", "stimulus", "response", "position", "game_over")
+
+# Tipos de evento
+(ASSETS, MODE, RESET, TRIAL, PHASE, VEHICLE, SECTOR, MOTION, TIMEOUT, OUTCOME, SIZE,
+ LEVELS, PLACEMENT) = range(1, 14)
+EVENT_NAMES = {ASSETS: "assets", MODE: "mode", RESET: "reset", TRIAL: "trial", PHASE: "phase",
+               VEHICLE: "vehicle", SECTOR: "sector", MOTION: "motion", TIMEOUT: "timeout",
+               OUTCOME: "outcome", SIZE: "size", LEVELS: "levels", PLACEMENT: "placement"}
+
+_U8 = struct.Struct("<B")
+_U16 = struct.Struct("<H")
+_I16 = struct.Struct("<h")
+_POINT = struct.Struct("<hh")
+_SECTOR = struct.Struct("<bhh")
+# índice, nivel, exposición, objetivo, RUTA 66, nº señales, separación
+_TRIAL = struct.Struct("<IBHiHHf")
+_SIGN = struct.Struct("<BBffi")  # sector, anillo, variación, radio, sprite
+_OUTCOME = struct.Struct("<BIBB")  # acierto, puntuación, nivel, fin de partida
+_LEVEL = struct.Struct("<HHHH")  # ms de vehículo, señal y total, nº señales
+# Corona, densidad y separación máxima en doble precisión: la colocación
+# depende de ellas y la reproducción tiene que repetirla exactamente
+_PLACEMENT = struct.Struct("<BddddB")  # sectores, inner, outer, density, max_spacing, balance
+
+
+def _clamp16(value):
+    return max(-32768, min(32767, int(round(value))))
+
+
+class SessionRecorder:
+    """Graba una sesión de juego en formato binario compacto"""
+
+    def __init__(self, session, ladder_seed, adaptive_seed, folder="logs"):
+        self.path = os.path.join(folder, f"session-{session}.ddr")
+        self.folder = folder
+        self.buffer = bytearray(HEADER.pack(MAGIC, FORMAT_VERSION, ladder_seed, adaptive_seed,
+                                            time.time()))
+        self.last_ns = time.perf_counter_ns()
+        self.queue = queue.SimpleQueue()
+        self.errors = 0
+        self.thread = threading.Thread(target=self._run, name="SessionRecorder", daemon=True)
+        self.thread.start()
+
+    def _event(self, kind, payload=b""):
+        now = time.perf_counter_ns()
+        delta_us = min((now - self.last_ns) // 1000, MAX_DELTA_US)
+        # El reloj avanza en µs enteros para que las diferencias no acumulen error
+        self.last_ns += delta_us * 1000
+        self.buffer += EVENT.pack(kind, delta_us)
+        self.buffer += payload
+
+    def assets(self, vehicle_ids, sign_ids):
+        vehicle_ids, sign_ids = list(vehicle_ids), list(sign_ids)
+        self._event(ASSETS, b"".join((
+            _U16.pack(len(vehicle_ids)), struct.pack(f"<{len(vehicle_ids)}H", *vehicle_ids),
+            _U16.pack(len(sign_ids)), struct.pack(f"<{len(sign_ids)}H", *sign_ids))))
+
+    def levels(self, level_times):
+        """Definición de los niveles (del manifiesto) con la que se juega"""
+        levels = [level_times[level] for level in sorted(level_times)]
+        self._event(LEVELS, _U8.pack(len(levels)) + b"".join(
+            _LEVEL.pack(times["vehicle"], times["signal"], times["total"],
+                        times.get("signs", num_total_signs(level)))
+            for level, times in enumerate(levels)))
+
+    def placement(self, placer):
+        """Parámetros con los que se colocan las señales"""
+        self._event(PLACEMENT, _PLACEMENT.pack(placer.num_sectors, placer.inner, placer.outer,
+                                               placer.density, placer.max_spacing,
+                                               placer.balance))
+
+    def mode(self, mode):
+        self._event(MODE, _U8.pack(MODES.index(mode)))
+
+    def reset(self, mode):
+        self._event(RESET, _U8.pack(MODES.index(mode)))
+
+    def trial(self, trial):
+        target = -1 if trial.target_vehicle is None else trial.target_vehicle
+        options = list(trial.vehicle_options)
+        parts = [_TRIAL.pack(trial.index, trial.level, trial.exposure_ms, target,
+                             trial.route66_index, len(trial.signs),
+                             0.0 if trial.spacing is None else trial.spacing),
+                 _U8.pack(len(options)), struct.pack(f"<{len(options)}H", *options)]
+        parts.extend(_SIGN.pack(sign.sector, sign.ring, sign.jitter, sign.distance_multiplier,
+                                -2 if sign.sign_id is None else sign.sign_id)
+                     for sign in trial.signs)
+        self._event(TRIAL, b"".join(parts))
+
+    def phase(self, name):
+        self._event(PHASE, _U8.pack(PHASES.index(name)))
+
+    def vehicle(self, vehicle):
+        self._event(VEHICLE, _I16.pack(-1 if vehicle is None else vehicle))
+
+    def sector(self, sector, dx, dy):
+        """Clic en un sector; (dx, dy) es la posición respecto al centro"""
+        self._event(SECTOR, _SECTOR.pack(sector, _clamp16(dx), _clamp16(dy)))
+
+    def motion(self, dx, dy):
+        self._event(MOTION, _POINT.pack(_clamp16(dx), _clamp16(dy)))
+
+    def timeout(self):
+        self._event(TIMEOUT)
+
+    def outcome(self, outcome):
+        self._event(OUTCOME, _OUTCOME.pack(outcome.correct, outcome.score, outcome.level,
+                                           outcome.game_over))
+
+    def size(self, width, height):
+        """Tamaño del canvas de sectores, para escalar las posiciones del ratón"""
+        self._event(SIZE, _U16.pack(width) + _U16.pack(height))
+
+    def flush(self):
+        """Pasa lo grabado al hilo escritor; no bloquea"""
+        if self.buffer:
+            self.queue.put(bytes(self.buffer))
+            self.buffer.clear()
+
+    def close(self, timeout=2.0):
+        self.flush()
+        self.queue.put(None)
+        self.thread.join(timeout)
+
+    def _run(self):
+        handle = None
+        while True:
+            chunk = self.queue.get()
+            if chunk is None:
+                if handle:
+                    handle.close()
+                return
+            try:
+                if handle is None:
+                    os.makedirs(self.folder, exist_ok=True)
+                    handle = open(self.path, "wb")
+                handle.write(chunk)
+                handle.flush()
+            except OSError as e:
+                self.errors += 1
+                print(f"Error escribiendo la grabación de la sesión: {e}")
+
+
+def read_session(path):
+    """Lee una grabación; devuelve (cabecera, eventos).
+
+    Cada evento es (tipo, ms desde el inicio, datos). Una grabación cortada
+    (p. ej. por un cierre brusco) se lee hasta el último evento completo.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    magic, version, ladder_seed, adaptive_seed, started = HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version != FORMAT_VERSION:
+        raise ValueError(f"{path}: no es una grabación compatible")
+    header = {"ladder_seed": ladder_seed, "adaptive_seed": adaptive_seed, "started": started}
+    events = []
+    offset = HEADER.size
+    t_us = 0
+    try:
+        while offset < len(data):
+            kind, delta_us = EVENT.unpack_from(data, offset)
+            offset += EVENT.size
+            t_us += delta_us
+            if kind == ASSETS:
+                (count,) = _U16.unpack_from(data, offset)
+                vehicles = struct.unpack_from(f"<{count}H", data, offset + 2)
+                offset += 2 + 2 * count
+                (count,) = _U16.unpack_from(data, offset)
+                signs = struct.unpack_from(f"<{count}H", data, offset + 2)
+                offset += 2 + 2 * count
+                value = (list(vehicles), list(signs))
+            elif kind == LEVELS:
+                count = data[offset]
+                offset += 1
+                value = {}
+                for level in range(count):
+                    vehicle, signal, total, signs = _LEVEL.unpack_from(data, offset)
+                    offset += _LEVEL.size
+                    value[level] = {"vehicle": vehicle, "signal": signal, "total": total,
+                                    "signs": signs}
+            elif kind == PLACEMENT:
+                sectors, inner, outer, density, max_spacing, balance = \
+                    _PLACEMENT.unpack_from(data, offset)
+                offset += _PLACEMENT.size
+                value = SignPlacer(sectors, inner, outer, density, max_spacing, bool(balance))
+            elif kind in (MODE, RESET):
+                value = MODES[data[offset]]
+                offset += 1
+            elif kind == PHASE:
+                value = PHASES[data[offset]]
+                offset += 1
+            elif kind == TRIAL:
+                index, level, exposure, target, route66_index, num_signs, spacing = \
+                    _TRIAL.unpack_from(data, offset)
+                offset += _TRIAL.size
+                num_options = data[offset]
+                options = list(struct.unpack_from(f"<{num_options}H", data, offset + 1))
+                offset += 1 + 2 * num_options
+                signs = []
+                for _ in range(num_signs):
+                    sector, ring, jitter, radius, sign_id = _SIGN.unpack_from(data, offset)
+                    offset += _SIGN.size
+                    signs.append(SignSpec(sector, ring, jitter, None if sign_id == -2 else sign_id,
+                                          radius))
+                value = TrialSpec(index, level, exposure, options,
+                                  None if target == -1 else target, signs, route66_index,
+                                  spacing or None)
+            elif kind == VEHICLE:
+                (vehicle,) = _I16.unpack_from(data, offset)
+                offset += 2
+                value = None if vehicle == -1 else vehicle
+            elif kind == SECTOR:
+                value = _SECTOR.unpack_from(data, offset)
+                offset += _SECTOR.size
+            elif kind in (MOTION, SIZE):
+                value = _POINT.unpack_from(data, offset) if kind == MOTION else \
+                    (_U16.unpack_from(data, offset)[0], _U16.unpack_from(data, offset + 2)[0])
+                offset += 4
+            elif kind == TIMEOUT:
+                value = None
+            elif kind == OUTCOME:
+                correct, score, level, game_over = _OUTCOME.unpack_from(data, offset)
+                offset += _OUTCOME.size
+                value = (bool(correct), score, level, bool(game_over))
+            else:
+                raise ValueError(f"{path}: tipo de evento desconocido {kind}")
+            events.append((kind, t_us / 1000, value))
+    except struct.error:
+        pass
+    return header, events
+
+
+def same_trial(recorded, replayed):
+    """Compara dos ensayos; variación, radio y separación se grabaron como float32"""
+    if (recorded.index, recorded.level, recorded.exposure_ms, list(recorded.vehicle_options),
+            recorded.target_vehicle, recorded.route66_index, len(recorded.signs)) != \
+            (replayed.index, replayed.level, replayed.exposure_ms, list(replayed.vehicle_options),
+             replayed.target_vehicle, replayed.route66_index, len(replayed.signs)):
+        return False
+    if not math.isclose(recorded.spacing or 0, replayed.spacing or 0, abs_tol=1e-6):
+        return False
+    return all((a.sector, a.ring, a.sign_id) == (b.sector, b.ring, b.sign_id)
+               and math.isclose(a.jitter, b.jitter, abs_tol=1e-4)
+               and math.isclose(a.distance_multiplier, b.distance_multiplier, abs_tol=1e-6)
+               for a, b in zip(recorded.signs, replayed.signs))
+
+
+def replay_session(header, events):
+    """Reproduce una grabación en los motores, sin interfaz y sin esperas.
+
+    Devuelve ensayos, discrepancias (ensayos o resultados distintos de los
+    grabados) y el error de exposición medido entre las fases stimulus y
+    response.
+    """
+    def make_engines(level_times, placer):
+        return {
+            "ladder": TrialEngine(range(8), range(7), seed=header["ladder_seed"],
+                                  level_times=level_times, placer=placer),
+            "adaptive": AdaptiveEngine(range(8), range(7), seed=header["adaptive_seed"],
+                                       level_times=level_times, placer=placer),
+        }
+
+    level_times, placer = LEVEL_TIMES, None
+    engines = make_engines(level_times, placer)
+    engine = engines["ladder"]
+    mismatches = []
+    exposure_errors = []
+    trials = 0
+    stimulus_at = None
+    for kind, t_ms, value in events:
+        try:
+            if kind in (LEVELS, PLACEMENT):
+                # Llegan antes que cualquier ensayo: los motores se crean de nuevo
+                if kind == LEVELS:
+                    level_times = value
+                else:
+                    placer = value
+                engines = make_engines(level_times, placer)
+                engine = engines["ladder"]
+            elif kind == ASSETS:
+                for each in engines.values():
+                    each.vehicle_ids, each.sign_ids = sorted(value[0]), sorted(value[1])
+            elif kind == MODE:
+                engine = engines[value]
+            elif kind == RESET:
+                engines[value].reset()
+            elif kind == TRIAL:
+                trials += 1
+                replayed = engine.new_trial()
+                if not same_trial(value, replayed):
+                    mismatches.append(f"{t_ms:.0f} ms: el ensayo {value.index} no coincide")
+                    # Se sigue con el grabado para poder comprobar el resto
+                    engine.trial = value
+            elif kind == PHASE:
+                if value == "stimulus":
+                    stimulus_at = t_ms
+                elif value == "response" and stimulus_at is not None:
+                    exposure_errors.append(t_ms - stimulus_at - engine.trial.exposure_ms)
+                    stimulus_at = None
+            elif kind == VEHICLE:
+                engine.submit_vehicle(value)
+            elif kind == SECTOR:
+                engine.submit_sector(value[0])
+            elif kind == TIMEOUT:
+                engine.timeout()
+            elif kind == OUTCOME:
+                expected = (engine.stage != "sector" and engine.score == value[1]
+                            and engine.level == value[2]
+                            and (engine.stage == "over") == value[3])
+                if not expected:
+                    mismatches.append(f"{t_ms:.0f} ms: resultado distinto en el ensayo "
+                                      f"{engine.trial.index}")
+        except RuntimeError as e:
+            mismatches.append(f"{t_ms:.0f} ms: {e}")
+    return {
+        "trials": trials,
+        "events": len(events),
+        "mismatches": mismatches,
+        "exposure_errors_ms": exposure_errors,
+    }
+
+
+def _check_one(path):
+    try:
+        return path, replay_session(*read_session(path)), None
+    except (OSError, ValueError) as e:
+        return path, None, str(e)
+
+
+def check(paths, jobs=None):
+    """Reproduce muchas grabaciones deprisa, en varios procesos; devuelve el código de salida"""
+    start = time.perf_counter()
+    sessions = trials = events = 0
+    errors = []
+    failed = 0
+    jobs = jobs or os.cpu_count() or 1
+    if jobs > 1 and len(paths) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(jobs) as pool:
+            results = list(pool.map(_check_one, paths, chunksize=16))
+    else:
+        results = map(_check_one, paths)
+    for path, result, error in results:
+        if error is not None:
+            print(error)
+            failed += 1
+            continue
+        sessions += 1
+        trials += result["trials"]
+        events += result["events"]
+        errors.extend(result["exposure_errors_ms"])
+        if result["mismatches"]:
+            failed += 1
+            print(f"{path}:")
+            for mismatch in result["mismatches"]:
+                print(f"  {mismatch}")
+    elapsed = time.perf_counter() - start
+    print(f"{sessions} sesiones, {trials} ensayos, {events} eventos en {elapsed:.2f} s; "
+          f"{failed} con discrepancias")
+    if errors:
+        errors.sort()
+        print(f"error de exposición: mediana {errors[len(errors) // 2]:.2f} ms, "
+              f"máximo {max(errors, key=abs):.2f} ms")
+    return 1 if failed else 0
+
+
+class LiveReplay:
+    """Conduce un DoubleDecisionGame con las entradas de una grabación.
+
+    Cada entrada se programa con el mismo retraso respecto a la última fase
+    grabada que en la sesión original; si el juego aún no ha llegado a esa
+    fase, se espera a que llegue.
+    """
+
+    POLL_MS = 5
+    PHASE_TIMEOUT_MS = 10000
+
+    def __init__(self, root, game, events, on_done):
+        self.root = root
+        self.game = game
+        self.events = events
+        self.on_done = on_done
+        self.position = 0
+        self.anchor = (0.0, perf_ms())
+        self.waiting_since = None
+        self.recorded_size = None
+        self.problems = []
+
+    def reached(self, phase):
+        game = self.game
+        if phase == "response":
+            return game.game_state == "stage" and not game.stimulus_scheduler.active
+        return game.game_state == phase
+
+    def due(self, t_ms):
+        anchor_t, anchor_perf = self.anchor
+        return perf_ms() >= anchor_perf + (t_ms - anchor_t)
+
+    def start(self):
+        self.root.after(self.POLL_MS, self.step)
+
+    def step(self):
+        game = self.game
+        while self.position < len(self.events):
+            kind, t_ms, value = self.events[self.position]
+            if kind == PHASE and value == "stimulus":
+                # El estímulo lo pide el participante desde la vista previa
+                if not self.due(t_ms) or not self.reached("preview"):
+                    break
+                game.show_stimulus()
+            elif kind == PHASE and value == "menu" and game.game_state == "game_over":
+                if not self.due(t_ms):
+                    break
+                game.restart_game()
+            elif kind == PHASE and value == "preview" and game.game_state in ("menu", "game_over"):
+                # Partida empezada sin pasar por los botones del menú
+                if not self.due(t_ms):
+                    break
+                game.start_game()
+                continue
+            elif kind == PHASE:
+                if not self.reached(value):
+                    self.waiting_since = self.waiting_since or perf_ms()
+                    if perf_ms() - self.waiting_since > self.PHASE_TIMEOUT_MS:
+                        self.problems.append(f"{t_ms:.0f} ms: el juego no llegó a '{value}'")
+                        self.waiting_since = None
+                        self.position += 1
+                        continue
+                    break
+                self.waiting_since = None
+                self.anchor = (t_ms, perf_ms())
+            elif kind in (MODE, VEHICLE, SECTOR, MOTION):
+                if not self.due(t_ms):
+                    break
+                self.apply_input(kind, value)
+            elif kind == SIZE:
+                self.recorded_size = value
+            self.position += 1
+        if self.position < len(self.events):
+            self.root.after(self.POLL_MS, self.step)
+        else:
+            self.on_done(self)
+
+    def point(self, dx, dy):
+        """Traslada una posición grabada respecto al centro al canvas actual"""
+        game = self.game
+        scale = 1.0
+        if self.recorded_size:
+            scale = (min(game.current_canvas_width, game.current_canvas_height)
+                     / max(1, min(self.recorded_size)))
+        return game.current_center_x + dx * scale, game.current_center_y + dy * scale
+
+    def apply_input(self, kind, value):
+        import tkinter as tk
+        game = self.game
+        if kind == MODE:
+            game.start_mode(adaptive=value == "adaptive")
+        elif kind == VEHICLE:
+            game.check_vehicle(value)
+        elif kind == MOTION and game.game_state == "position":
+            x, y = self.point(*value)
+            event = tk.Event()
+            event.x, event.y, event.time = int(x), int(y), 0
+            game.on_mouse_move(event)
+        elif kind == SECTOR and game.game_state == "position":
+            x, y = self.point(value[1], value[2])
+            event = tk.Event()
+            event.x, event.y, event.time = int(x), int(y), 0
+            game.on_sector_click(event)
+
+
+class _SilentDialogs:
+    """Sustituye a messagebox durante la reproducción: los diálogos no esperan a nadie"""
+
+    @staticmethod
+    def showinfo(title, message):
+        print(f"[{title}] {message.splitlines()[0]}")
+
+    showerror = showinfo
+
+
+def play(path):
+    """Reproduce una grabación en tiempo real en la ventana del juego"""
+    import tempfile
+    import tkinter as tk
+    import DoubleDecision
+    from store import ScoreStore
+    from telemetry import TrialLog
+
+    header, events = read_session(path)
+    # Lo que se registre durante la reproducción no se mezcla con los datos reales
+    folder = tempfile.mkdtemp(prefix="ddreplay-")
+    DoubleDecision.messagebox = _SilentDialogs
+    root = tk.Tk()
+    game = DoubleDecision.DoubleDecisionGame(
+        root, store=ScoreStore(os.path.join(folder, "replay.db")),
+        trial_log=TrialLog(folder), recorder_folder=folder,
+        seeds=(header["ladder_seed"], header["adaptive_seed"]))
+    recorded_levels = next((value for kind, _, value in events if kind == LEVELS), None)
+    if recorded_levels is not None and recorded_levels != game.ladder_engine.level_times:
+        print("Aviso: los niveles del manifiesto actual no son los de la grabación")
+
+    def done(replay):
+        for problem in replay.problems:
+            print(problem)
+        root.after(1000, root.destroy)
+
+    LiveReplay(root, game, events, done).start()
+    root.mainloop()
+    game.close()
+    print(f"Nueva grabación: {game.recorder.path}")
+    return 0
+
+
+def main(argv):
+    if len(argv) < 3 or argv[1] not in ("check", "play"):
+        print(__doc__)
+        return 2
+    if argv[1] == "play":
+        return play(argv[2])
+    args = argv[2:]
+    jobs = None
+    if args[:1] == ["--jobs"] and len(args) > 2:
+        jobs = int(args[1])
+        args = args[2:]
+    paths = []
+    for pattern in args:
+        paths.extend(sorted(glob.glob(pattern)) or [pattern])
+    return check(paths, jobs)
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
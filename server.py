@@ -0,0 +1,374 @@
+"""Servidor local de ensayos para muchos participantes a la vez.
+
+Cada conexión TCP es una sesión con su propio TrialEngine; el servidor
+reparte los ensayos (vehículos, señales, sector de RUTA 66 y tiempo de
+exposición) y puntúa las respuestas. El ensayo lleva todo lo que un cliente
+ligero necesita para dibujarlo y para mostrar la solución (vehículo central
+y posición de RUTA 66), así que la puntuación es del servidor pero un
+cliente modificado podría hacer trampa. Sólo se admite un ensayo pendiente
+por sesión. Todos los resultados van al mismo almacén SQLite. El protocolo
+es un objeto JSON por línea en cada sentido:
+
+    {"op": "hello", "participant": "ana", "seed": 123}   (seed es opcional)
+    {"op": "trial"}
+    {"op": "vehicle", "vehicle": 3, "rt_ms": 512.4}
+    {"op": "sector", "sector": 5, "rt_ms": 730.0}
+    {"op": "timeout"}
+    {"op": "reset"}
+    {"op": "bye"}
+
+Cada respuesta lleva "ok"; si es false, "error" explica el motivo.
+
+Uso:
+    python server.py serve [--host 127.0.0.1] [--port 6666] [--db data/ruta66.db]
+    python server.py loadtest [--clients 300] [--trials 20] [--port 6666] [--spawn]
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+import uuid
+
+from engine import NUM_SECTORS, TrialEngine
+from manifest import (ManifestError, default_manifest_data, index_assets, load_manifest,
+                      parse_manifest)
+from store import DEFAULT_PATH, ScoreStore
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 6666
+DEFAULT_ASSETS = "assets"
+# Una línea de cliente nunca debería acercarse a esto
+MAX_LINE = 64 * 1024
+
+
+def trial_to_dict(trial):
+    """Ensayo en formato JSON para el cliente"""
+    return {
+        "index": trial.index,
+        "level": trial.level,
+        "exposure_ms": trial.exposure_ms,
+        "vehicle_options": list(trial.vehicle_options),
+        "target_vehicle": trial.target_vehicle,
+        "route66_index": trial.route66_index,
+        "route66_sector": trial.route66_sector,
+        "signs": [[sign.sector, sign.ring, round(sign.jitter, 3), sign.sign_id,
+                   round(sign.distance_multiplier, 4)]
+                  for sign in trial.signs],
+        "spacing": trial.spacing,
+    }
+
+
+def outcome_to_dict(outcome):
+    return {
+        "stage": outcome.stage,
+        "correct": outcome.correct,
+        "timed_out": outcome.timed_out,
+        "points": outcome.points,
+        "score": outcome.score,
+        "level": outcome.level,
+        "level_up": outcome.level_up,
+        "game_over": outcome.game_over,
+    }
+
+
+class ClientSession:
+    """Estado de un participante conectado"""
+
+    def __init__(self, server, participant, seed=None):
+        self.server = server
+        self.id = uuid.uuid4().hex[:12]
+        self.participant = participant
+        self.engine = server.make_engine(seed)
+        self.record = None
+        self.game_trials = 0
+
+    def new_trial(self):
+        if self.engine.stage in ("vehicle", "sector"):
+            raise RuntimeError("el ensayo actual aún no tiene respuesta")
+        trial = self.engine.new_trial()
+        self.record = {
+            "session": self.id,
+            "seed": self.engine.seed,
+            "trial": trial.index,
+            "level": trial.level,
+            "exposure_ms": trial.exposure_ms,
+            "route66_sector": trial.route66_sector,
+            "chosen_vehicle": None,
+            "vehicle_rt_ms": None,
+            "chosen_sector": None,
+            "sector_rt_ms": None,
+        }
+        return trial_to_dict(trial)
+
+    def respond(self, stage, value, rt_ms):
+        if stage == "vehicle":
+            outcome = self.engine.submit_vehicle(value)
+            self.record.update(chosen_vehicle=value, vehicle_rt_ms=rt_ms)
+        elif stage == "sector":
+            outcome = self.engine.submit_sector(value)
+            self.record.update(chosen_sector=value, sector_rt_ms=rt_ms)
+        else:
+            outcome = self.engine.timeout()
+        if outcome.game_over or outcome.stage == "sector":
+            self.finish(outcome)
+        return outcome_to_dict(outcome)
+
+    def finish(self, outcome):
+        """Cierra el registro del ensayo y, si acabó la partida, la guarda"""
+        record = self.record
+        record.update(
+            correct=outcome.correct,
+            failed_stage=None if outcome.correct else outcome.stage,
+            timed_out=outcome.timed_out,
+            score=outcome.score,
+            level_after=outcome.level,
+            wall_time=round(time.time(), 3),
+        )
+        store = self.server.store
+        self.game_trials += 1
+        if store is not None:
+            store.add_trial(self.participant, record)
+            if outcome.game_over:
+                store.add_game(self.id, self.participant, outcome.score, outcome.level,
+                               self.game_trials)
+        if outcome.game_over:
+            self.game_trials = 0
+        self.record = None
+
+
+def game_config(assets_folder=DEFAULT_ASSETS):
+    """Vehículos, señales, niveles y colocación que usaría el juego con esos assets"""
+    try:
+        manifest = load_manifest(assets_folder)
+    except ManifestError as e:
+        print(f"Manifiesto no válido, se usan los valores por defecto: {e}")
+        manifest = parse_manifest(default_manifest_data())
+    index = index_assets(assets_folder, manifest)
+    return {
+        "vehicle_ids": index.keys("vehicle"),
+        "sign_ids": index.keys("sign"),
+        "level_times": manifest.level_times,
+        "placer": manifest.placement,
+    }
+
+
+class TrialServer:
+    """Servidor asyncio; todas las sesiones comparten hilo y almacén.
+
+    Los ensayos salen del manifiesto y los assets de assets_folder, igual que
+    en el juego, para que los clientes tengan todos los sprites que se piden.
+    """
+
+    def __init__(self, store=None, assets_folder=DEFAULT_ASSETS):
+        self.store = store
+        self.config = game_config(assets_folder)
+        self.sessions = {}
+        self.requests = 0
+
+    def make_engine(self, seed=None):
+        config = self.config
+        return TrialEngine(config["vehicle_ids"], config["sign_ids"], seed=seed,
+                           level_times=config["level_times"], placer=config["placer"])
+
+    async def handle(self, reader, writer):
+        session = None
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except (asyncio.LimitOverrunError, ValueError):
+                    await self._send(writer, {"ok": False, "error": "línea demasiado larga"})
+                    break
+                if not line:
+                    break
+                self.requests += 1
+                try:
+                    message = json.loads(line)
+                    reply, session = self.dispatch(session, message)
+                except (ValueError, TypeError, KeyError, RuntimeError) as e:
+                    reply = {"ok": False, "error": str(e)}
+                await self._send(writer, reply)
+                if reply.get("bye"):
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            if session is not None:
+                if self.store is not None:
+                    self.store.end_session(session.id)
+                self.sessions.pop(session.id, None)
+            writer.close()
+
+    async def _send(self, writer, reply):
+        writer.write(json.dumps(reply, separators=(",", ":")).encode() + b"\n")
+        await writer.drain()
+
+    def dispatch(self, session, message):
+        """Atiende un mensaje; devuelve (respuesta, sesión)"""
+        op = message["op"]
+        if op == "hello":
+            if session is not None:
+                raise RuntimeError("la sesión ya está abierta")
+            session = ClientSession(self, str(message.get("participant") or "Invitado"),
+                                    message.get("seed"))
+            self.sessions[session.id] = session
+            if self.store is not None:
+                self.store.start_session(session.id, session.engine.seed)
+            return {"ok": True, "session": session.id, "seed": session.engine.seed,
+                    "level": session.engine.level, "score": session.engine.score}, session
+        if session is None:
+            raise RuntimeError("primero hay que enviar 'hello'")
+        if op == "trial":
+            return {"ok": True, "trial": session.new_trial()}, session
+        if op in ("vehicle", "sector"):
+            value = message[op]
+            if not isinstance(value, int):
+                raise TypeError(f"'{op}' debe ser un entero")
+            return {"ok": True, **session.respond(op, value, message.get("rt_ms"))}, session
+        if op == "timeout":
+            return {"ok": True, **session.respond("timeout", None, None)}, session
+        if op == "reset":
+            session.engine.reset()
+            session.game_trials = 0
+            return {"ok": True, "level": 0, "score": 0}, session
+        if op == "bye":
+            return {"ok": True, "bye": True}, session
+        raise ValueError(f"operación desconocida '{op}'")
+
+    async def serve(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        return await asyncio.start_server(self.handle, host, port, limit=MAX_LINE)
+
+
+# --- cliente de carga ---
+
+async def _request(reader, writer, message, latencies):
+    start = time.perf_counter()
+    writer.write(json.dumps(message, separators=(",", ":")).encode() + b"\n")
+    await writer.drain()
+    reply = json.loads(await reader.readline())
+    latencies.append((time.perf_counter() - start) * 1000)
+    if not reply["ok"]:
+        raise RuntimeError(reply["error"])
+    return reply
+
+
+async def load_client(host, port, number, trials, accuracy, latencies, mismatches):
+    """Un participante simulado que juega trials ensayos seguidos.
+
+    Comprueba que la puntuación del servidor coincide con el ensayo recibido.
+    """
+    reader, writer = await asyncio.open_connection(host, port, limit=MAX_LINE)
+    rng = random.Random(number)
+    try:
+        await _request(reader, writer, {"op": "hello", "participant": f"carga{number}",
+                                        "seed": number}, latencies)
+        for _ in range(trials):
+            trial = (await _request(reader, writer, {"op": "trial"}, latencies))["trial"]
+            vehicle = trial["target_vehicle"]
+            if rng.random() >= accuracy:
+                vehicle = next((v for v in trial["vehicle_options"] if v != vehicle), vehicle)
+            outcome = await _request(reader, writer, {"op": "vehicle", "vehicle": vehicle,
+                                                      "rt_ms": rng.uniform(300, 900)}, latencies)
+            if outcome["correct"] != (vehicle == trial["target_vehicle"]):
+                mismatches.append((number, trial["index"], "vehicle"))
+            if not outcome["game_over"]:
+                sector = trial["route66_sector"]
+                if rng.random() >= accuracy:
+                    sector = (sector + rng.randrange(1, NUM_SECTORS)) % NUM_SECTORS
+                outcome = await _request(reader, writer, {"op": "sector", "sector": sector,
+                                                          "rt_ms": rng.uniform(300, 900)},
+                                         latencies)
+                if outcome["correct"] != (sector == trial["route66_sector"]):
+                    mismatches.append((number, trial["index"], "sector"))
+            if outcome["game_over"]:
+                await _request(reader, writer, {"op": "reset"}, latencies)
+        await _request(reader, writer, {"op": "bye"}, latencies)
+    finally:
+        writer.close()
+
+
+async def load_test(host, port, clients, trials, accuracy=0.85, spawn_db=None, spawn=False,
+                    assets_folder=DEFAULT_ASSETS):
+    """Lanza clients participantes a la vez y devuelve las estadísticas.
+
+    Con spawn el servidor usa los assets de assets_folder.
+    """
+    server = None
+    store = None
+    if spawn:
+        store = ScoreStore(spawn_db) if spawn_db else None
+        server = await TrialServer(store, assets_folder).serve(host, port)
+    latencies = []
+    mismatches = []
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(*(load_client(host, port, n, trials, accuracy, latencies,
+                                           mismatches)
+                               for n in range(clients)))
+    finally:
+        elapsed = time.perf_counter() - start
+        if server is not None:
+            server.close()
+            await server.wait_closed()
+        if store is not None:
+            store.close()
+    latencies.sort()
+    return {
+        "clients": clients,
+        "requests": len(latencies),
+        "seconds": round(elapsed, 3),
+        "requests_per_s": round(len(latencies) / elapsed),
+        "p50_ms": round(latencies[len(latencies) // 2], 3),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99)], 3),
+        "max_ms": round(latencies[-1], 3),
+        "scoring_mismatches": len(mismatches),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servidor local de ensayos")
+    sub = parser.add_subparsers(dest="command", required=True)
+    serve = sub.add_parser("serve")
+    serve.add_argument("--host", default=DEFAULT_HOST)
+    serve.add_argument("--port", type=int, default=DEFAULT_PORT)
+    serve.add_argument("--db", default=DEFAULT_PATH)
+    serve.add_argument("--assets", default=DEFAULT_ASSETS)
+    load = sub.add_parser("loadtest")
+    load.add_argument("--host", default=DEFAULT_HOST)
+    load.add_argument("--port", type=int, default=DEFAULT_PORT)
+    load.add_argument("--clients", type=int, default=300)
+    load.add_argument("--trials", type=int, default=20)
+    load.add_argument("--spawn", action="store_true",
+                      help="arranca el servidor en el mismo proceso y bucle")
+    load.add_argument("--db", default=None, help="almacén del servidor con --spawn")
+    load.add_argument("--assets", default=DEFAULT_ASSETS, help="assets del servidor con --spawn")
+    args = parser.parse_args(argv)
+
+    if args.command == "loadtest":
+        result = asyncio.run(load_test(args.host, args.port, args.clients, args.trials,
+                                       spawn_db=args.db, spawn=args.spawn,
+                                       assets_folder=args.assets))
+        print(result)
+        return 0
+
+    store = ScoreStore(args.db)
+
+    async def run():
+        server = await TrialServer(store, args.assets).serve(args.host, args.port)
+        print(f"Sirviendo ensayos en {args.host}:{args.port}")
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        store.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
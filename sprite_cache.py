@@ -0,0 +1,230 @@
+"""Caché en disco de sprites ya redimensionados.
+
+Guarda junto a los assets los píxeles RGBA de cada imagen ya escalada al
+tamaño que usa el juego, indexados por ruta y tamaño y validados con el
+mtime/tamaño del PNG original y un hash de su contenido. Al arrancar sólo se
+decodifican de nuevo los assets que cambiaron.
+
+Uso:
+    python sprite_cache.py rebuild [carpeta_assets]
+    python sprite_cache.py verify [carpeta_assets]
+"""
+import hashlib
+import json
+import os
+import shutil
+import sys
+import threading
+
+from PIL import Image
+
+from manifest import DEFAULT_SPRITE_SIZES
+
+CACHE_DIRNAME = ".sprite_cache"
+INDEX_NAME = "index.json"
+FORMAT_VERSION = 1
+
+# Tamaños a los que el juego escala cada tipo de sprite si el manifiesto no dice otra cosa
+SPRITE_SIZES = DEFAULT_SPRITE_SIZES
+
+
+def file_digest(path):
+    """Hash SHA-1 del contenido de un archivo"""
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def iter_sprite_assets(assets_folder):
+    """Recorre los PNG que el juego carga como sprites junto a su tamaño"""
+    from asset_loader import scan_assets
+    for job in scan_assets(assets_folder):
+        if job.size is not None:
+            yield job.path, job.size
+
+
+class SpriteCache:
+    """Índice de sprites escalados guardado en assets/.sprite_cache (o en folder).
+
+    load() se puede llamar desde varios hilos a la vez; el índice se protege
+    con un cerrojo y la decodificación queda fuera de él.
+    """
+
+    def __init__(self, assets_folder, folder=None):
+        self.assets_folder = assets_folder
+        self.folder = folder or os.path.join(assets_folder, CACHE_DIRNAME)
+        self.index_path = os.path.join(self.folder, INDEX_NAME)
+        self.entries = {}
+        self.dirty = False
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self._read_index()
+
+    def _read_index(self):
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("version") == FORMAT_VERSION:
+            self.entries = data.get("entries", {})
+
+    def _key(self, path, size):
+        rel = os.path.relpath(path, self.assets_folder).replace(os.sep, "/")
+        return f"{rel}@{size[0]}x{size[1]}"
+
+    def _read_blob(self, entry, size):
+        try:
+            with open(os.path.join(self.folder, entry["blob"]), "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        if len(data) != size[0] * size[1] * 4:
+            return None
+        return Image.frombuffer("RGBA", size, data, "raw", "RGBA", 0, 1)
+
+    def load(self, path, size):
+        """Devuelve el sprite RGBA escalado, desde la caché si sigue vigente"""
+        key = self._key(path, size)
+        st = os.stat(path)
+        entry = self.entries.get(key)
+
+        if entry and entry["mtime_ns"] == st.st_mtime_ns and entry["size"] == st.st_size:
+            img = self._read_blob(entry, size)
+            if img is not None:
+                with self.lock:
+                    self.hits += 1
+                return img
+
+        # El mtime cambió (p. ej. tras copiar los assets): se compara el contenido
+        digest = file_digest(path)
+        if entry and entry["sha1"] == digest:
+            img = self._read_blob(entry, size)
+            if img is not None:
+                with self.lock:
+                    entry["mtime_ns"] = st.st_mtime_ns
+                    entry["size"] = st.st_size
+                    self.dirty = True
+                    self.hits += 1
+                return img
+
+        img = Image.open(path).convert("RGBA")
+        img = img.resize(size, Image.Resampling.LANCZOS)
+        with self.lock:
+            self.misses += 1
+        self._store(key, entry, digest, st, size, img)
+        return img
+
+    def _store(self, key, old_entry, digest, st, size, img):
+        blob = f"{digest[:16]}_{size[0]}x{size[1]}.rgba"
+        try:
+            os.makedirs(self.folder, exist_ok=True)
+            # Dos hilos pueden escribir a la vez el blob de dos PNG idénticos
+            tmp_path = os.path.join(self.folder, f"{blob}.{threading.get_ident()}.tmp")
+            with open(tmp_path, "wb") as f:
+                f.write(img.tobytes())
+            os.replace(tmp_path, os.path.join(self.folder, blob))
+        except OSError as e:
+            # La caché es opcional: si la carpeta no es escribible se sigue sin ella
+            print(f"No se pudo escribir la caché de sprites: {e}")
+            return
+        with self.lock:
+            self._replace_entry(key, old_entry, digest, st, blob)
+
+    def _replace_entry(self, key, old_entry, digest, st, blob):
+        # Dos PNG idénticos comparten blob; sólo se borra si nadie más lo usa
+        if (old_entry and old_entry["blob"] != blob
+                and not any(e["blob"] == old_entry["blob"]
+                            for k, e in self.entries.items() if k != key)):
+            try:
+                os.remove(os.path.join(self.folder, old_entry["blob"]))
+            except OSError:
+                pass
+        self.entries[key] = {
+            "sha1": digest,
+            "mtime_ns": st.st_mtime_ns,
+            "size": st.st_size,
+            "blob": blob,
+        }
+        self.dirty = True
+
+    def save(self):
+        """Escribe el índice si hubo cambios"""
+        with self.lock:
+            self._save()
+
+    def _save(self):
+        if not self.dirty:
+            return
+        try:
+            os.makedirs(self.folder, exist_ok=True)
+            tmp_path = self.index_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"version": FORMAT_VERSION, "entries": self.entries}, f,
+                          indent=1, sort_keys=True)
+            os.replace(tmp_path, self.index_path)
+            self.dirty = False
+        except OSError as e:
+            print(f"No se pudo guardar el índice de sprites: {e}")
+
+    def verify(self):
+        """Comprueba cada entrada contra su PNG; devuelve la lista de problemas"""
+        problems = []
+        for key, entry in sorted(self.entries.items()):
+            rel, _, dims = key.rpartition("@")
+            size = tuple(int(v) for v in dims.split("x"))
+            path = os.path.join(self.assets_folder, *rel.split("/"))
+            if not os.path.exists(path):
+                problems.append(f"{key}: el PNG original ya no existe")
+                continue
+            if file_digest(path) != entry["sha1"]:
+                problems.append(f"{key}: el PNG original cambió")
+            if self._read_blob(entry, size) is None:
+                problems.append(f"{key}: datos de píxeles ausentes o incompletos")
+        for path, size in iter_sprite_assets(self.assets_folder):
+            key = self._key(path, size)
+            if key not in self.entries:
+                problems.append(f"{key}: sin entrada en la caché")
+        return problems
+
+    def rebuild(self):
+        """Borra la caché y la regenera a partir de los assets actuales"""
+        shutil.rmtree(self.folder, ignore_errors=True)
+        self.entries = {}
+        self.dirty = True
+        count = 0
+        for path, size in iter_sprite_assets(self.assets_folder):
+            try:
+                self.load(path, size)
+                count += 1
+            except Exception as e:
+                print(f"Error procesando {path}: {e}")
+        self.save()
+        return count
+
+
+def main(argv):
+    if len(argv) < 2 or argv[1] not in ("rebuild", "verify"):
+        print(__doc__)
+        return 2
+    assets_folder = argv[2] if len(argv) > 2 else "assets"
+    cache = SpriteCache(assets_folder)
+    if argv[1] == "rebuild":
+        count = cache.rebuild()
+        print(f"Caché regenerada: {count} sprites en {cache.folder}")
+        return 0
+    problems = cache.verify()
+    for problem in problems:
+        print(problem)
+    if problems:
+        print(f"{len(problems)} problemas; ejecuta 'python sprite_cache.py rebuild'")
+        return 1
+    print(f"Caché correcta: {len(cache.entries)} sprites")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
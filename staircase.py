@@ -0,0 +1,201 @@
+"""Evaluación adaptativa del umbral de exposición (estilo QUEST).
+
+En lugar de subir un nivel por acierto y terminar en el primer fallo, se
+mantiene una distribución a posteriori del umbral (log10 de la exposición en
+ms) sobre una rejilla fija. Cada ensayo se presenta en la media a posteriori y
+su resultado actualiza la distribución con una función psicométrica de
+Weibull. El número de señales acompaña a la exposición según la misma
+relación que la escalera de niveles, así que la dificultad es una sola
+dimensión continua.
+
+Uso:
+    python staircase.py [umbral_real_ms] [semilla]
+"""
+import math
+import random
+import sys
+import time
+
+from engine import LEVEL_TIMES, NUM_SECTORS, Outcome, TrialEngine, points_for_level
+
+# Acertar por azar: uno de dos vehículos y uno de ocho sectores
+GUESS_RATE = 1 / 2 * 1 / NUM_SECTORS
+LAPSE_RATE = 0.02
+WEIBULL_BETA = 3.5  # pendiente sobre log10(ms)
+GRID_POINTS = 240
+
+
+def level_for_exposure(exposure_ms, level_times=LEVEL_TIMES):
+    """Nivel (con decimales) equivalente a una exposición en la escalera de niveles"""
+    points = sorted((times["total"], level) for level, times in level_times.items())
+    if exposure_ms <= points[0][0]:
+        return float(points[0][1])
+    if exposure_ms >= points[-1][0]:
+        return float(points[-1][1])
+    for (ms_low, level_low), (ms_high, level_high) in zip(points, points[1:]):
+        if ms_low <= exposure_ms <= ms_high:
+            # Interpola en escala logarítmica, como la propia escalera
+            t = math.log(exposure_ms / ms_low) / math.log(ms_high / ms_low)
+            return level_low + t * (level_high - level_low)
+
+
+class QuestStaircase:
+    """Distribución a posteriori del umbral sobre una rejilla en log10(ms)"""
+
+    def __init__(self, min_ms=50, max_ms=2000, prior_ms=600, prior_sd=0.4,
+                 beta=WEIBULL_BETA, gamma=GUESS_RATE, delta=LAPSE_RATE, grid_points=GRID_POINTS):
+        self.min_ms = min_ms
+        self.max_ms = max_ms
+        self.beta = beta
+        self.gamma = gamma
+        self.delta = delta
+        low, high = math.log10(min_ms), math.log10(max_ms)
+        step = (high - low) / (grid_points - 1)
+        self.grid = [low + i * step for i in range(grid_points)]
+        prior_mean = math.log10(prior_ms)
+        self.log_posterior = [-0.5 * ((t - prior_mean) / prior_sd) ** 2 for t in self.grid]
+        self.trials = 0
+        self._normalise()
+
+    def p_correct(self, log_ms, threshold):
+        """Probabilidad de acertar el ensayo completo con una exposición dada"""
+        return self.gamma + (1 - self.gamma - self.delta) * (
+            1 - math.exp(-10 ** (self.beta * (log_ms - threshold))))
+
+    def _normalise(self):
+        top = max(self.log_posterior)
+        exp = math.exp
+        weights = [exp(v - top) for v in self.log_posterior]
+        total = sum(weights)
+        self.weights = weights = [w / total for w in weights]
+        grid = self.grid
+        self.mean = mean = sum(w * t for w, t in zip(weights, grid))
+        self.sd = math.sqrt(sum(w * (t - mean) ** 2 for w, t in zip(weights, grid)))
+
+    def update(self, exposure_ms, correct):
+        """Incorpora el resultado de un ensayo presentado con exposure_ms"""
+        x = math.log10(exposure_ms)
+        grid = self.grid
+        gamma = self.gamma
+        scale = 1 - self.gamma - self.delta
+        # La rejilla es uniforme: 10**(beta*(x - t)) es una progresión geométrica
+        # a lo largo de ella, así que basta una multiplicación por punto
+        term = 10 ** (self.beta * (x - grid[0]))
+        ratio = 10 ** (-self.beta * (grid[1] - grid[0])) if len(grid) > 1 else 1.0
+        exp, log = math.exp, math.log
+        log_posterior = self.log_posterior
+        for i in range(len(grid)):
+            p = gamma + scale * (1 - exp(-term))
+            log_posterior[i] += log(p if correct else 1 - p)
+            term *= ratio
+        self.trials += 1
+        self._normalise()
+
+    @property
+    def threshold_ms(self):
+        return 10 ** self.mean
+
+    def next_exposure_ms(self):
+        """Exposición del siguiente ensayo: la media a posteriori del umbral"""
+        return int(round(min(self.max_ms, max(self.min_ms, self.threshold_ms))))
+
+
+class AdaptiveEngine(TrialEngine):
+    """TrialEngine que ajusta exposición y señales con un QuestStaircase.
+
+    Un fallo no termina la partida: cierra el ensayo y actualiza el umbral.
+    La evaluación acaba tras max_trials ensayos o cuando la desviación del
+    umbral (en log10 ms) baja de target_sd; ese Outcome trae game_over=True.
+    """
+
+    mode = "adaptive"
+
+    def __init__(self, vehicle_ids, sign_ids, seed=None, level_times=LEVEL_TIMES, placer=None,
+                 max_trials=40, target_sd=0.04):
+        self.max_trials = max_trials
+        self.target_sd = target_sd
+        super().__init__(vehicle_ids, sign_ids, seed=seed, level_times=level_times,
+                         placer=placer)
+
+    def reset(self):
+        super().reset()
+        totals = [times["total"] for times in self.level_times.values()]
+        self.staircase = QuestStaircase(min_ms=min(totals) // 2, max_ms=max(totals) * 2)
+        self.assessment_trials = 0
+
+    def next_trial_spec(self):
+        """El ensayo que presentaría ahora new_trial(), según el umbral estimado"""
+        exposure = self.staircase.next_exposure_ms()
+        level_f = level_for_exposure(exposure, self.level_times)
+        spec = self.build_trial(self.trial_index, int(round(level_f)),
+                                num_signs=int(round(self.num_signs_between(level_f))))
+        spec.exposure_ms = exposure
+        return spec
+
+    def num_signs_between(self, level_f):
+        """Señales para un nivel con decimales, interpolando entre los dos vecinos"""
+        low = int(level_f)
+        high = min(low + 1, self.max_level)
+        fraction = level_f - low
+        return self.num_signs(low) + fraction * (self.num_signs(high) - self.num_signs(low))
+
+    def new_trial(self, spec=None):
+        if spec is None:
+            spec = self.next_trial_spec()
+        self.level = spec.level
+        return super().new_trial(spec)
+
+    def predict_next_trial(self):
+        # La exposición siguiente depende de la respuesta: sólo se conoce tras ella
+        return self.next_trial_spec() if self.stage == "idle" else None
+
+    def is_next_trial(self, spec):
+        return (spec.index == self.trial_index
+                and spec.exposure_ms == self.staircase.next_exposure_ms())
+
+    def _outcome(self, stage, correct, timed_out=False):
+        if correct and stage == "vehicle":
+            self.stage = "sector"
+            return Outcome(stage, True, False, 0, self.score, self.level, False, False)
+        # El ensayo termina aquí: acierto completo o fallo en cualquier fase
+        self.staircase.update(self.trial.exposure_ms, correct)
+        self.assessment_trials += 1
+        points = points_for_level(self.level) if correct else 0
+        self.score += points
+        done = (self.assessment_trials >= self.max_trials
+                or self.staircase.sd < self.target_sd)
+        self.stage = "over" if done else "idle"
+        return Outcome(stage, correct, timed_out, points, self.score, self.level, False, done)
+
+
+def simulate_assessment(true_threshold_ms, seed=None, **kwargs):
+    """Evalúa a un participante simulado con el umbral dado; devuelve la estimación"""
+    engine = AdaptiveEngine(range(8), range(7), seed=seed, **kwargs)
+    responder = random.Random(engine.seed)
+    staircase = engine.staircase
+    true_log = math.log10(true_threshold_ms)
+    update_times = []
+    while True:
+        trial = engine.new_trial()
+        correct = responder.random() < staircase.p_correct(math.log10(trial.exposure_ms), true_log)
+        start = time.perf_counter()
+        if correct:
+            engine.submit_vehicle(trial.target_vehicle)
+            outcome = engine.submit_sector(trial.route66_sector)
+        else:
+            outcome = engine.timeout()
+        update_times.append((time.perf_counter() - start) * 1000)
+        if outcome.game_over:
+            return {
+                "true_ms": true_threshold_ms,
+                "estimate_ms": round(staircase.threshold_ms, 1),
+                "sd_log10": round(staircase.sd, 4),
+                "trials": engine.assessment_trials,
+                "max_update_ms": round(max(update_times), 3),
+            }
+
+
+if __name__ == "__main__":
+    true_ms = float(sys.argv[1]) if len(sys.argv) > 1 else 400
+    seed = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    print(simulate_assessment(true_ms, seed))
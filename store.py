@@ -0,0 +1,283 @@
+"""Almacén local de sesiones, ensayos y mejores marcas en SQLite.
+
+Todas las escrituras pasan por una cola y las aplica un hilo propio en
+transacciones agrupadas, así que el hilo de Tk nunca espera al disco. La base
+usa WAL, de modo que las lecturas del menú (por índices) no bloquean al
+escritor ni al revés.
+
+Uso:
+    python store.py stats [ruta.db]
+"""
+import itertools
+import json
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+
+DEFAULT_PATH = os.path.join("data", "ruta66.db")
+SCHEMA_VERSION = 1
+RECENT_GAMES = 5
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id TEXT PRIMARY KEY,
+    seed INTEGER,
+    started REAL NOT NULL,
+    ended REAL
+);
+CREATE TABLE IF NOT EXISTS trials (
+    id INTEGER PRIMARY KEY,
+    session TEXT NOT NULL,
+    participant TEXT NOT NULL,
+    trial INTEGER NOT NULL,
+    level INTEGER NOT NULL,
+    exposure_ms INTEGER NOT NULL,
+    correct INTEGER NOT NULL,
+    failed_stage TEXT,
+    timed_out INTEGER NOT NULL,
+    vehicle_rt_ms REAL,
+    sector_rt_ms REAL,
+    score INTEGER NOT NULL,
+    wall_time REAL NOT NULL,
+    record TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS trials_participant ON trials (participant, wall_time);
+CREATE INDEX IF NOT EXISTS trials_session ON trials (session, trial);
+CREATE TABLE IF NOT EXISTS games (
+    id INTEGER PRIMARY KEY,
+    session TEXT NOT NULL,
+    participant TEXT NOT NULL,
+    score INTEGER NOT NULL,
+    level INTEGER NOT NULL,
+    trials INTEGER NOT NULL,
+    ended REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS games_participant ON games (participant, ended);
+CREATE TABLE IF NOT EXISTS bests (
+    participant TEXT PRIMARY KEY,
+    best_score INTEGER NOT NULL,
+    best_level INTEGER NOT NULL,
+    games INTEGER NOT NULL,
+    last_played REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS bests_score ON bests (best_score);
+"""
+
+_INSERT_TRIAL = """
+INSERT INTO trials (session, participant, trial, level, exposure_ms, correct, failed_stage,
+                    timed_out, vehicle_rt_ms, sector_rt_ms, score, wall_time, record)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+_INSERT_GAME = """
+INSERT INTO games (session, participant, score, level, trials, ended) VALUES (?, ?, ?, ?, ?, ?)
+"""
+_UPSERT_BEST = """
+INSERT INTO bests (participant, best_score, best_level, games, last_played)
+VALUES (?, ?, ?, 1, ?)
+ON CONFLICT (participant) DO UPDATE SET
+    best_score = max(best_score, excluded.best_score),
+    best_level = max(best_level, excluded.best_level),
+    games = games + 1,
+    last_played = excluded.last_played
+"""
+
+
+def connect(path):
+    """Conexión con los ajustes del almacén (WAL, escrituras sin fsync por transacción)"""
+    conn = sqlite3.connect(path, timeout=5.0)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+def apply_game(history, score, level, ended=None):
+    """Aplica a un historial ya leído una partida recién terminada.
+
+    Hace en memoria lo mismo que el escritor en la base, para que la pantalla
+    de fin de partida no tenga que esperar a que se escriba.
+    """
+    ended = time.time() if ended is None else ended
+    best = history["best"]
+    history["previous_best"] = best["best_score"] if best else None
+    if best is None:
+        history["best"] = {"best_score": score, "best_level": level, "games": 1,
+                           "last_played": ended}
+    else:
+        best.update(best_score=max(best["best_score"], score),
+                    best_level=max(best["best_level"], level),
+                    games=best["games"] + 1, last_played=ended)
+    history["recent"] = ([{"score": score, "level": level, "ended": ended}]
+                         + history["recent"])[:RECENT_GAMES]
+    return history
+
+
+class ScoreStore:
+    """Sesiones, ensayos y mejores marcas por participante.
+
+    Los métodos de escritura sólo encolan; las lecturas usan una conexión
+    propia del hilo que las llama.
+    """
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self.queue = queue.SimpleQueue()
+        self.ready = threading.Event()
+        self.available = False
+        self.written = 0
+        self.errors = 0
+        self._reader = None
+        self.thread = threading.Thread(target=self._run, name="ScoreStore", daemon=True)
+        self.thread.start()
+
+    # --- escritura (no bloquea) ---
+
+    def start_session(self, session_id, seed):
+        self.queue.put(("INSERT OR IGNORE INTO sessions (id, seed, started) VALUES (?, ?, ?)",
+                        (session_id, seed, time.time())))
+
+    def end_session(self, session_id):
+        self.queue.put(("UPDATE sessions SET ended = ? WHERE id = ?", (time.time(), session_id)))
+
+    def add_trial(self, participant, record):
+        """Guarda un registro de ensayo completo (el mismo que va a TrialLog)"""
+        self.queue.put((_INSERT_TRIAL, (
+            record["session"], participant, record["trial"], record["level"],
+            record["exposure_ms"], int(record["correct"]), record["failed_stage"],
+            int(record["timed_out"]), record["vehicle_rt_ms"], record["sector_rt_ms"],
+            record["score"], record["wall_time"],
+            json.dumps(record, separators=(",", ":")),
+        )))
+
+    def add_game(self, session_id, participant, score, level, trials, ended=None):
+        """Guarda una partida terminada y actualiza la mejor marca del participante"""
+        ended = time.time() if ended is None else ended
+        self.queue.put((_INSERT_GAME, (session_id, participant, score, level, trials, ended)))
+        self.queue.put((_UPSERT_BEST, (participant, score, level, ended)))
+
+    def mark(self):
+        """Evento que se activa cuando se haya escrito todo lo encolado hasta ahora"""
+        done = threading.Event()
+        self.queue.put(done)
+        return done
+
+    def flush(self, timeout=5.0):
+        """Espera a que se escriba todo lo encolado hasta ahora"""
+        return self.mark().wait(timeout)
+
+    def close(self, timeout=5.0):
+        """Vacía la cola y detiene el hilo escritor"""
+        self.queue.put(None)
+        self.thread.join(timeout)
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = None
+
+    def _open(self):
+        folder = os.path.dirname(self.path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        conn = connect(self.path)
+        if conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+            conn.executescript(SCHEMA)
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        return conn
+
+    def _run(self):
+        try:
+            conn = self._open()
+            self.available = True
+        except (OSError, sqlite3.Error) as e:
+            print(f"No se pudo abrir el almacén de puntuaciones: {e}")
+            conn = None
+        self.ready.set()
+        while True:
+            batch = [self.queue.get()]
+            # Agrupa todo lo que esté esperando en una sola transacción
+            while True:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            statements = [item for item in batch if isinstance(item, tuple)]
+            if statements and conn is not None:
+                try:
+                    with conn:
+                        # Las sentencias iguales consecutivas van en un solo executemany
+                        for sql, group in itertools.groupby(statements, key=lambda s: s[0]):
+                            conn.executemany(sql, [params for _, params in group])
+                    self.written += len(statements)
+                except sqlite3.Error as e:
+                    self.errors += len(statements)
+                    print(f"Error escribiendo en el almacén de puntuaciones: {e}")
+            for item in batch:
+                if isinstance(item, threading.Event):
+                    item.set()
+            if None in batch:
+                if conn is not None:
+                    conn.close()
+                return
+
+    # --- lectura (consultas por índice) ---
+
+    def _query(self, sql, params=()):
+        if not self.ready.wait(2.0) or not self.available:
+            return []
+        try:
+            if self._reader is None:
+                self._reader = connect(self.path)
+                self._reader.row_factory = sqlite3.Row
+            return [dict(row) for row in self._reader.execute(sql, params)]
+        except sqlite3.Error as e:
+            print(f"Error leyendo el almacén de puntuaciones: {e}")
+            return []
+
+    def best(self, participant):
+        rows = self._query("SELECT best_score, best_level, games, last_played FROM bests "
+                           "WHERE participant = ?", (participant,))
+        return rows[0] if rows else None
+
+    def recent_games(self, participant, limit=RECENT_GAMES):
+        return self._query("SELECT score, level, ended FROM games WHERE participant = ? "
+                           "ORDER BY ended DESC LIMIT ?", (participant, limit))
+
+    def leader(self):
+        """Participante con la mejor puntuación de todos, o None"""
+        rows = self._query("SELECT participant, best_score, best_level FROM bests "
+                           "ORDER BY best_score DESC LIMIT 1")
+        return rows[0] if rows else None
+
+    def history(self, participant):
+        """Mejor marca, últimas partidas y récord general para el menú"""
+        return {
+            "participant": participant,
+            "best": self.best(participant),
+            "recent": self.recent_games(participant),
+            "leader": self.leader(),
+        }
+
+
+def main(argv):
+    if len(argv) < 2 or argv[1] != "stats":
+        print(__doc__)
+        return 2
+    path = argv[2] if len(argv) > 2 else DEFAULT_PATH
+    if not os.path.exists(path):
+        print(f"No existe {path}")
+        return 1
+    conn = connect(path)
+    for table in ("sessions", "trials", "games", "bests"):
+        count = conn.execute(f"SELECT count(*) FROM {table}").fetchone()[0]
+        print(f"{table}: {count}")
+    for participant, score, level, games in conn.execute(
+            "SELECT participant, best_score, best_level, games FROM bests "
+            "ORDER BY best_score DESC LIMIT 10"):
+        print(f"  {participant}: {score} puntos, nivel {level + 1}, {games} partidas")
+    conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
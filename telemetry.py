@@ -0,0 +1,326 @@
+"""Registro de ensayos y medición de tiempos de reacción.
+
+TrialLog escribe un registro JSON por línea en logs/trials-AAAAMMDD.jsonl
+desde un hilo propio: el hilo de Tk sólo encola el diccionario y nunca espera
+al disco. EventClock traduce las marcas de tiempo de los eventos de Tk al
+reloj monotónico del proceso para medir tiempos de reacción.
+
+Con DD_TRACE=1 o --trace, PhaseTracer cronometra las fases del juego y la
+latencia del bucle de eventos; las filas van a logs/trace-<sesión>.jsonl
+mientras se juega y al cerrar se exporta logs/trace-<sesión>.json/.csv.
+"""
+import csv
+import json
+import os
+import queue
+import random
+import sys
+import threading
+import time
+from collections import deque
+
+
+def perf_ms():
+    """Reloj monotónico del proceso en milisegundos"""
+    return time.perf_counter_ns() / 1_000_000
+
+
+class EventClock:
+    """Relaciona event.time de Tk (ms del sistema de ventanas) con perf_ms().
+
+    La diferencia perf_ms() - event.time al atender un evento es el desfase
+    entre relojes más el retraso de la cola de eventos; el mínimo observado es
+    la mejor estimación del desfase. Así el instante de un clic se toma de la
+    marca del propio evento y no de cuándo se ejecutó el manejador.
+    """
+
+    # event.time es de 32 bits sin signo y vuelve a cero cada ~49 días
+    WRAP_MS = 2**32
+
+    def __init__(self):
+        self.offset_ms = None
+
+    def observe(self, event_time_ms, now_ms=None):
+        """Actualiza el desfase con un evento recién recibido"""
+        if not event_time_ms:
+            return
+        now_ms = perf_ms() if now_ms is None else now_ms
+        delta = now_ms - event_time_ms
+        if self.offset_ms is None or delta < self.offset_ms or delta - self.offset_ms > self.WRAP_MS / 2:
+            self.offset_ms = delta
+
+    def to_perf_ms(self, event_time_ms):
+        """Instante del evento en el reloj de perf_ms(), o None si no hay calibración"""
+        if self.offset_ms is None or not event_time_ms:
+            return None
+        return event_time_ms + self.offset_ms
+
+
+class TrialLog:
+    """Registro de ensayos sólo de escritura con un hilo escritor.
+
+    Con name se escribe siempre en ese archivo en lugar de uno por día.
+    """
+
+    def __init__(self, folder="logs", prefix="trials", name=None):
+        self.folder = folder
+        self.prefix = prefix
+        self.name = name
+        self.queue = queue.SimpleQueue()
+        self.written = 0
+        self.errors = 0
+        self.thread = threading.Thread(target=self._run, name="TrialLog", daemon=True)
+        self.thread.start()
+
+    def append(self, record):
+        """Encola un registro; no bloquea"""
+        self.queue.put(record)
+
+    def close(self, timeout=2.0):
+        """Vacía la cola y detiene el hilo escritor"""
+        self.queue.put(None)
+        self.thread.join(timeout)
+
+    def _path(self):
+        if self.name is not None:
+            return os.path.join(self.folder, self.name)
+        return os.path.join(self.folder, f"{self.prefix}-{time.strftime('%Y%m%d')}.jsonl")
+
+    def _run(self):
+        handle = None
+        path = None
+        while True:
+            batch = [self.queue.get()]
+            # Agrupa todo lo que esté esperando en una sola escritura
+            while True:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = None in batch
+            records = [r for r in batch if r is not None]
+            if records:
+                try:
+                    if handle is None or path != self._path():
+                        if handle:
+                            handle.close()
+                            handle = None
+                        path = self._path()
+                        os.makedirs(self.folder, exist_ok=True)
+                        handle = open(path, "a", encoding="utf-8")
+                    handle.write("".join(json.dumps(r, separators=(",", ":")) + "\n"
+                                         for r in records))
+                    handle.flush()
+                    self.written += len(records)
+                except (OSError, TypeError, ValueError) as e:
+                    self.errors += len(records)
+                    print(f"Error escribiendo el registro de ensayos: {e}")
+            if stop:
+                if handle:
+                    handle.close()
+                return
+
+
+TRACE_ENV = "DD_TRACE"
+# Filas recientes que se guardan en memoria; el resto sólo está en disco
+TRACE_RING_ROWS = 20_000
+# Duraciones por grupo con las que se calculan los percentiles del resumen
+TRACE_RESERVOIR = 4096
+
+
+def trace_requested(argv=None):
+    """True si se pidió la traza con DD_TRACE=1 o con --trace en la línea de órdenes"""
+    argv = sys.argv if argv is None else argv
+    return "--trace" in argv or os.environ.get(TRACE_ENV, "").lower() in ("1", "true", "yes", "on")
+
+
+class NullTracer:
+    """Trazador desactivado: misma interfaz, sin coste"""
+
+    enabled = False
+
+    def wrap(self, owner, names, kind="phase", prefix=""):
+        pass
+
+    def mark(self, kind, name, duration_ms):
+        pass
+
+    def start_heartbeat(self, root, interval_ms=250):
+        pass
+
+    def export(self):
+        return None
+
+
+class PhaseTracer:
+    """Trazas de fases, latencia del bucle de Tk y coste de crear imágenes.
+
+    wrap() sustituye métodos de un objeto por versiones cronometradas, así que
+    sin trazador no queda ningún envoltorio en el camino del juego. Cada fila
+    es (tipo, nombre, fase, inicio_ms, duración_ms) con el inicio relativo a
+    la creación del trazador:
+
+        call       lo que tarda en ejecutarse el manejador de una fase
+        phase      tiempo en pantalla de una fase hasta la siguiente
+        image      creación de imágenes (sprites, sectores, fondos)
+        heartbeat  retraso de un after() de prueba sobre lo pedido
+
+    Las filas nuevas se acumulan en pending y en cada latido pasan al hilo
+    escritor (logs/trace-<sesión>.jsonl) y a rows, que sólo conserva las
+    últimas TRACE_RING_ROWS; si el juego se cierra mal, la traza está en disco.
+    """
+
+    enabled = True
+
+    def __init__(self, session, folder="logs"):
+        self.session = session
+        self.folder = folder
+        self.t0 = perf_ms()
+        self.rows = deque(maxlen=TRACE_RING_ROWS)
+        self.pending = []
+        self.stream = TrialLog(folder, name=f"trace-{session}.jsonl")
+        self.phase = None
+        self.phase_start = None
+        self.root = None
+        self.interval_ms = None
+        self.heartbeat_due = None
+
+    def wrap(self, owner, names, kind="phase", prefix=""):
+        """Cronometra los métodos indicados de owner; prefix distingue objetos"""
+        for name in names:
+            setattr(owner, name, self._timed(kind, prefix + name, getattr(owner, name)))
+
+    def _timed(self, kind, name, fn):
+        rows = self.pending
+
+        def timed(*args, **kwargs):
+            start = perf_ms()
+            if kind == "phase":
+                if self.phase is not None:
+                    rows.append(("phase", self.phase, self.phase,
+                                 self.phase_start - self.t0, start - self.phase_start))
+                self.phase = name
+                self.phase_start = start
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                rows.append(("call" if kind == "phase" else kind, name, self.phase,
+                             start - self.t0, perf_ms() - start))
+
+        timed.__name__ = name
+        return timed
+
+    def mark(self, kind, name, duration_ms):
+        """Anota una duración medida fuera de wrap() (p. ej. desde el arranque)"""
+        self.pending.append((kind, name, self.phase, perf_ms() - self.t0, duration_ms))
+
+    def start_heartbeat(self, root, interval_ms=250):
+        """Mide cada interval_ms cuánto se retrasa un after() respecto a lo pedido"""
+        self.root = root
+        self.interval_ms = interval_ms
+        self._schedule_heartbeat()
+
+    def _schedule_heartbeat(self):
+        self.heartbeat_due = perf_ms() + self.interval_ms
+        self.root.after(self.interval_ms, self._heartbeat)
+
+    def _heartbeat(self):
+        now = perf_ms()
+        self.pending.append(("heartbeat", "after", self.phase, self.heartbeat_due - self.t0,
+                             now - self.heartbeat_due))
+        self.flush()
+        self._schedule_heartbeat()
+
+    def flush(self):
+        """Pasa las filas pendientes al hilo escritor y a las recientes"""
+        pending = self.pending
+        if not pending:
+            return
+        append = self.stream.append
+        for kind, name, phase, start, duration in pending:
+            append([kind, name, phase, round(start, 3), round(duration, 3)])
+        self.rows.extend(pending)
+        pending.clear()
+
+    def iter_rows(self):
+        """Filas de logs/trace-<sesión>.jsonl una a una (las recientes si no se puede leer)"""
+        if self.stream.written:
+            try:
+                with open(self.stream._path(), "r", encoding="utf-8") as f:
+                    for line in f:
+                        if line.strip():
+                            yield json.loads(line)
+                return
+            except (OSError, ValueError) as e:
+                print(f"Error leyendo la traza: {e}")
+        yield from self.rows
+
+    def summary(self, rows=None):
+        """Percentiles de duración por (tipo, nombre); por defecto de las filas recientes.
+
+        count y max son exactos; los percentiles salen de una muestra
+        uniforme de como mucho TRACE_RESERVOIR duraciones por grupo.
+        """
+        rng = random.Random(0)
+        groups = {}
+        for kind, name, _, _, duration in (self.rows if rows is None else rows):
+            key = f"{kind}:{name}"
+            group = groups.get(key)
+            if group is None:
+                group = groups[key] = [0, duration, []]
+            group[0] += 1
+            if duration > group[1]:
+                group[1] = duration
+            sample = group[2]
+            if len(sample) < TRACE_RESERVOIR:
+                sample.append(duration)
+            else:
+                slot = rng.randrange(group[0])
+                if slot < TRACE_RESERVOIR:
+                    sample[slot] = duration
+        result = {}
+        for key, (count, maximum, values) in sorted(groups.items()):
+            values.sort()
+            result[key] = {
+                "count": count,
+                "p50_ms": round(values[len(values) // 2], 3),
+                "p95_ms": round(values[min(len(values) - 1, int(len(values) * 0.95))], 3),
+                "max_ms": round(maximum, 3),
+            }
+        return result
+
+    def export(self):
+        """Cierra la traza y escribe logs/trace-<sesión>.json y .csv; devuelve la ruta base.
+
+        El .jsonl se recorre dos veces (resumen y filas) sin cargarlo entero.
+        """
+        self.flush()
+        self.stream.close()
+        base = os.path.join(self.folder, f"trace-{self.session}")
+        try:
+            os.makedirs(self.folder, exist_ok=True)
+            summary = self.summary(self.iter_rows())
+            with open(base + ".json", "w", encoding="utf-8") as json_file, \
+                    open(base + ".csv", "w", encoding="utf-8", newline="") as csv_file:
+                head = json.dumps({"session": self.session,
+                                   "heartbeat_interval_ms": self.interval_ms,
+                                   "summary": summary}, separators=(",", ":"))
+                json_file.write(head[:-1] + ',"rows":[')
+                writer = csv.writer(csv_file)
+                writer.writerow(("kind", "name", "phase", "start_ms", "duration_ms"))
+                separator = ""
+                for kind, name, phase, start, duration in self.iter_rows():
+                    row = [kind, name, phase, round(start, 3), round(duration, 3)]
+                    json_file.write(separator + json.dumps(row, separators=(",", ":")))
+                    separator = ","
+                    writer.writerow((kind, name, phase, f"{start:.3f}", f"{duration:.3f}"))
+                json_file.write("]}")
+        except OSError as e:
+            print(f"Error escribiendo la traza: {e}")
+            return None
+        return base
+
+
+def make_tracer(session, argv=None):
+    """PhaseTracer si se pidió la traza, NullTracer si no"""
+    return PhaseTracer(session) if trace_requested(argv) else NullTracer()